@@ -1,6 +1,6 @@
 import os
 import json
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, request, jsonify, send_from_directory, session, Response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -9,7 +9,15 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import the get_openai_reply function from your main.py script
-from main import get_openai_reply
+from main import get_openai_reply, stream_openai_reply, get_structured_reply_stats, rag_status
+from llm_client import get_client_stats
+from llm_cache import LLM_CACHE
+from embedding_cache import QUERY_EMBEDDING_CACHE
+from token_budget import get_token_budget_stats
+from context_compression import get_compression_stats
+from retrieval_planner import RETRIEVAL_PLANNER
+from semantic_cache import SEMANTIC_CACHE
+from single_flight import CHAT_FLIGHTS, LLM_FLIGHTS
 from prompts import SYSTEM_PROMPTS # SYSTEM_PROMPTS is imported for validation
 
 # Initialize Flask app, specifying the root directory for static files
@@ -30,6 +38,50 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY", "super_secret_key_for_dev")
 # This is a simplification; a robust solution would involve user authentication and a database.
 user_sessions = {}
 
+def get_or_create_summary_array(session_id):
+    """
+    Returns (session_id, summary_array) for a session ID, creating a new session if the ID
+    is missing or unknown. Shared by the Flask views and the async ASGI handler.
+    """
+    # IMPORTANT FIX: Ensure user_sessions[session_id] is initialized if session_id exists but not in user_sessions
+    if not session_id or session_id not in user_sessions:
+        session_id = os.urandom(16).hex()
+        user_sessions[session_id] = {
+            "objective": "", "outcomes": "", "pedagogy": "",
+            "development": "", "implementation": "", "evaluation": ""
+        }
+    return session_id, user_sessions[session_id]
+
+def get_session_summary_array():
+    """
+    Returns (session_id, summary_array) for the current user, creating a new session if needed.
+    """
+    # Get or create a session ID for the current user
+    session_id, summary_array = get_or_create_summary_array(session.get('session_id'))
+    if session.get('session_id') != session_id:
+        session['session_id'] = session_id
+    return session_id, summary_array
+
+def request_allows_cache(data):
+    """
+    A client can bypass the LLM response cache with {"noCache": true} in the body
+    or a 'Cache-Control: no-cache' request header.
+    """
+    if data.get('noCache'):
+        return False
+    return 'no-cache' not in request.headers.get('Cache-Control', '').lower()
+
+def chat_flight_key(endpoint, session_id, purpose, user_input, use_cache):
+    """
+    Identical chat requests from one session share a single in-flight call. endpoint ("chat" or
+    "stream") keeps the two endpoints apart, since their flights publish different results.
+    """
+    return (endpoint, session_id, purpose, json.dumps(user_input, sort_keys=True), use_cache)
+
+def format_sse(event, data):
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.route('/')
 def serve_index():
     """Serve the main index.html file from the static folder."""
@@ -55,26 +107,19 @@ def chat():
         user_input = data['userInput']
         purpose = data['purpose']
 
-        # Get or create a session ID for the current user
-        # IMPORTANT FIX: Ensure user_sessions[session_id] is initialized if session_id exists but not in user_sessions
-        session_id = session.get('session_id')
-        if not session_id or session_id not in user_sessions:
-            session_id = os.urandom(16).hex()
-            session['session_id'] = session_id
-            user_sessions[session_id] = {
-                "objective": "", "outcomes": "", "pedagogy": "",
-                "development": "", "implementation": "", "evaluation": ""
-            }
-        
-        # Now, current_summary_array can be safely accessed
-        current_summary_array = user_sessions[session_id]
+        session_id, current_summary_array = get_session_summary_array()
 
         # Validate the purpose against the SYSTEM_PROMPTS keys
         if purpose not in SYSTEM_PROMPTS:
             return jsonify({"type": "error", "summary": f"Invalid 'purpose' provided: {purpose}"}), 400
 
-        # Call the get_openai_reply function from main.py
-        response_data_str, updated_summary_array = get_openai_reply(user_input, purpose, current_summary_array)
+        # Call the get_openai_reply function from main.py; a repeated submit of the same
+        # request while it is still running waits for that call instead of starting another.
+        use_cache = request_allows_cache(data)
+        response_data_str, updated_summary_array = CHAT_FLIGHTS.do(
+            chat_flight_key("chat", session_id, purpose, user_input, use_cache),
+            get_openai_reply, user_input, purpose, current_summary_array, use_cache=use_cache, session_id=session_id
+        )
         response_json_from_main = json.loads(response_data_str)
         
         # Update the session's summary array
@@ -90,6 +135,86 @@ def chat():
         app.logger.error(f"An error occurred in /api/chat: {e}", exc_info=True)
         return jsonify({"type": "error", "summary": f"An internal server error occurred: {str(e)}"}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat using Server-Sent Events.
+    Emits 'token' events as text arrives and one 'final' event with the structured
+    payload (the same body /api/chat returns, including 'full_summary_state').
+    """
+    data = request.get_json(silent=True)
+
+    if not data or 'userInput' not in data or 'purpose' not in data:
+        return jsonify({"type": "error", "summary": "Invalid input. 'userInput' and 'purpose' are required."}), 400
+
+    user_input = data['userInput']
+    purpose = data['purpose']
+
+    if purpose not in SYSTEM_PROMPTS:
+        return jsonify({"type": "error", "summary": f"Invalid 'purpose' provided: {purpose}"}), 400
+
+    session_id, current_summary_array = get_session_summary_array()
+    use_cache = request_allows_cache(data)
+
+    flight_key = chat_flight_key("stream", session_id, purpose, user_input, use_cache)
+
+    def generate():
+        flight, is_leader = CHAT_FLIGHTS.begin(flight_key)
+        if not is_leader:
+            # A duplicate of a stream that is still running (e.g. a double-click): wait for
+            # its final payload instead of calling the model again. If the first stream was
+            # abandoned by its client, or is taking too long, produce the reply here.
+            if CHAT_FLIGHTS.wait(flight) and not flight.abandoned:
+                yield format_sse("final", dict(flight.result))
+                return
+
+        final_payload = None
+        try:
+            for event, payload in stream_openai_reply(user_input, purpose, current_summary_array, use_cache=use_cache, session_id=session_id):
+                if event == "final":
+                    user_sessions[session_id] = current_summary_array
+                    payload['full_summary_state'] = user_sessions[session_id]
+                    final_payload = payload
+                yield format_sse(event, payload)
+        except Exception as e:
+            app.logger.error(f"An error occurred in /api/chat/stream: {e}", exc_info=True)
+            final_payload = {"type": "error", "summary": f"An internal server error occurred: {str(e)}", "full_summary_state": current_summary_array}
+            yield format_sse("final", final_payload)
+        finally:
+            if is_leader:
+                CHAT_FLIGHTS.end(flight_key, flight, result=final_payload, abandoned=final_payload is None)
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no", # Stop nginx/Apache proxies from buffering the stream
+    }
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Exposes backend performance counters for scraping."""
+    return jsonify({
+        "llm_client": get_client_stats(),
+        "llm_cache": LLM_CACHE.stats(),
+        "structured_replies": get_structured_reply_stats(),
+        "token_budget": get_token_budget_stats(),
+        "context_compression": get_compression_stats(),
+        "retrieval_planner": RETRIEVAL_PLANNER.stats(),
+        "single_flight": {"chat": CHAT_FLIGHTS.stats(), "llm": LLM_FLIGHTS.stats()},
+        "rag": rag_status(),
+        "query_embedding_cache": QUERY_EMBEDDING_CACHE.stats(),
+        "semantic_cache": SEMANTIC_CACHE.stats(),
+    }), 200
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: 200 once the RAG embedding model and vector store are loaded, 503 while
+    they are still warming up. The app already serves requests before then (liveness).
+    """
+    status = rag_status()
+    return jsonify(status), 200 if status["ready"] else 503
+
 if __name__ == '__main__':
     # Ensure the static directory exists relative to the project root
     static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'static')
@@ -0,0 +1,233 @@
+import os
+import asyncio
+import json
+import sys
+from http.cookies import SimpleCookie
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import dump_cookie
+
+# Add the backend directory to the Python path to allow importing app and main
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, user_sessions, get_or_create_summary_array, chat_flight_key, format_sse
+from main import get_openai_reply_async, astream_openai_reply
+from prompts import SYSTEM_PROMPTS
+from single_flight import CHAT_FLIGHTS
+
+# --- Async Serving Mode ---
+# An ASGI entry point for running the app on an event loop, e.g.:
+#     uvicorn asgi:application --workers 3 --port 8002
+# POST /api/chat and POST /api/chat/stream (the endpoint the UI uses) are handled natively with
+# get_openai_reply_async and astream_openai_reply, so a worker process is not limited to one
+# in-flight chat per thread. Every other route (static files, metrics) is served by the regular
+# Flask app through a WSGI adapter, whose calls run one at a time on a single thread.
+# The default deployment (gunicorn + app:app) is unchanged.
+
+flask_application = WsgiToAsgi(app)
+MAX_REQUEST_BODY_BYTES = 1024 * 1024
+
+
+def load_session(scope):
+    """Reads the Flask session from the request cookie, so both modes share sessions."""
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookie_header = ""
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            cookie_header = value.decode("latin-1")
+            break
+    morsel = SimpleCookie(cookie_header).get(app.config["SESSION_COOKIE_NAME"])
+    if serializer is None or morsel is None:
+        return {}
+    try:
+        max_age = int(app.permanent_session_lifetime.total_seconds())
+        return serializer.loads(morsel.value, max_age=max_age)
+    except Exception:
+        return {}
+
+
+def dump_session_cookie(session_data):
+    """Builds the Set-Cookie header value for the session, signed the way Flask signs it."""
+    serializer = app.session_interface.get_signing_serializer(app)
+    return dump_cookie(
+        app.config["SESSION_COOKIE_NAME"],
+        serializer.dumps(session_data),
+        path=app.config["SESSION_COOKIE_PATH"] or app.config["APPLICATION_ROOT"] or "/",
+        httponly=app.config["SESSION_COOKIE_HTTPONLY"],
+        secure=app.config["SESSION_COOKIE_SECURE"],
+        samesite=app.config["SESSION_COOKIE_SAMESITE"],
+    )
+
+
+async def read_body(receive):
+    """Reads the full request body from the ASGI receive channel."""
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if len(body) > MAX_REQUEST_BODY_BYTES:
+            return None
+        if not message.get("more_body", False):
+            return body
+
+
+async def send_json(send, status, payload, extra_headers=()):
+    """Sends a complete JSON response."""
+    body = json.dumps(payload).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        (b"access-control-allow-origin", b"*"), # Same policy as CORS(app)
+    ]
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def read_chat_request(scope, receive, send):
+    """
+    Reads and validates a chat request body, answering invalid ones with a 400.
+    Returns (data, session_id, summary_array, use_cache, extra_headers), or None if answered.
+    """
+    body = await read_body(receive)
+    if body is None:
+        await send_json(send, 400, {"type": "error", "summary": "Invalid JSON in request body."})
+        return None
+
+    try:
+        data = json.loads(body or b"null")
+    except json.JSONDecodeError:
+        await send_json(send, 400, {"type": "error", "summary": "Invalid JSON in request body."})
+        return None
+
+    if not isinstance(data, dict) or 'userInput' not in data or 'purpose' not in data:
+        await send_json(send, 400, {"type": "error", "summary": "Invalid input. 'userInput' and 'purpose' are required."})
+        return None
+
+    purpose = data['purpose']
+
+    session_data = load_session(scope)
+    session_id, current_summary_array = get_or_create_summary_array(session_data.get('session_id'))
+    extra_headers = []
+    if session_data.get('session_id') != session_id:
+        session_data['session_id'] = session_id
+        extra_headers.append((b"set-cookie", dump_session_cookie(session_data).encode("latin-1")))
+
+    if purpose not in SYSTEM_PROMPTS:
+        await send_json(send, 400, {"type": "error", "summary": f"Invalid 'purpose' provided: {purpose}"}, extra_headers)
+        return None
+
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+    use_cache = not data.get('noCache') and 'no-cache' not in headers.get('cache-control', '').lower()
+    return data, session_id, current_summary_array, use_cache, extra_headers
+
+
+async def chat(scope, receive, send):
+    """Async equivalent of the /api/chat Flask view in app.py."""
+    request = await read_chat_request(scope, receive, send)
+    if request is None:
+        return
+    data, session_id, current_summary_array, use_cache, extra_headers = request
+    user_input = data['userInput']
+    purpose = data['purpose']
+
+    try:
+        response_data_str, updated_summary_array = await CHAT_FLIGHTS.ado(
+            chat_flight_key("chat", session_id, purpose, user_input, use_cache),
+            get_openai_reply_async, user_input, purpose, current_summary_array, use_cache=use_cache, session_id=session_id
+        )
+        response_json_from_main = json.loads(response_data_str)
+
+        user_sessions[session_id] = updated_summary_array
+        response_json_from_main['full_summary_state'] = user_sessions[session_id]
+        await send_json(send, 200, response_json_from_main, extra_headers)
+    except asyncio.CancelledError:
+        # This request was cancelled (e.g. by the server on disconnect); answer if the client is still there.
+        app.logger.warning("Async /api/chat was cancelled before its reply was ready.")
+        try:
+            await send_json(send, 503, {"type": "error", "summary": "The request was cancelled. Please try again."}, extra_headers)
+        except Exception:
+            pass
+        raise
+    except Exception as e:
+        app.logger.error(f"An error occurred in async /api/chat: {e}", exc_info=True)
+        await send_json(send, 500, {"type": "error", "summary": f"An internal server error occurred: {str(e)}"}, extra_headers)
+
+
+async def chat_stream(scope, receive, send):
+    """Async equivalent of the /api/chat/stream Flask view in app.py (Server-Sent Events)."""
+    request = await read_chat_request(scope, receive, send)
+    if request is None:
+        return
+    data, session_id, current_summary_array, use_cache, extra_headers = request
+    user_input = data['userInput']
+    purpose = data['purpose']
+
+    headers = [
+        (b"content-type", b"text/event-stream; charset=utf-8"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"), # Stop nginx/Apache proxies from buffering the stream
+        (b"access-control-allow-origin", b"*"),
+    ]
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def send_event(event, payload):
+        await send({"type": "http.response.body", "body": format_sse(event, payload).encode("utf-8"), "more_body": True})
+
+    # Same flights as the Flask view, so a duplicate of a running stream waits for its final payload.
+    flight_key = chat_flight_key("stream", session_id, purpose, user_input, use_cache)
+    flight, is_leader = CHAT_FLIGHTS.begin(flight_key)
+    if not is_leader:
+        # Flight waits block, so they run in a worker thread instead of on the event loop.
+        if await asyncio.to_thread(CHAT_FLIGHTS.wait, flight) and not flight.abandoned:
+            await send_event("final", dict(flight.result))
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+    final_payload = None
+    replies = astream_openai_reply(user_input, purpose, current_summary_array, use_cache=use_cache, session_id=session_id)
+    try:
+        try:
+            async for event, payload in replies:
+                if event == "final":
+                    user_sessions[session_id] = current_summary_array
+                    payload['full_summary_state'] = user_sessions[session_id]
+                    final_payload = payload
+                await send_event(event, payload)
+        except Exception as e:
+            if final_payload is not None:
+                raise # The reply is complete; the client went away while it was being sent.
+            app.logger.error(f"An error occurred in async /api/chat/stream: {e}", exc_info=True)
+            final_payload = {"type": "error", "summary": f"An internal server error occurred: {str(e)}", "full_summary_state": current_summary_array}
+            await send_event("final", final_payload)
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        await replies.aclose()
+        if is_leader:
+            CHAT_FLIGHTS.end(flight_key, flight, result=final_payload, abandoned=final_payload is None)
+
+
+async def lifespan(receive, send):
+    """Acknowledges ASGI lifespan events; there is nothing to set up or tear down."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+NATIVE_ROUTES = {"/api/chat": chat, "/api/chat/stream": chat_stream}
+
+
+async def application(scope, receive, send):
+    """ASGI entry point: native async /api/chat and /api/chat/stream, everything else through Flask."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in NATIVE_ROUTES:
+        await NATIVE_ROUTES[scope["path"]](scope, receive, send)
+    else:
+        await flask_application(scope, receive, send)
@@ -0,0 +1,185 @@
+import os
+import re
+import sys
+import math
+import threading
+from collections import Counter
+
+from keyword_index import tokenize
+from token_budget import count_tokens
+
+# --- Context Compression Settings ---
+# Retrieved chunks overlap (rag_builder.py splits with chunk_overlap=200) and often say the same
+# thing twice. Before the token budget is applied, the chunks of a step prompt go through:
+#   mmr       - maximal marginal relevance: re-ranks the chunks to balance retrieval rank against
+#               similarity to the chunks already chosen, and drops near-duplicates;
+#   overlap   - cuts text a chunk shares with a chosen chunk (the splitter's overlap windows);
+#   sentences - keeps only the sentences of each chunk most similar to the query.
+# Similarity is the cosine of term-count vectors, so no extra embedding calls are needed.
+COMPRESSION_LEVELS = {
+    "off": (),
+    "light": ("overlap",),
+    "balanced": ("mmr", "overlap"),
+    "aggressive": ("mmr", "overlap", "sentences"),
+}
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "balanced").lower()
+
+# Weight of retrieval rank vs novelty in MMR, and the similarity above which a chunk counts as a duplicate.
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+MMR_DUPLICATE_THRESHOLD = float(os.getenv("MMR_DUPLICATE_THRESHOLD", "0.85"))
+
+# Shared text shorter than this is left alone (it is more likely a common phrase than an overlap window).
+MIN_OVERLAP_CHARS = 40
+
+# Share of each chunk's sentences kept by sentence trimming, and the minimum kept.
+SENTENCE_KEEP_RATIO = float(os.getenv("SENTENCE_KEEP_RATIO", "0.6"))
+MIN_KEPT_SENTENCES = 2
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+COMPRESSION_STATS = {"requests": 0, "tokens_in": 0, "tokens_out": 0, "chunks_in": 0, "chunks_out": 0}
+_stats_lock = threading.Lock()
+
+
+def _term_vector(text):
+    return Counter(tokenize(text))
+
+
+def _cosine(a, b):
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[term] for term, count in a.items() if term in b)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def mmr_select(chunks, mmr_lambda=MMR_LAMBDA, duplicate_threshold=MMR_DUPLICATE_THRESHOLD):
+    """
+    Orders chunks by maximal marginal relevance and drops near-duplicates.
+    Relevance is the retrieval rank (chunks arrive best first); redundancy is the highest
+    similarity to an already selected chunk.
+    """
+    vectors = [_term_vector(chunk) for chunk in chunks]
+    relevance = [1.0 - rank / len(chunks) for rank in range(len(chunks))]
+    selected = []
+    remaining = list(range(len(chunks)))
+    while remaining:
+        redundancy = {i: max((_cosine(vectors[i], vectors[j]) for j in selected), default=0.0) for i in remaining}
+        remaining = [i for i in remaining if redundancy[i] < duplicate_threshold]
+        if not remaining:
+            break
+        best = max(remaining, key=lambda i: (mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy[i], -i))
+        selected.append(best)
+        remaining.remove(best)
+    return [chunks[i] for i in selected]
+
+
+def _overlap_length(first, second):
+    """Length of the longest suffix of first that is a prefix of second (0 if under MIN_OVERLAP_CHARS)."""
+    if min(len(first), len(second)) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = second[:MIN_OVERLAP_CHARS]
+    start = first.find(probe, max(0, len(first) - len(second)))
+    while start != -1:
+        # The earliest match that extends to the end of first is the longest overlap.
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(probe, start + 1)
+    return 0
+
+
+def remove_overlaps(chunks):
+    """
+    Removes the text each chunk shares with an earlier chunk: a chunk contained in an earlier
+    one is dropped, and an overlap window at its start or end is cut.
+    """
+    seen = []
+    kept = []
+    for chunk in chunks:
+        text = chunk.strip()
+        for previous in seen:
+            if text in previous:
+                text = ""
+                break
+            cut = _overlap_length(previous, text)
+            text = text[cut:].lstrip()
+            cut = _overlap_length(text, previous)
+            text = text[:len(text) - cut].rstrip()
+        if text:
+            # A chunk without overlaps is kept exactly as retrieved.
+            kept.append(chunk if text == chunk.strip() else text)
+        seen.append(chunk.strip())
+    return kept
+
+
+def trim_sentences(query, chunk, keep_ratio=SENTENCE_KEEP_RATIO, min_sentences=MIN_KEPT_SENTENCES):
+    """Keeps the sentences of a chunk most similar to the query, in their original order."""
+    sentences = [sentence.strip() for sentence in SENTENCE_PATTERN.split(chunk) if sentence.strip()]
+    keep = max(min_sentences, math.ceil(len(sentences) * keep_ratio))
+    if len(sentences) <= keep:
+        return chunk
+    query_vector = _term_vector(query)
+    scores = [_cosine(query_vector, _term_vector(sentence)) for sentence in sentences]
+    top = sorted(range(len(sentences)), key=lambda i: (-scores[i], i))[:keep]
+    return " ".join(sentences[i] for i in sorted(top))
+
+
+def compress_chunks(query, chunks, level=None):
+    """
+    Runs the stages of a compression level over retrieved chunks (best first).
+
+    Args:
+        query (str): The retrieval query, used by sentence trimming.
+        chunks (list): Chunk texts in rank order.
+        level (str, optional): A COMPRESSION_LEVELS key; defaults to CONTEXT_COMPRESSION.
+
+    Returns:
+        tuple: (compressed chunks in the new rank order, report) where report has the tokens
+               in and out and the tokens each stage removed.
+    """
+    level = level or CONTEXT_COMPRESSION
+    stages = COMPRESSION_LEVELS.get(level, COMPRESSION_LEVELS["balanced"])
+    tokens_in = sum(count_tokens(chunk) for chunk in chunks)
+    report = {"level": level, "chunks_in": len(chunks), "tokens_in": tokens_in}
+
+    tokens = tokens_in
+    for stage in stages:
+        if not chunks:
+            break
+        if stage == "mmr":
+            chunks = mmr_select(chunks)
+        elif stage == "overlap":
+            chunks = remove_overlaps(chunks)
+        elif stage == "sentences":
+            chunks = [trim_sentences(query, chunk) for chunk in chunks]
+        stage_tokens = sum(count_tokens(chunk) for chunk in chunks)
+        report[f"{stage}_tokens_removed"] = tokens - stage_tokens
+        tokens = stage_tokens
+
+    report["chunks_out"] = len(chunks)
+    report["tokens_out"] = tokens
+    return chunks, report
+
+
+def record_compression(purpose, report):
+    """Logs the per-stage token savings of a request and updates the aggregate counters."""
+    stage_counts = {key: value for key, value in report.items() if key.endswith("_tokens_removed")}
+    stages = " ".join(f"{key}={value}" for key, value in stage_counts.items())
+    print(
+        f"context compression purpose={purpose} level={report['level']} "
+        f"tokens={report['tokens_in']}->{report['tokens_out']} {stages}",
+        file=sys.stderr,
+    )
+    with _stats_lock:
+        COMPRESSION_STATS["requests"] += 1
+        for key in ("tokens_in", "tokens_out", "chunks_in", "chunks_out"):
+            COMPRESSION_STATS[key] += report[key]
+        for key, value in stage_counts.items():
+            COMPRESSION_STATS[key] = COMPRESSION_STATS.get(key, 0) + value
+
+
+def get_compression_stats():
+    """Returns the aggregate compression counters for the metrics endpoint."""
+    with _stats_lock:
+        stats = dict(COMPRESSION_STATS)
+    stats["level"] = CONTEXT_COMPRESSION
+    return stats
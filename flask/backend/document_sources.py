@@ -0,0 +1,139 @@
+import os
+import re
+
+from rag_metadata import iter_sections, HEADING_PATH_SEPARATOR
+
+
+# --- Document Sources ---
+# The knowledge base is built from the .docx and .pdf files in the data directory. Each file is
+# read as a stream of text units that rag_builder.py chunks as they arrive:
+#   .docx - one unit per heading section, with the paragraphs and table rows in document order;
+#   .pdf  - one unit per page, under the heading of the PDF outline (bookmarks) it falls in.
+# Neither a file nor the corpus is ever held as one string.
+SOURCE_EXTENSIONS = (".docx", ".pdf")
+
+# A section without headings is split into units of about this many characters.
+SOURCE_UNIT_MAX_CHARS = int(os.getenv("SOURCE_UNIT_MAX_CHARS", "20000"))
+
+# pypdf keeps every object it has parsed; reopening the file every this many pages keeps the
+# memory for a long PDF flat.
+PDF_PAGES_PER_READER = int(os.getenv("PDF_PAGES_PER_READER", "50"))
+
+TABLE_CELL_SEPARATOR = " | "
+# Layout-mode PDF text separates table columns (and aligned blocks) with runs of spaces.
+PDF_COLUMN_GAP = re.compile(r" {3,}")
+
+
+def list_source_files(directory_path):
+    """Returns the names of the .docx and .pdf files in a directory, sorted (Office lock files are skipped)."""
+    return sorted(
+        filename for filename in os.listdir(directory_path)
+        if filename.lower().endswith(SOURCE_EXTENSIONS) and not filename.startswith("~$")
+    )
+
+
+def format_table_row(cells):
+    """Joins a table row's cell texts; merged cells (repeated by python-docx) appear once."""
+    texts = []
+    for cell in cells:
+        text = " ".join(cell.split())
+        if text and (not texts or texts[-1] != text):
+            texts.append(text)
+    return TABLE_CELL_SEPARATOR.join(texts)
+
+
+def iter_docx_blocks(file_path):
+    """
+    Yields (style_name, text) for the paragraphs and table rows of a .docx file, in document
+    order. A table row is one block with its cells joined by TABLE_CELL_SEPARATOR.
+    """
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    doc = Document(file_path)
+    for element in doc.element.body.iterchildren():
+        if element.tag == qn("w:p"):
+            paragraph = Paragraph(element, doc)
+            yield paragraph.style.name if paragraph.style is not None else "", paragraph.text
+        elif element.tag == qn("w:tbl"):
+            for row in Table(element, doc).rows:
+                text = format_table_row(cell.text for cell in row.cells)
+                if text:
+                    yield "", text
+
+
+def iter_docx_units(file_path, max_chars=SOURCE_UNIT_MAX_CHARS):
+    """Yields (heading_path, text, page) for the sections of a .docx file; page is None."""
+    for heading_path, text in iter_sections(iter_docx_blocks(file_path), max_chars):
+        yield heading_path, text, None
+
+
+def normalize_pdf_text(text):
+    """Turns layout-mode page text into lines, with the column gaps of tables as TABLE_CELL_SEPARATOR."""
+    lines = []
+    for line in text.splitlines():
+        line = PDF_COLUMN_GAP.sub(TABLE_CELL_SEPARATOR, line.strip())
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def pdf_outline_headings(reader):
+    """
+    Maps 0-based page indexes to the heading path of the first outline entry starting on them.
+    """
+    starts = {}
+
+    def walk(items, parents):
+        title = None
+        for item in items:
+            if isinstance(item, list):
+                # A nested list holds the children of the entry before it.
+                if title is not None:
+                    walk(item, parents + [title])
+                continue
+            title = str(getattr(item, "title", "") or "").strip()
+            try:
+                page = reader.get_destination_page_number(item)
+            except Exception:
+                continue
+            if page is not None and title:
+                starts.setdefault(page, HEADING_PATH_SEPARATOR.join(parents + [title]))
+
+    try:
+        walk(reader.outline, [])
+    except Exception:
+        # A damaged outline only costs the heading paths, not the text.
+        return {}
+    return starts
+
+
+def iter_pdf_units(file_path, pages_per_reader=PDF_PAGES_PER_READER):
+    """
+    Yields (heading_path, text, page) for each page of a PDF that has text, page being 1-based.
+    Scanned pages without a text layer yield nothing.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    headings = pdf_outline_headings(reader)
+    heading_path = ""
+    for index in range(page_count):
+        if index and pages_per_reader and index % pages_per_reader == 0:
+            reader = PdfReader(file_path)
+        heading_path = headings.get(index, heading_path)
+        text = normalize_pdf_text(reader.pages[index].extract_text(extraction_mode="layout") or "")
+        if text:
+            yield heading_path, text + "\n", index + 1
+
+
+def iter_source_units(file_path):
+    """Yields (heading_path, text, page) units of a .docx or .pdf file, see the module comment."""
+    if file_path.lower().endswith(".pdf"):
+        return iter_pdf_units(file_path)
+    if file_path.lower().endswith(".docx"):
+        return iter_docx_units(file_path)
+    raise ValueError(f"Unsupported source file: {file_path}. Use one of {', '.join(SOURCE_EXTENSIONS)}.")
@@ -0,0 +1,128 @@
+import os
+import argparse
+
+import numpy as np
+
+
+# --- Embedding Backends ---
+# The embedding model used for queries (main.py) and for ingest (rag_builder.py):
+#   "huggingface" - sentence-transformers on PyTorch via langchain (the original backend);
+#   "onnx"        - the same model exported to ONNX and run with ONNX Runtime on CPU. It imports
+#                   in a fraction of the time and memory of PyTorch, and its vectors match the
+#                   huggingface ones (cosine > 0.999), so existing rag_db stores stay valid.
+# Export the ONNX model once with: python3 embedding_backends.py --export
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface").lower()
+EMBEDDING_BACKENDS = ("huggingface", "onnx")
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(os.path.dirname(__file__), "models", "all-MiniLM-L6-v2-onnx"))
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_TOKENIZER_FILE = "tokenizer.json"
+
+# ONNX Runtime threads per inference call; 0 lets ONNX Runtime use every core. With several
+# workers per host, set this to cores / workers so they do not oversubscribe the CPU.
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+
+# Same limits as the sentence-transformers pipeline of all-MiniLM-L6-v2.
+ONNX_MAX_SEQUENCE_LENGTH = 256
+ONNX_BATCH_SIZE = 32
+
+
+def mean_pool(token_embeddings, attention_mask):
+    """Mean of the token embeddings over the unmasked tokens, L2-normalized (sentence-transformers pooling)."""
+    mask = attention_mask[..., None].astype(np.float32)
+    pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+    return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+class OnnxEmbeddings:
+    """
+    Embeds texts with an ONNX export of a sentence-transformers model. Implements the
+    embed_documents/embed_query interface of langchain embeddings, so it can be passed to Chroma.
+    """
+    def __init__(self, model_dir=ONNX_MODEL_DIR, intra_op_threads=ONNX_INTRA_OP_THREADS, batch_size=ONNX_BATCH_SIZE):
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX model not found at {model_dir}. Please run embedding_backends.py --export first.")
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, ONNX_TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=ONNX_MAX_SEQUENCE_LENGTH)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        return mean_pool(token_embeddings, inputs["attention_mask"])
+
+    def embed_documents(self, texts):
+        """Embeds texts in batches of batch_size; returns a list of float lists."""
+        vectors = [self._embed_batch(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_embeddings(model_name, backend=None):
+    """
+    Creates the embedding model for the configured backend. The heavy imports happen here,
+    not when this module is imported.
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "huggingface":
+        from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "onnx":
+        return OnnxEmbeddings(ONNX_MODEL_DIR, ONNX_INTRA_OP_THREADS)
+    raise ValueError(f"Unknown embedding backend: {backend}. Use one of {', '.join(EMBEDDING_BACKENDS)}.")
+
+
+def export_onnx_model(model_name, output_dir=ONNX_MODEL_DIR):
+    """
+    Exports the sentence-transformers model to ONNX (model.onnx) with its fast tokenizer
+    (tokenizer.json). Needs torch and transformers, so it runs at build time, not in the app.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo).eval()
+    sample = tokenizer(["An example sentence.", "Another one."], padding=True, return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    os.makedirs(output_dir, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in input_names), os.path.join(output_dir, ONNX_MODEL_FILE),
+            input_names=input_names, output_names=["last_hidden_state"], dynamic_axes=dynamic_axes, opset_version=14,
+        )
+    tokenizer.save_pretrained(output_dir)
+    print(f"Exported {repo} to {output_dir}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exports the embedding model for the onnx embedding backend.")
+    parser.add_argument("--export", action="store_true", help="Export the model to ONNX_MODEL_DIR.")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+    if args.export:
+        export_onnx_model(args.model, args.output_dir)
+    else:
+        parser.print_help()
@@ -0,0 +1,176 @@
+import os
+import sys
+import atexit
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+# --- Query Embedding Cache Settings ---
+# Query vectors are reused across requests: the option buttons send the same strings all day,
+# and embedding is the most expensive local step of retrieval on a CPU-only host.
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+# Optional warm set: the most recently used vectors are written here at exit and loaded at startup.
+EMBEDDING_CACHE_WARM_PATH = os.getenv(
+    "EMBEDDING_CACHE_WARM_PATH", os.path.join(os.path.dirname(__file__), 'cache', 'query_embeddings.npz')
+)
+EMBEDDING_CACHE_WARM_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_WARM_MAX_ENTRIES", "1024"))
+EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "1").lower() not in ("0", "false", "no")
+
+
+def normalize_query(text):
+    """Canonical form of a query for the cache key: NFC, single spaces, no surrounding whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_embedding_key(model_name, text):
+    """Hashes the model name and normalized query text."""
+    canonical = f"{model_name}\x00{normalize_query(text)}"
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query text -> embedding vector, stored as float32 arrays.
+    Keys include the model name, so vectors from different models never mix.
+    """
+    def __init__(self, max_entries, enabled=True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "warm_loaded": 0}
+
+    def get(self, model_name, text):
+        """Returns the cached vector for text, or None on a miss."""
+        key = make_embedding_key(model_name, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return vector
+
+    def set(self, model_name, text, vector):
+        """
+        Stores a vector (as a read-only float32 array) and evicts the least recently used
+        entries. Returns the stored array.
+        """
+        vector = self._store(make_embedding_key(model_name, text), vector)
+        with self._lock:
+            self._stats["stores"] += 1
+        return vector
+
+    def _store(self, key, vector):
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False # Shared between requests, so callers must not modify it
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return vector
+
+    def get_or_embed(self, model_name, text, embed):
+        """
+        Returns the vector for text, calling embed() with the normalized text on a miss.
+        With the cache disabled, embed is always called.
+        """
+        if not self.enabled:
+            return np.asarray(embed(normalize_query(text)), dtype=np.float32)
+        vector = self.get(model_name, text)
+        if vector is None:
+            vector = self.set(model_name, text, embed(normalize_query(text)))
+        return vector
+
+    def get_or_embed_many(self, model_name, texts, embed_many):
+        """
+        Returns one vector per text. All misses (each distinct text once) are embedded with a
+        single embed_many(list_of_texts) call, i.e. one model forward pass.
+        """
+        vectors = [self.get(model_name, text) if self.enabled else None for text in texts]
+        missing = list(dict.fromkeys(normalize_query(text) for text, vector in zip(texts, vectors) if vector is None))
+        if not missing:
+            return vectors
+        embedded = {}
+        for text, vector in zip(missing, embed_many(missing)):
+            embedded[text] = self.set(model_name, text, vector) if self.enabled else np.asarray(vector, dtype=np.float32)
+        return [vector if vector is not None else embedded[normalize_query(text)] for text, vector in zip(texts, vectors)]
+
+    def save(self, path, max_entries):
+        """Writes the max_entries most recently used vectors to an .npz file; returns the count."""
+        with self._lock:
+            items = list(self._entries.items())[-max_entries:] if max_entries > 0 else []
+        if not items:
+            return 0
+        keys = np.array([key for key, _ in items])
+        vectors = np.stack([vector for _, vector in items])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, keys=keys, vectors=vectors)
+        os.replace(tmp_path, path)
+        return len(items)
+
+    def load(self, path):
+        """Loads a warm set written by save(); returns the number of vectors loaded."""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with np.load(path) as data:
+                keys, vectors = data["keys"], data["vectors"]
+        except Exception as e:
+            print(f"Query embedding warm set unreadable, ignoring it: {e}", file=sys.stderr)
+            return 0
+        for key, vector in zip(keys, vectors):
+            self._store(str(key), vector)
+        with self._lock:
+            self._stats["warm_loaded"] += len(keys)
+        return len(keys)
+
+    def clear(self):
+        """Empties the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the hit/miss counters for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = sum(vector.nbytes for vector in self._entries.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+
+QUERY_EMBEDDING_CACHE = QueryEmbeddingCache(EMBEDDING_CACHE_MAX_ENTRIES, enabled=EMBEDDING_CACHE_ENABLED)
+
+
+def load_warm_set():
+    """Loads the persisted warm set into QUERY_EMBEDDING_CACHE (once per process, at startup)."""
+    if not (EMBEDDING_CACHE_ENABLED and EMBEDDING_CACHE_PERSIST and EMBEDDING_CACHE_WARM_PATH):
+        return 0
+    return QUERY_EMBEDDING_CACHE.load(EMBEDDING_CACHE_WARM_PATH)
+
+
+def save_warm_set():
+    """Persists the most recently used vectors of QUERY_EMBEDDING_CACHE for the next start."""
+    if not (EMBEDDING_CACHE_ENABLED and EMBEDDING_CACHE_PERSIST and EMBEDDING_CACHE_WARM_PATH):
+        return 0
+    try:
+        return QUERY_EMBEDDING_CACHE.save(EMBEDDING_CACHE_WARM_PATH, EMBEDDING_CACHE_WARM_MAX_ENTRIES)
+    except OSError as e:
+        print(f"Query embedding warm set not saved: {e}", file=sys.stderr)
+        return 0
+
+
+atexit.register(save_warm_set)
@@ -0,0 +1,216 @@
+import os
+import time
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+# --- Ingest Pipeline Settings ---
+# Documents are parsed and chunked in a process pool; their chunks stream into an embedding
+# stage that embeds and writes them in fixed-size batches. Extraction is a stream too: a
+# document's chunks leave its worker in blocks of INGEST_BLOCK_SIZE as they are produced, through
+# a queue of at most INGEST_MAX_PENDING_BLOCKS blocks. At most INGEST_MAX_PENDING_SOURCES
+# documents are in flight, so memory stays flat as documents and the corpus grow.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+INGEST_MAX_PENDING_SOURCES = int(os.getenv("INGEST_MAX_PENDING_SOURCES", str(2 * INGEST_WORKERS)))
+INGEST_BLOCK_SIZE = int(os.getenv("INGEST_BLOCK_SIZE", "32"))
+INGEST_MAX_PENDING_BLOCKS = int(os.getenv("INGEST_MAX_PENDING_BLOCKS", str(2 * INGEST_WORKERS)))
+
+# Set in each worker process by _init_worker.
+_worker_blocks = None
+
+
+def iter_blocks(extract, source, block_size):
+    """
+    Runs extract(source) and yields (chunks, error, done) as its chunks are produced: blocks of
+    up to block_size chunks, the last one with done=True. On failure the last block is empty
+    and carries the error.
+    """
+    block = []
+    try:
+        for chunk in extract(source):
+            block.append(chunk)
+            if len(block) >= block_size:
+                yield block, None, False
+                block = []
+    except Exception as e:
+        yield [], e, True
+        return
+    yield block, None, True
+
+
+def _init_worker(blocks):
+    global _worker_blocks
+    _worker_blocks = blocks
+
+
+def _extract_to_queue(extract, source, block_size):
+    for chunks, error, done in iter_blocks(extract, source, block_size):
+        _worker_blocks.put((source, chunks, error, done))
+
+
+def iter_extracted(sources, extract, workers, max_pending_sources, block_size=INGEST_BLOCK_SIZE,
+                   max_pending_blocks=INGEST_MAX_PENDING_BLOCKS):
+    """
+    Yields (source, chunks, error, done) blocks as documents are extracted; each source ends
+    with one done=True block. Blocks of different sources interleave.
+    With more than one worker, extraction runs in a process pool (extract must be picklable,
+    e.g. a module-level function or a functools.partial of one), at most max_pending_sources
+    documents are in flight and at most max_pending_blocks blocks wait to be consumed.
+    """
+    if workers <= 1:
+        for source in sources:
+            for chunks, error, done in iter_blocks(extract, source, block_size):
+                yield source, chunks, error, done
+        return
+
+    context = multiprocessing.get_context()
+    blocks = context.Queue(maxsize=max(max_pending_blocks, 1))
+    source_iter = iter(sources)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(blocks,)) as pool:
+        pending = {} # source -> future
+
+        def submit_next():
+            for source in source_iter:
+                pending[source] = pool.submit(_extract_to_queue, extract, source, block_size)
+                return
+
+        try:
+            for _ in range(max(max_pending_sources, 1)):
+                submit_next()
+            while pending:
+                try:
+                    source, chunks, error, done = blocks.get(timeout=0.5)
+                except queue.Empty:
+                    # A worker that died (e.g. killed for memory) never sends its last block.
+                    for source, future in list(pending.items()):
+                        if future.done() and future.exception() is not None:
+                            del pending[source]
+                            yield source, [], future.exception(), True
+                            submit_next()
+                    continue
+                if source not in pending:
+                    continue
+                yield source, chunks, error, done
+                if done:
+                    del pending[source]
+                    submit_next()
+        finally:
+            # Stopped early (e.g. the embedder failed): unblock the workers so the pool can shut down.
+            for future in pending.values():
+                future.cancel()
+            while not all(future.done() for future in pending.values()):
+                try:
+                    blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+
+def run_ingest(sources, extract, embed, write, on_source_done=None, workers=INGEST_WORKERS,
+               batch_size=EMBED_BATCH_SIZE, max_pending_sources=INGEST_MAX_PENDING_SOURCES,
+               on_source_failed=None, block_size=INGEST_BLOCK_SIZE, max_pending_blocks=INGEST_MAX_PENDING_BLOCKS):
+    """
+    Runs the extract -> embed -> write pipeline over the given sources.
+
+    Args:
+        sources (list): Source names (e.g. file names) to ingest.
+        extract (callable): extract(source) -> iterable of (chunk_id, text, metadata); runs in the
+            process pool. A generator streams its chunks to the embedding stage as it yields them.
+        embed (callable): embed(texts) -> list of vectors, called once per batch.
+        write (callable): write(ids, texts, vectors, metadatas), called once per batch (bulk store write).
+        on_source_done (callable, optional): on_source_done(source, chunk_ids) once every chunk of
+            a source is written, e.g. to record it in the manifest.
+        workers (int): Extraction processes; 1 or less extracts in this process.
+        batch_size (int): Chunks per embedding call and store write.
+        max_pending_sources (int): Documents extracted ahead of the embedding stage.
+        on_source_failed (callable, optional): on_source_failed(source, chunk_ids) when a source
+            fails after some of its chunks were written, e.g. to delete them again.
+        block_size (int): Chunks per block sent from an extraction worker.
+        max_pending_blocks (int): Blocks waiting for the embedding stage.
+
+    Returns:
+        dict: Counters and throughput (docs/s, chunks/s, time per stage, failed sources).
+    """
+    stats = {
+        "docs": 0, "chunks": 0, "batches": 0, "failed": [],
+        "embed_seconds": 0.0, "write_seconds": 0.0, "peak_buffered_chunks": 0,
+    }
+    start = time.perf_counter()
+    batch = []          # (source, chunk_id, text, metadata)
+    remaining = {}      # source -> chunks not yet written
+    chunk_ids = {}      # source -> all chunk ids so far, until the source is done
+    extracted = set()   # sources whose last block has arrived
+
+    def finish_source(source):
+        del remaining[source]
+        extracted.discard(source)
+        stats["docs"] += 1
+        if on_source_done:
+            on_source_done(source, chunk_ids.pop(source))
+        else:
+            chunk_ids.pop(source)
+
+    def flush():
+        if not batch:
+            return
+        ids = [chunk_id for _, chunk_id, _, _ in batch]
+        texts = [text for _, _, text, _ in batch]
+        metadatas = [metadata for _, _, _, metadata in batch]
+        stage_start = time.perf_counter()
+        vectors = embed(texts)
+        stats["embed_seconds"] += time.perf_counter() - stage_start
+        stage_start = time.perf_counter()
+        write(ids, texts, vectors, metadatas)
+        stats["write_seconds"] += time.perf_counter() - stage_start
+        stats["batches"] += 1
+        stats["chunks"] += len(batch)
+        for source, _, _, _ in batch:
+            remaining[source] -= 1
+            if remaining[source] == 0 and source in extracted:
+                finish_source(source)
+        batch.clear()
+
+    def fail_source(source, error):
+        print(f"Error extracting text from {source}: {error}")
+        stats["failed"].append(source)
+        unwritten = {chunk_id for batch_source, chunk_id, _, _ in batch if batch_source == source}
+        batch[:] = [item for item in batch if item[0] != source]
+        written = [chunk_id for chunk_id in chunk_ids.pop(source, []) if chunk_id not in unwritten]
+        remaining.pop(source, None)
+        if written and on_source_failed:
+            on_source_failed(source, written)
+
+    blocks = iter_extracted(sources, extract, workers, max_pending_sources, block_size, max_pending_blocks)
+    for source, chunks, error, done in blocks:
+        if error is not None:
+            fail_source(source, error)
+            continue
+        remaining[source] = remaining.get(source, 0) + len(chunks)
+        chunk_ids.setdefault(source, []).extend(chunk_id for chunk_id, _, _ in chunks)
+        stats["peak_buffered_chunks"] = max(stats["peak_buffered_chunks"], sum(remaining.values()))
+        if done:
+            extracted.add(source)
+            if remaining[source] == 0:
+                finish_source(source)
+        for chunk_id, text, metadata in chunks:
+            batch.append((source, chunk_id, text, metadata))
+            if len(batch) >= batch_size:
+                flush()
+    flush()
+
+    elapsed = time.perf_counter() - start
+    stats["seconds"] = elapsed
+    stats["docs_per_second"] = stats["docs"] / elapsed if elapsed else 0.0
+    stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed else 0.0
+    return stats
+
+
+def format_ingest_stats(stats):
+    """One-line throughput summary for the build log."""
+    return (
+        f"{stats['docs']} docs, {stats['chunks']} chunks in {stats['seconds']:.1f}s "
+        f"({stats['docs_per_second']:.2f} docs/s, {stats['chunks_per_second']:.1f} chunks/s; "
+        f"embed {stats['embed_seconds']:.1f}s, write {stats['write_seconds']:.1f}s, "
+        f"peak {stats['peak_buffered_chunks']} buffered chunks)"
+    )
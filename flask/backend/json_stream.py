@@ -0,0 +1,120 @@
+import re
+import ast
+import json
+
+# Decoded values of the single-character JSON escapes.
+_JSON_ESCAPES = {
+    '"': '"', "'": "'", "\\": "\\", "/": "/",
+    "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t",
+}
+
+
+class JsonStringFieldExtractor:
+    """
+    Incrementally extracts the value of one string field from a JSON object that
+    arrives in pieces (e.g. a streamed chat completion), so the text can be shown
+    before the object is complete.
+
+    Usage:
+        extractor = JsonStringFieldExtractor("explanation")
+        for delta in stream:
+            text = extractor.feed(delta)  # newly decoded characters of the field, or ""
+    """
+    def __init__(self, field_name):
+        # The model sometimes follows the single-quoted example in the prompt.
+        self._key_pattern = re.compile(r'["\']%s["\']\s*:\s*(["\'])' % re.escape(field_name))
+        self._buffer = ""
+        self._quote = None
+        self._escape = None
+        self.done = False
+        self.value = ""
+
+    def feed(self, chunk):
+        """Consumes the next piece of raw JSON text and returns the newly decoded field text."""
+        if self.done:
+            return ""
+
+        if self._quote is None:
+            self._buffer += chunk
+            match = self._key_pattern.search(self._buffer)
+            if not match:
+                return ""
+            self._quote = match.group(1)
+            chunk = self._buffer[match.end():]
+            self._buffer = ""
+
+        decoded = []
+        for char in chunk:
+            if self._escape is not None:
+                self._escape += char
+                if self._escape.startswith("\\u"):
+                    # \uXXXX escapes may be split across chunks.
+                    if len(self._escape) < 6:
+                        continue
+                    try:
+                        decoded.append(chr(int(self._escape[2:], 16)))
+                    except ValueError:
+                        pass
+                else:
+                    decoded.append(_JSON_ESCAPES.get(char, char))
+                self._escape = None
+            elif char == "\\":
+                self._escape = "\\"
+            elif char == self._quote:
+                self.done = True
+                break
+            else:
+                decoded.append(char)
+
+        text = "".join(decoded)
+        self.value += text
+        return text
+
+
+# Matches a reply wrapped in a Markdown code fence, e.g. ```json { ... } ```
+_CODE_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL | re.IGNORECASE)
+
+
+def parse_model_json(text):
+    """
+    Parses the JSON object in a model reply, tolerating the usual deviations:
+    a surrounding code fence, text before or after the object, and single-quoted
+    keys/strings (the style of the example in JSON_RESPONSE_FORMAT_INSTRUCTION).
+
+    Raises:
+        json.JSONDecodeError: If no JSON object can be recovered from the text.
+    """
+    if not text:
+        raise json.JSONDecodeError("Empty response", text or "", 0)
+
+    candidate = text.strip()
+    fence = _CODE_FENCE_PATTERN.match(candidate)
+    if fence:
+        candidate = fence.group(1)
+
+    try:
+        parsed = json.loads(candidate)
+    except json.JSONDecodeError as e:
+        parsed = _recover_json_object(candidate, e)
+
+    if not isinstance(parsed, dict):
+        raise json.JSONDecodeError("Expected a JSON object", candidate, 0)
+    return parsed
+
+
+def _recover_json_object(candidate, error):
+    """Second-chance parsing for parse_model_json; re-raises error if nothing works."""
+    start, end = candidate.find("{"), candidate.rfind("}")
+    if start == -1 or end <= start:
+        raise error
+    candidate = candidate[start:end + 1]
+
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        return ast.literal_eval(candidate)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise error
@@ -0,0 +1,312 @@
+import os
+import re
+import json
+import heapq
+import shutil
+import threading
+
+import numpy as np
+from rag_metadata import matches_spec, spec_key
+from vector_index import replace_directory, JsonListFile, write_manifest
+
+
+# --- In-memory Keyword Index (BM25) ---
+# Keyword-heavy queries ("maximum number of pages for the proposal") are often ranked poorly by
+# MiniLM similarity alone. rag_builder.py writes an inverted index over the same chunks as the
+# vector store; RAG_CONTEXT_MANAGER ranks the chunks by BM25 as well and fuses both rankings by
+# reciprocal rank, so the exact passage makes it into a small k.
+#
+# Files in the index directory:
+#   postings.npz  term_offsets int64 [terms + 1], doc_ids int32 and term_freqs float32 [postings]
+#                 (the postings of term t are [term_offsets[t], term_offsets[t + 1])), doc_lengths
+#   index.json    terms, chunk ids, texts and metadata
+
+POSTINGS_FILE = "postings.npz"
+MANIFEST_FILE = "index.json"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOP_WORDS = frozenset((
+    "a an and are as at be by can do does for from how i in is it its may must of on or should "
+    "the their there this to was we what when where which who will with you your"
+).split())
+
+
+def _stem(token):
+    """Folds simple English plurals, so "pages" matches "page"."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lower-cased, plural-folded word tokens of a text, without stop words."""
+    return [_stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class KeywordIndexWriter:
+    """
+    Builds the inverted index block by block (see add), so an export pages through the vector
+    store instead of loading it. Each block's postings are sorted and spilled to a run file on
+    disk; close() merges the runs term by term into postings.npz, and the texts, ids and metadata
+    are streamed into the manifest. Use as a context manager, like VectorIndexWriter.
+    """
+    def __init__(self, index_dir):
+        self.index_dir = os.path.abspath(index_dir)
+        self.written = 0
+        self.tmp_dir = f"{self.index_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        self.runs_dir = os.path.join(self.tmp_dir, "runs")
+        os.makedirs(self.runs_dir)
+        self.runs = [] # (terms path, term_offsets, doc_ids, term_freqs) per spilled block
+        self._doc_lengths = open(os.path.join(self.runs_dir, "doc_lengths.bin"), "wb")
+        self._lists = {name: JsonListFile(os.path.join(self.tmp_dir, f"{name}.part")) for name in ("ids", "texts")}
+        self._metadatas = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self._discard()
+            return False
+        try:
+            self.close()
+        except BaseException:
+            self._discard()
+            raise
+        return False
+
+    def _discard(self):
+        """Drops the partly written index; the previous one stays in place."""
+        self._doc_lengths.close()
+        for list_file in list(self._lists.values()) + [self._metadatas]:
+            if list_file is not None:
+                list_file.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def add(self, ids, texts, metadatas=None):
+        """Indexes a block of chunks (with their metadata, if given) after the ones already added."""
+        if len(ids) != len(texts):
+            raise ValueError("ids and texts must have the same length.")
+        if not len(texts):
+            return
+        if self.written == 0 and metadatas is not None:
+            self._metadatas = JsonListFile(os.path.join(self.tmp_dir, "metadatas.part"))
+
+        postings = {}
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for offset, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[offset] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append((self.written + offset, count))
+        self._spill(postings)
+
+        self._doc_lengths.write(doc_lengths.tobytes())
+        self._lists["ids"].extend(ids)
+        self._lists["texts"].extend(texts)
+        if self._metadatas is not None:
+            self._metadatas.extend(metadatas if metadatas is not None else [None] * len(texts))
+        self.written += len(texts)
+
+    def _spill(self, postings):
+        """Writes one block's postings, sorted by term, as a run file."""
+        terms = sorted(postings)
+        run = os.path.join(self.runs_dir, f"run-{len(self.runs)}")
+        with open(f"{run}.terms", "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(term) + "\n" for term in terms)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        np.save(f"{run}.offsets.npy", term_offsets)
+        np.save(f"{run}.doc_ids.npy", np.array([position for term in terms for position, _ in postings[term]], dtype=np.int32))
+        np.save(f"{run}.term_freqs.npy", np.array([count for term in terms for _, count in postings[term]], dtype=np.float32))
+        self.runs.append(run)
+
+    def _merge_runs(self, terms_list):
+        """
+        Merges the runs into term-sorted postings arrays (memory-mapped, in runs_dir). Runs hold
+        ascending chunk positions, so a term's postings are its runs' postings in run order.
+        """
+        offsets = [np.load(f"{run}.offsets.npy", mmap_mode="r") for run in self.runs]
+        doc_ids = [np.load(f"{run}.doc_ids.npy", mmap_mode="r") for run in self.runs]
+        term_freqs = [np.load(f"{run}.term_freqs.npy", mmap_mode="r") for run in self.runs]
+        total = sum(int(run_offsets[-1]) for run_offsets in offsets)
+        merged_doc_ids = np.lib.format.open_memmap(os.path.join(self.runs_dir, "doc_ids.npy"), mode="w+", dtype=np.int32, shape=(total,))
+        merged_freqs = np.lib.format.open_memmap(os.path.join(self.runs_dir, "term_freqs.npy"), mode="w+", dtype=np.float32, shape=(total,))
+
+        def run_terms(index, run):
+            with open(f"{run}.terms", "r", encoding="utf-8") as f:
+                for position, line in enumerate(f):
+                    yield json.loads(line), index, position
+
+        written = 0
+        with open(os.path.join(self.runs_dir, "term_offsets.bin"), "wb") as term_offsets:
+            term_offsets.write(np.int64(0).tobytes())
+            current = None
+            for term, index, position in heapq.merge(*(run_terms(index, run) for index, run in enumerate(self.runs))):
+                if term != current:
+                    if current is not None:
+                        term_offsets.write(np.int64(written).tobytes())
+                    terms_list.extend([term])
+                    current = term
+                start, end = int(offsets[index][position]), int(offsets[index][position + 1])
+                merged_doc_ids[written:written + end - start] = doc_ids[index][start:end]
+                merged_freqs[written:written + end - start] = term_freqs[index][start:end]
+                written += end - start
+            if current is not None:
+                term_offsets.write(np.int64(written).tobytes())
+        merged_doc_ids.flush()
+        merged_freqs.flush()
+        return np.fromfile(os.path.join(self.runs_dir, "term_offsets.bin"), dtype=np.int64), merged_doc_ids, merged_freqs
+
+    def close(self):
+        """Merges the runs, writes postings.npz and the manifest, and swaps the index in."""
+        self._doc_lengths.close()
+        terms = JsonListFile(os.path.join(self.tmp_dir, "terms.part"))
+        term_offsets, doc_ids, term_freqs = self._merge_runs(terms)
+        doc_lengths = np.fromfile(os.path.join(self.runs_dir, "doc_lengths.bin"), dtype=np.float32)
+        # np.savez copies the memory-mapped arrays into the archive in chunks.
+        np.savez(os.path.join(self.tmp_dir, POSTINGS_FILE), term_offsets=term_offsets, doc_ids=doc_ids,
+                 term_freqs=term_freqs, doc_lengths=doc_lengths)
+        del doc_ids, term_freqs
+        write_manifest(os.path.join(self.tmp_dir, MANIFEST_FILE), {}, {
+            "terms": terms, "ids": self._lists["ids"], "texts": self._lists["texts"], "metadatas": self._metadatas,
+        })
+        shutil.rmtree(self.runs_dir)
+        replace_directory(self.tmp_dir, self.index_dir)
+
+
+def write_keyword_index(index_dir, ids, texts, metadatas=None):
+    """
+    Builds the inverted index for the given chunks and writes it next to the vector index,
+    swapped in like write_vector_index. Large exports add the chunks in blocks with
+    KeywordIndexWriter.
+
+    Returns:
+        int: The number of chunks indexed.
+    """
+    if len(ids) != len(texts):
+        raise ValueError("ids and texts must have the same length.")
+    with KeywordIndexWriter(index_dir) as writer:
+        writer.add(ids, texts, metadatas=metadatas)
+    return len(texts)
+
+
+class KeywordIndex:
+    """
+    BM25 ranking over an index written by write_keyword_index, held in memory.
+    """
+    def __init__(self, index_dir, k1=BM25_K1, b=BM25_B):
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Keyword index not found at {index_dir}. Please run rag_builder.py first.")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with np.load(os.path.join(index_dir, POSTINGS_FILE)) as postings:
+            self.term_offsets = postings["term_offsets"]
+            self.doc_ids = postings["doc_ids"]
+            self.term_freqs = postings["term_freqs"]
+            doc_lengths = postings["doc_lengths"]
+
+        self.index_dir = index_dir
+        self.ids = manifest["ids"]
+        self.texts = manifest["texts"]
+        self.metadatas = manifest.get("metadatas") or [None] * len(self.ids)
+        self.term_ids = {term: i for i, term in enumerate(manifest["terms"])}
+
+        # Everything that does not depend on the query is computed once.
+        count = len(self.ids)
+        document_freqs = np.diff(self.term_offsets).astype(np.float32)
+        self.idf = np.log1p((count - document_freqs + 0.5) / (document_freqs + 0.5))
+        average_length = float(doc_lengths.mean()) if count else 0.0
+        self.length_norm = k1 * (1 - b + b * doc_lengths / max(average_length, 1e-12))
+        self.k1 = k1
+
+        # Filtered candidate masks, one per retrieval spec.
+        self._masks = {}
+        self._masks_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidate_mask(self, spec):
+        """Boolean mask of the chunks matching a retrieval spec; built once per spec, None for no filter."""
+        key = spec_key(spec)
+        if key is None:
+            return None
+        with self._masks_lock:
+            mask = self._masks.get(key)
+            if mask is None:
+                mask = np.array([matches_spec(metadata, spec) for metadata in self.metadatas], dtype=bool)
+                self._masks[key] = mask
+            return mask
+
+    def scores(self, query):
+        """BM25 score of every chunk for a query (0 for chunks sharing no term with it)."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * freqs * (self.k1 + 1) / (freqs + self.length_norm[docs])
+        return scores
+
+    def search(self, queries, k, spec=None):
+        """
+        Top-k BM25 search for a batch of queries.
+
+        Args:
+            queries (list): Query strings.
+            k (int): Results per query.
+            spec (dict, optional): A retrieval spec (see rag_metadata.py); only matching chunks are ranked.
+
+        Returns:
+            list: One (positions, scores) pair per query, best match first; chunks without any
+                  query term are left out, so a query may get fewer than k results.
+        """
+        mask = self.candidate_mask(spec)
+        results = []
+        for query in queries:
+            scores = self.scores(query)
+            if mask is not None:
+                scores[~mask] = 0
+            hits = np.flatnonzero(scores > 0)
+            if 0 < k < len(hits):
+                hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+            elif k <= 0:
+                hits = hits[:0]
+            # Best first; ties go to the earlier chunk so results are deterministic.
+            hits = hits[np.lexsort((hits, -scores[hits]))]
+            results.append((hits, scores[hits]))
+        return results
+
+    def search_texts(self, queries, k, spec=None):
+        """Like search, but returns the chunk texts per query."""
+        return [[self.texts[position] for position in positions] for positions, _ in self.search(queries, k, spec)]
+
+
+def reciprocal_rank_fusion(rankings, limit, rrf_k=60):
+    """
+    Fuses several best-first rankings of the same items (e.g. chunk texts) by reciprocal rank:
+    an item scores sum(1 / (rrf_k + rank)) over the rankings it appears in.
+
+    Returns:
+        list: The top `limit` items, best first; ties keep the order of first appearance.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (rrf_k + rank)
+    # Python's sort is stable and dicts keep insertion order, so equal scores keep first-seen order.
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
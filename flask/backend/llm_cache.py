@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from single_flight import LLM_FLIGHTS
+
+
+# --- Cache Settings ---
+# Two tiers: a per-process in-memory LRU in front of an on-disk SQLite table that is
+# shared by every worker process on the host.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+LLM_CACHE_DB_PATH = os.getenv(
+    "LLM_CACHE_DB_PATH", os.path.join(os.path.dirname(__file__), 'cache', 'llm_cache.sqlite3')
+)
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_MAX_ENTRIES", "512"))
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "20000"))
+
+# Only these request fields affect the completion text, so only they go into the key.
+CACHE_KEY_FIELDS = ("model", "messages", "temperature", "max_tokens", "response_format")
+
+
+def make_cache_key(request_kwargs):
+    """
+    Hashes the fields of a chat completion request that determine its output
+    (deployment, messages, temperature, max_tokens and response_format).
+    """
+    key_data = {field: request_kwargs.get(field) for field in CACHE_KEY_FIELDS}
+    canonical = json.dumps(key_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Completion cache with an in-memory LRU tier and an on-disk SQLite tier.
+    Entries expire after ttl_seconds; each tier is trimmed to its own size limit.
+    """
+    def __init__(self, db_path, ttl_seconds, memory_max_entries, disk_max_entries, enabled=True):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.memory_max_entries = memory_max_entries
+        self.disk_max_entries = disk_max_entries
+        self.enabled = enabled
+
+        # _lock guards the memory tier and the counters; _disk_lock serializes the SQLite
+        # connection, so a memory hit never waits behind a disk read or write.
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._conn = None
+        self._conn_pid = None
+        self._stats = {
+            "memory_hits": 0, "disk_hits": 0, "misses": 0,
+            "stores": 0, "expired": 0, "memory_evictions": 0, "disk_evictions": 0,
+        }
+
+    def _get_connection(self):
+        """Opens the SQLite tier lazily, once per process (connections must not cross a fork)."""
+        pid = os.getpid()
+        if self._conn is not None and self._conn_pid == pid:
+            return self._conn
+        if not self.db_path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, content TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions (last_access)")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"LLM cache disk tier unavailable, using memory only: {e}", file=sys.stderr)
+            self.db_path = None
+            return None
+        self._conn = conn
+        self._conn_pid = pid
+        return conn
+
+    def _remember(self, key, content, created_at):
+        """Inserts into the memory tier and evicts the least recently used entries."""
+        self._memory[key] = (content, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+            self._stats["memory_evictions"] += 1
+
+    def _memory_get(self, key, now):
+        """Returns the content for key from the memory tier, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            content, created_at = entry
+            if now - created_at <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return content
+            del self._memory[key]
+            self._stats["expired"] += 1
+            return None
+
+    def _disk_get(self, key, now):
+        """
+        Returns the content for key from the SQLite tier, or None (counted as the miss).
+        Runs under _disk_lock only, so memory-tier lookups never wait for the disk.
+        """
+        content, created_at, expired = None, None, False
+        with self._disk_lock:
+            conn = self._get_connection()
+            if conn is not None:
+                try:
+                    row = conn.execute(
+                        "SELECT content, created_at FROM completions WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        content, created_at = row
+                        if now - created_at <= self.ttl_seconds:
+                            conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+                        else:
+                            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                            content, expired = None, True
+                        conn.commit()
+                except sqlite3.Error as e:
+                    print(f"LLM cache read failed: {e}", file=sys.stderr)
+                    content = None
+
+        with self._lock:
+            if expired:
+                self._stats["expired"] += 1
+            if content is None:
+                self._stats["misses"] += 1
+                return None
+            self._remember(key, content, created_at)
+            self._stats["disk_hits"] += 1
+            return content
+
+    def _disk_set(self, key, content, now):
+        """Writes content under key to the SQLite tier and trims it, under _disk_lock only."""
+        evicted = 0
+        with self._disk_lock:
+            conn = self._get_connection()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO completions (key, content, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, content, now, now),
+                )
+                # Size-based eviction: drop expired rows, then the least recently used overflow.
+                conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,))
+                overflow = conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0] - self.disk_max_entries
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM completions WHERE key IN "
+                        "(SELECT key FROM completions ORDER BY last_access ASC LIMIT ?)",
+                        (overflow,),
+                    )
+                    evicted = overflow
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache write failed: {e}", file=sys.stderr)
+        if evicted:
+            with self._lock:
+                self._stats["disk_evictions"] += evicted
+
+    def _memory_set(self, key, content, now):
+        """Stores content under key in the memory tier."""
+        with self._lock:
+            self._remember(key, content, now)
+            self._stats["stores"] += 1
+
+    def get(self, key):
+        """Returns the cached content for key, or None on a miss."""
+        now = time.time()
+        content = self._memory_get(key, now)
+        if content is not None:
+            return content
+        return self._disk_get(key, now)
+
+    def set(self, key, content):
+        """Stores content under key in both tiers."""
+        now = time.time()
+        self._memory_set(key, content, now)
+        self._disk_set(key, content, now)
+
+    async def aget(self, key):
+        """Coroutine counterpart of get: the SQLite tier is read in a worker thread."""
+        now = time.time()
+        content = self._memory_get(key, now)
+        if content is not None:
+            return content
+        return await asyncio.to_thread(self._disk_get, key, now)
+
+    async def aset(self, key, content):
+        """Coroutine counterpart of set: the SQLite tier is written in a worker thread."""
+        now = time.time()
+        self._memory_set(key, content, now)
+        await asyncio.to_thread(self._disk_set, key, content, now)
+
+    def clear(self):
+        """Empties both tiers."""
+        with self._lock:
+            self._memory.clear()
+        with self._disk_lock:
+            conn = self._get_connection()
+            if conn is not None:
+                conn.execute("DELETE FROM completions")
+                conn.commit()
+
+    def stats(self):
+        """Returns the hit/miss counters for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+
+LLM_CACHE = LLMResponseCache(
+    LLM_CACHE_DB_PATH,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+    memory_max_entries=LLM_CACHE_MEMORY_MAX_ENTRIES,
+    disk_max_entries=LLM_CACHE_DISK_MAX_ENTRIES,
+    enabled=LLM_CACHE_ENABLED,
+)
+
+
+def cached_chat_completion(client, use_cache=True, validate=None, **kwargs):
+    """
+    Returns the message content of a chat completion, served from LLM_CACHE when possible.
+
+    Args:
+        client (AzureOpenAI): The shared client.
+        use_cache (bool): Set to False to bypass the cache for this call.
+        validate (callable, optional): Only responses for which validate(content) is true are
+            stored, so e.g. malformed JSON is never replayed from the cache.
+        **kwargs: Arguments for client.chat.completions.create.
+
+    Returns:
+        str: The completion text.
+    """
+    if not (use_cache and LLM_CACHE.enabled):
+        return client.chat.completions.create(**kwargs).choices[0].message.content
+
+    key = make_cache_key(kwargs)
+    content = LLM_CACHE.get(key)
+    if content is not None:
+        return content
+
+    def fetch():
+        content = client.chat.completions.create(**kwargs).choices[0].message.content
+        if content is not None and (validate is None or validate(content)):
+            LLM_CACHE.set(key, content)
+        return content
+
+    # Concurrent misses for the same key share one upstream call.
+    return LLM_FLIGHTS.do(key, fetch)
+
+
+async def async_cached_chat_completion(client, use_cache=True, validate=None, **kwargs):
+    """
+    Coroutine counterpart of cached_chat_completion for an AsyncAzureOpenAI client.
+    The SQLite tier is read and written in a worker thread, so it never blocks the event loop.
+    """
+    if not (use_cache and LLM_CACHE.enabled):
+        completion = await client.chat.completions.create(**kwargs)
+        return completion.choices[0].message.content
+
+    key = make_cache_key(kwargs)
+    content = await LLM_CACHE.aget(key)
+    if content is not None:
+        return content
+
+    async def fetch():
+        completion = await client.chat.completions.create(**kwargs)
+        content = completion.choices[0].message.content
+        if content is not None and (validate is None or validate(content)):
+            await LLM_CACHE.aset(key, content)
+        return content
+
+    return await LLM_FLIGHTS.ado(key, fetch)
@@ -0,0 +1,194 @@
+import os
+import asyncio
+import threading
+import httpx
+from openai import AzureOpenAI, AsyncAzureOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+
+# --- Connection Pool Settings ---
+# One AzureOpenAI client (and therefore one HTTP connection pool) is shared by every
+# agent in the process, so chat turns reuse warm keep-alive connections instead of
+# paying for a new TLS handshake on every call.
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "60"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+# The async serving mode multiplexes many chats over one event loop, so its pool is larger.
+LLM_ASYNC_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_ASYNC_POOL_MAX_CONNECTIONS", "200"))
+LLM_ASYNC_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_ASYNC_POOL_MAX_KEEPALIVE", "50"))
+
+_client_lock = threading.Lock()
+_client = None
+_client_config = None
+_client_pid = None
+_client_stats = {"clients_created": 0, "client_reuses": 0}
+_async_client = None
+_async_client_key = None
+_async_client_loop = None
+_async_client_closing = set()
+_async_client_stats = {"clients_created": 0, "client_reuses": 0, "clients_closed": 0}
+
+
+def _reset_after_fork():
+    """
+    Drops the parent's client in a freshly forked child (e.g. a gunicorn worker).
+    Sockets inherited from the parent must not be shared, so the child builds its own pool.
+    """
+    global _client_lock, _client, _client_config, _client_pid, _async_client, _async_client_key, _async_client_loop
+    _client_lock = threading.Lock()
+    _client = None
+    _client_config = None
+    _client_pid = None
+    _client_stats["clients_created"] = 0
+    _client_stats["client_reuses"] = 0
+    _async_client = None
+    _async_client_key = None
+    _async_client_loop = None
+    _async_client_closing.clear()
+    _async_client_stats["clients_created"] = 0
+    _async_client_stats["client_reuses"] = 0
+    _async_client_stats["clients_closed"] = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _build_http_client():
+    """Creates the pooled keep-alive HTTP client used underneath the AzureOpenAI client."""
+    return DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+        ),
+        timeout=LLM_REQUEST_TIMEOUT,
+    )
+
+
+def get_client(api_key, azure_endpoint, api_version):
+    """
+    Returns the process-wide AzureOpenAI client, creating it on first use.
+
+    The client is rebuilt if the configuration changes or if the current process is
+    not the one that created it, so forked workers never share sockets.
+
+    Args:
+        api_key (str): Azure OpenAI API key.
+        azure_endpoint (str): Azure OpenAI endpoint URL.
+        api_version (str): Azure OpenAI API version.
+
+    Returns:
+        AzureOpenAI: The shared client instance.
+    """
+    global _client, _client_config, _client_pid
+    config = (api_key, azure_endpoint, api_version)
+    pid = os.getpid()
+
+    with _client_lock:
+        if _client is not None and _client_config == config and _client_pid == pid:
+            _client_stats["client_reuses"] += 1
+            return _client
+
+        if _client is not None and _client_pid == pid:
+            # Configuration changed in this process; release the old pool.
+            try:
+                _client.close()
+            except Exception:
+                pass
+
+        _client = AzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=azure_endpoint,
+            api_version=api_version,
+            http_client=_build_http_client(),
+        )
+        _client_config = config
+        _client_pid = pid
+        _client_stats["clients_created"] += 1
+        return _client
+
+
+async def _close_async_client(client):
+    """Closes a replaced async client; its pool may already be unusable, so errors are ignored."""
+    try:
+        await client.close()
+    except Exception:
+        pass
+    with _client_lock:
+        _async_client_stats["clients_closed"] += 1
+
+
+def _release_async_client(client, loop):
+    """
+    Schedules the close of a replaced async client, on the loop that opened its connections
+    if that loop is still running elsewhere, otherwise on the current loop.
+    """
+    running = asyncio.get_running_loop()
+    if loop is not running and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(_close_async_client(client), loop)
+        return
+    # Keep a reference until the close finishes, so the task is not garbage collected.
+    task = running.create_task(_close_async_client(client))
+    _async_client_closing.add(task)
+    task.add_done_callback(_async_client_closing.discard)
+
+
+def get_async_client(api_key, azure_endpoint, api_version):
+    """
+    Returns the process-wide AsyncAzureOpenAI client for the running event loop.
+
+    Async connections belong to the loop that opened them, so the client is rebuilt if it
+    is requested from a different loop, process or configuration. The replaced client is
+    closed (see _release_async_client) unless it was inherited from another process.
+    Must be called from a coroutine.
+
+    Returns:
+        AsyncAzureOpenAI: The shared async client instance.
+    """
+    global _async_client, _async_client_key, _async_client_loop
+    key = (api_key, azure_endpoint, api_version, os.getpid())
+    loop = asyncio.get_running_loop()
+
+    with _client_lock:
+        if _async_client is not None and _async_client_key == key and _async_client_loop is loop:
+            _async_client_stats["client_reuses"] += 1
+            return _async_client
+
+        if _async_client is not None and _async_client_key[3] == key[3]:
+            _release_async_client(_async_client, _async_client_loop)
+
+        _async_client = AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=azure_endpoint,
+            api_version=api_version,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_ASYNC_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_ASYNC_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+                ),
+                timeout=LLM_REQUEST_TIMEOUT,
+            ),
+        )
+        _async_client_key = key
+        _async_client_loop = loop
+        _async_client_stats["clients_created"] += 1
+        return _async_client
+
+
+def get_client_stats():
+    """Returns a snapshot of the client pool counters for the metrics endpoint."""
+    with _client_lock:
+        return {
+            "pid": os.getpid(),
+            "clients_created": _client_stats["clients_created"],
+            "client_reuses": _client_stats["client_reuses"],
+            "pool_max_connections": LLM_POOL_MAX_CONNECTIONS,
+            "pool_max_keepalive": LLM_POOL_MAX_KEEPALIVE,
+            "pool_keepalive_expiry": LLM_POOL_KEEPALIVE_EXPIRY,
+            "async_clients_created": _async_client_stats["clients_created"],
+            "async_client_reuses": _async_client_stats["client_reuses"],
+            "async_clients_closed": _async_client_stats["clients_closed"],
+            "async_pool_max_connections": LLM_ASYNC_POOL_MAX_CONNECTIONS,
+        }
@@ -1,16 +1,28 @@
 import os
 import json
-from openai import AzureOpenAI
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-#library for RAG
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-
-
-
 # Import SYSTEM_PROMPTS from the prompts.py file 
-from prompts import SYSTEM_PROMPTS, SUMMARY_AGENT_SYSTEM_MESSAGE, SUGGESTIONS_AGENT_SYSTEM_MESSAGE
+from prompts import SYSTEM_PROMPTS, SUMMARY_AGENT_SYSTEM_MESSAGE, SUGGESTIONS_AGENT_SYSTEM_MESSAGE, INTEGRATOR_SYNTHESIS_INSTRUCTION
+from llm_client import get_client, get_async_client
+from llm_cache import LLM_CACHE, cached_chat_completion, async_cached_chat_completion, make_cache_key
+from json_stream import JsonStringFieldExtractor, parse_model_json
+from embedding_cache import QUERY_EMBEDDING_CACHE, load_warm_set
+from vector_index import NumpyVectorIndex
+from keyword_index import KeywordIndex, reciprocal_rank_fusion
+from embedding_backends import make_embeddings, EMBEDDING_BACKEND
+from rag_metadata import retrieval_spec, build_chroma_where
+from context_compression import compress_chunks, record_compression
+from retrieval_planner import RETRIEVAL_PLANNER, min_score
+from semantic_cache import SEMANTIC_CACHE, summary_hash
+from token_budget import (
+    PROMPT_TOKEN_CEILING, count_tokens, truncate_to_tokens, fit_chunks, compact_summary,
+    share_budget, get_budget, record_sections, parse_client_summaries, load_encoding
+)
 
 
 # Load environment variables and initialize the client ONCE when the script starts.
@@ -35,46 +47,698 @@ except Exception as e:
     print(f"Configuration Error during main.py init: {e}", file=os.sys.stderr)
 
 
+def get_azure_client():
+    """
+    Returns the shared, connection-pooled AzureOpenAI client for all agents.
+    Raises ValueError if the Azure configuration is incomplete.
+    """
+    if not all([AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_DEPLOYMENT_NAME]):
+        raise ValueError("Azure OpenAI configuration is incomplete. Check environment variables.")
+    return get_client(AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION)
+
+
+def get_async_azure_client():
+    """
+    Returns the shared AsyncAzureOpenAI client for the running event loop (async serving mode).
+    Raises ValueError if the Azure configuration is incomplete.
+    """
+    if not all([AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_DEPLOYMENT_NAME]):
+        raise ValueError("Azure OpenAI configuration is incomplete. Check environment variables.")
+    return get_async_client(AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION)
+
 
 
 # --- RAG Context Manager ---
 VECTOR_DB_PATH = os.path.join(os.path.dirname(__file__), 'rag_db')
+# Memory-mappable export of the same vectors, written by rag_builder.py (see vector_index.py).
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", os.path.join(VECTOR_DB_PATH, 'numpy_index'))
+
+# BM25 inverted index over the same chunks, written by rag_builder.py (see keyword_index.py).
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", os.path.join(VECTOR_DB_PATH, 'keyword_index'))
+
+# Where the nearest-neighbour search runs:
+#   "chroma" - the Chroma store (SQLite + HNSW) in VECTOR_DB_PATH;
+#   "numpy"  - exact search with one matrix-vector product over the memory-mapped VECTOR_INDEX_PATH,
+#              shared by all worker processes on the host.
+RAG_RETRIEVER_BACKEND = os.getenv("RAG_RETRIEVER_BACKEND", "chroma").lower()
+
+# When to load the embedding model and open the vector store:
+#   "background" - start loading in a daemon thread at import, so requests are not delayed by it
+#                  and the app can serve (e.g. the initial questions) while it loads;
+#   "lazy"       - load on the first retrieval;
+#   "eager"      - load at import, before the app serves anything (the original behaviour).
+RAG_WARMUP_MODE = os.getenv("RAG_WARMUP_MODE", "background").lower()
+
+# Number of chunks retrieved per query.
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+
+# Hybrid retrieval: rank the chunks by BM25 as well and fuse both rankings by reciprocal rank.
+# Each ranking contributes its top RAG_HYBRID_CANDIDATES; RAG_RRF_K damps the weight of the top ranks.
+# Without a keyword index (a store built before it existed) retrieval stays vector-only.
+RAG_HYBRID_SEARCH = os.getenv("RAG_HYBRID_SEARCH", "1").lower() not in ("0", "false", "no")
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# Restrict each purpose's search to the tags/sources declared under "retrieval" in SYSTEM_PROMPTS.
+RAG_PURPOSE_FILTERS = os.getenv("RAG_PURPOSE_FILTERS", "1").lower() not in ("0", "false", "no")
+
+# Embed the option button texts during the background warm-up, so clicking one never waits
+# for the model.
+RAG_WARMUP_OPTION_QUERIES = os.getenv("RAG_WARMUP_OPTION_QUERIES", "1").lower() not in ("0", "false", "no")
+
+def option_queries():
+    """The option button texts of every step purpose; they are sent verbatim as queries."""
+    return [option for config in SYSTEM_PROMPTS.values() for option in config.get("options") or []]
+
 class RAG_CONTEXT_MANAGER:
     """
     Manages the RAG pipeline by loading the vector store and retrieving relevant
     documents based on a user query.
+
+    The embedding model and the vector store (and the langchain imports they need) are
+    loaded on first use or by start_warmup(), not when the manager is created, so importing
+    main.py stays cheap.
     """
-    def __init__(self, vector_db_path, embedding_model_name="all-MiniLM-L6-v2"):
+    def __init__(self, vector_db_path, embedding_model_name="all-MiniLM-L6-v2", k=RAG_TOP_K,
+                 backend=None, vector_index_path=None, keyword_index_path=None, hybrid=None):
         if not os.path.exists(vector_db_path):
             raise FileNotFoundError(f"Vector database not found at {vector_db_path}. Please run rag_builder.py first.")
-        
-        self.embeddings_model = HuggingFaceEmbeddings(
-            model_name=embedding_model_name
-        )
-        self.vector_store = Chroma(
-            persist_directory=vector_db_path,
-            embedding_function=self.embeddings_model
+
+        self.vector_db_path = vector_db_path
+        self.embedding_model_name = embedding_model_name
+        self.k = k
+        self.backend = backend or RAG_RETRIEVER_BACKEND
+        if self.backend not in ("chroma", "numpy"):
+            raise ValueError(f"Unknown RAG retriever backend: {self.backend}")
+        self.vector_index_path = vector_index_path or os.path.join(vector_db_path, 'numpy_index')
+        self.keyword_index_path = keyword_index_path or os.path.join(vector_db_path, 'keyword_index')
+        self.hybrid = RAG_HYBRID_SEARCH if hybrid is None else hybrid
+        self.embeddings_model = None
+        self.vector_store = None
+        self.vector_index = None
+        self.keyword_index = None
+        self.load_seconds = None
+        self.load_error = None
+
+        self._load_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"filtered_searches": 0, "filter_fallbacks": 0, "below_min_score": 0, "kept_by_keywords": 0}
+
+    @property
+    def ready(self):
+        """True once the embedding model and vector store are loaded."""
+        return self._ready.is_set()
+
+    def load(self):
+        """
+        Loads the embedding model and opens the vector store. Safe to call from several
+        threads; callers arriving during a load wait for it instead of loading again.
+        """
+        if self._ready.is_set():
+            return
+        with self._load_lock:
+            if self._ready.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                # langchain, sentence-transformers and chromadb are imported here (and in
+                # make_embeddings): they take seconds to import.
+                if self.backend == "numpy":
+                    self.vector_index = NumpyVectorIndex(self.vector_index_path)
+                    if self.vector_index.model_name != self.embedding_model_name:
+                        raise ValueError(
+                            f"Vector index at {self.vector_index_path} was built with {self.vector_index.model_name}, "
+                            f"not {self.embedding_model_name}. Please run rag_builder.py again."
+                        )
+                self.embeddings_model = make_embeddings(self.embedding_model_name)
+                if self.backend == "chroma":
+                    from langchain_chroma import Chroma
+                    self.vector_store = Chroma(
+                        persist_directory=self.vector_db_path,
+                        embedding_function=self.embeddings_model
+                    )
+                if self.hybrid:
+                    try:
+                        self.keyword_index = KeywordIndex(self.keyword_index_path)
+                    except FileNotFoundError as e:
+                        print(f"Hybrid retrieval disabled: {e}", file=os.sys.stderr)
+                load_warm_set()
+            except Exception as e:
+                self.load_error = str(e)
+                raise
+            self.load_error = None
+            self.load_seconds = time.perf_counter() - start
+            self._ready.set()
+
+    def _warmup(self):
+        try:
+            self.load()
+            if RAG_WARMUP_OPTION_QUERIES:
+                self.warm_query_cache(option_queries())
+            print(f"RAG warm-up finished in {self.load_seconds:.1f}s.", file=os.sys.stderr)
+        except Exception as e:
+            print(f"RAG warm-up failed, will retry on first use: {e}", file=os.sys.stderr)
+
+    def start_warmup(self):
+        """Starts loading in a background daemon thread (once per process); returns the thread."""
+        with self._warmup_lock:
+            if self._warmup_thread is None or not self._warmup_thread.is_alive():
+                if not self._ready.is_set():
+                    self._warmup_thread = threading.Thread(target=self._warmup, name="rag-warmup", daemon=True)
+                    self._warmup_thread.start()
+            return self._warmup_thread
+
+    def stats(self):
+        """Returns the loading state for the metrics and readiness endpoints."""
+        return {
+            "ready": self.ready,
+            "backend": self.backend,
+            "embedding_backend": EMBEDDING_BACKEND,
+            "hybrid": self.keyword_index is not None,
+            "vector_dtype": self.vector_index.dtype if self.vector_index is not None else None,
+            "warmup_mode": RAG_WARMUP_MODE,
+            "load_seconds": self.load_seconds,
+            "load_error": self.load_error,
+            **self._stats,
+        }
+
+    def embed_queries(self, queries):
+        """
+        Returns one query vector per query. Queries not in QUERY_EMBEDDING_CACHE are embedded
+        together in one model forward pass.
+        """
+        self.load()
+        return QUERY_EMBEDDING_CACHE.get_or_embed_many(self.embedding_model_name, queries, self.embeddings_model.embed_documents)
+
+    def embed_query(self, query):
+        """Returns the query vector, from QUERY_EMBEDDING_CACHE when the query was seen before."""
+        return self.embed_queries([query])[0]
+
+    def search_vectors(self, query_vectors, k, spec=None):
+        """
+        Nearest-neighbour search for several query vectors in one store query; best match first.
+        spec (see rag_metadata.py) limits the search to chunks with matching tags or sources.
+
+        Returns:
+            tuple: (chunk texts, cosine similarities), one list of each per query.
+        """
+        if self.backend == "numpy":
+            positions, scores = self.vector_index.search(query_vectors, k, spec)
+            return [[self.vector_index.text(position) for position in row] for row in positions], scores.tolist()
+        collection = self.vector_store._collection
+        result = collection.query(
+            query_embeddings=[vector.tolist() for vector in query_vectors],
+            n_results=k,
+            where=build_chroma_where(spec),
+            include=["documents", "distances"],
         )
-        self.retriever = self.vector_store.as_retriever()
+        # The stored vectors are normalized, so every Chroma distance maps back to a cosine.
+        space = (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+        to_cosine = (lambda distance: 1.0 - distance / 2.0) if space == "l2" else (lambda distance: 1.0 - distance)
+        return result["documents"], [[to_cosine(distance) for distance in row] for row in result["distances"]]
+
+    def search_by_vectors(self, query_vectors, k, spec=None):
+        """Like search_vectors, but returns only the chunk texts."""
+        return self.search_vectors(query_vectors, k, spec)[0]
+
+    def search(self, queries, query_vectors, k, spec=None):
+        """
+        Retrieves the top k chunks per query: the vector hits, fused by reciprocal rank with the
+        BM25 hits when the keyword index is loaded.
 
-    def get_relevant_context(self, query):
+        Returns:
+            tuple: (chunk lists, the best vector similarity per query or None if nothing matched,
+                    whether the keyword search's best hit is among the query's chunks).
+        """
+        if self.keyword_index is None:
+            results, scores = self.search_vectors(query_vectors, k, spec)
+            keyword_backed = [False] * len(queries)
+        else:
+            depth = max(k, RAG_HYBRID_CANDIDATES)
+            vector_hits, scores = self.search_vectors(query_vectors, depth, spec)
+            keyword_hits = self.keyword_index.search_texts(queries, depth, spec)
+            results = [
+                reciprocal_rank_fusion([vector_ranking, keyword_ranking], k, RAG_RRF_K)
+                for vector_ranking, keyword_ranking in zip(vector_hits, keyword_hits)
+            ]
+            keyword_backed = [bool(ranking) and ranking[0] in chunks for ranking, chunks in zip(keyword_hits, results)]
+        return results, [row[0] if len(row) else None for row in scores], keyword_backed
+
+    def purpose_spec(self, purpose):
+        """The retrieval spec a purpose declares in SYSTEM_PROMPTS, or None to search everything."""
+        if not (RAG_PURPOSE_FILTERS and purpose):
+            return None
+        return retrieval_spec(SYSTEM_PROMPTS.get(purpose))
+
+    def get_relevant_chunks_batch(self, queries, k=None, purpose=None, min_score=None):
+        """
+        Retrieves the relevant chunks for many queries at once: one embedding pass for all
+        uncached queries and one vectorized search (plus one keyword search, see search).
+        Returns a list of chunk lists, in query order, equal to calling get_relevant_chunks
+        for each query.
+
+        With a purpose, only the chunks its "retrieval" declaration selects are searched.
+        With min_score, a query whose best match is less similar than that gets no chunks, unless
+        (in hybrid mode) the keyword search's best hit made it into the fused results.
+        """
+        if not queries:
+            return []
+        k = k or self.k
+        query_vectors = self.embed_queries(queries)
+        spec = self.purpose_spec(purpose)
+        results, best_scores, keyword_backed = self.search(queries, query_vectors, k, spec)
+        if spec is not None:
+            # A store built before chunk metadata existed has no tags: search all of it instead.
+            unmatched = [i for i, chunks in enumerate(results) if not chunks]
+            if unmatched:
+                fallback, fallback_scores, fallback_backed = self.search([queries[i] for i in unmatched], [query_vectors[i] for i in unmatched], k)
+                for i, chunks, score, backed in zip(unmatched, fallback, fallback_scores, fallback_backed):
+                    results[i] = chunks
+                    best_scores[i] = score
+                    keyword_backed[i] = backed
+            with self._stats_lock:
+                self._stats["filtered_searches"] += len(queries)
+                self._stats["filter_fallbacks"] += len(unmatched)
+        if min_score is not None:
+            weak = [i for i, score in enumerate(best_scores) if results[i] and (score is None or score < min_score)]
+            # In hybrid mode a strong keyword match keeps its fused chunks despite a weak vector score.
+            kept = [i for i in weak if keyword_backed[i]]
+            for i in weak:
+                if not keyword_backed[i]:
+                    results[i] = []
+            with self._stats_lock:
+                self._stats["below_min_score"] += len(weak) - len(kept)
+                self._stats["kept_by_keywords"] += len(kept)
+        return results
+
+    def get_relevant_context_batch(self, queries, k=None, purpose=None):
+        """Batched get_relevant_context: one context string per query."""
+        return [" ".join(chunks) for chunks in self.get_relevant_chunks_batch(queries, k, purpose)]
+
+    def get_relevant_chunks(self, query, purpose=None, min_score=None):
+        """Retrieves the most relevant document chunks for a query, best match first."""
+        return self.get_relevant_chunks_batch([query], purpose=purpose, min_score=min_score)[0]
+
+    def get_relevant_context(self, query, purpose=None):
         """Retrieves relevant document chunks for a given query."""
-        # Retrieve the most relevant documents (chunks)
-        docs = self.retriever.invoke(query)
         # Concatenate the content of the documents into a single string
-        context = " ".join([doc.page_content for doc in docs])
+        context = " ".join(self.get_relevant_chunks(query, purpose))
         return context
 
-# Instantiate the RAG manager once at the start of the application
+    def warm_query_cache(self, queries):
+        """Embeds queries (e.g. the option button texts) into QUERY_EMBEDDING_CACHE in one batch."""
+        if queries:
+            self.embed_queries(queries)
+
+    async def aget_relevant_chunks(self, query, purpose=None, min_score=None):
+        """
+        Async counterpart of get_relevant_chunks for the async serving mode.
+        Runs in a worker thread, so a first-use model load does not block the event loop.
+        """
+        return await asyncio.to_thread(self.get_relevant_chunks, query, purpose, min_score)
+
+    async def aget_relevant_context(self, query, purpose=None):
+        """Async counterpart of get_relevant_context for the async serving mode."""
+        return " ".join(await self.aget_relevant_chunks(query, purpose))
+
+
+def rag_status():
+    """Returns the RAG loading state, or ready=False if there is no knowledge base."""
+    if rag_manager is None:
+        return {"ready": False, "warmup_mode": RAG_WARMUP_MODE, "load_seconds": None, "load_error": "Vector database not found."}
+    return rag_manager.stats()
 
-# Instantiate the RAG manager once at the start of the application
+# Create the RAG manager once at the start of the application; loading is deferred (see RAG_WARMUP_MODE).
 try:
     rag_manager = RAG_CONTEXT_MANAGER(VECTOR_DB_PATH)
 except FileNotFoundError as e:
     print(f"RAG Initialization Error: {e}", file=os.sys.stderr)
     rag_manager = None
 
-def get_openai_reply(user_input, purpose, current_summary_array):
+if rag_manager is not None:
+    if RAG_WARMUP_MODE == "eager":
+        try:
+            rag_manager.load()
+        except Exception as e:
+            print(f"RAG Initialization Error: {e}", file=os.sys.stderr)
+    elif RAG_WARMUP_MODE == "background":
+        rag_manager.start_warmup()
+
+# The tokenizer is read from disk once, off the request path.
+threading.Thread(target=load_encoding, name="tokenizer-warmup", daemon=True).start()
+
+
+def plan_retrieval(user_input, purpose, session_id=None):
+    """
+    Returns RETRIEVAL_PLANNER's ("skip" | "reuse" | "retrieve", chunks) decision for a turn;
+    ("skip", []) when RAG is unavailable.
+    """
+    if not rag_manager:
+        return "skip", []
+    return RETRIEVAL_PLANNER.plan(purpose, SYSTEM_PROMPTS.get(purpose), session_id, user_input)
+
+
+def retrieve_reference_chunks(user_input, purpose, session_id=None, plan=None):
+    """
+    Retrieves the reference chunks for a turn as RETRIEVAL_PLANNER decides: none for a purpose
+    that opts out, the previous chunks for a near-identical follow-up in the session, or a search
+    that keeps its results only if the best match reaches the purpose's min_score.
+    plan is a decision already made by plan_retrieval for this turn.
+    """
+    if not rag_manager:
+        return []
+    action, chunks = plan or plan_retrieval(user_input, purpose, session_id)
+    if action != "retrieve":
+        return chunks
+    chunks = rag_manager.get_relevant_chunks(user_input, purpose=purpose, min_score=min_score(SYSTEM_PROMPTS.get(purpose)))
+    RETRIEVAL_PLANNER.remember(purpose, session_id, user_input, chunks)
+    return chunks
+
+
+async def aretrieve_reference_chunks(user_input, purpose, session_id=None, plan=None):
+    """Async counterpart of retrieve_reference_chunks for the async serving mode."""
+    if not rag_manager:
+        return []
+    action, chunks = plan or plan_retrieval(user_input, purpose, session_id)
+    if action != "retrieve":
+        return chunks
+    chunks = await rag_manager.aget_relevant_chunks(user_input, purpose=purpose, min_score=min_score(SYSTEM_PROMPTS.get(purpose)))
+    RETRIEVAL_PLANNER.remember(purpose, session_id, user_input, chunks)
+    return chunks
+
+
+# --- Semantic Response Cache (see semantic_cache.py) ---
+def semantic_cache_applies(purpose, use_cache, action):
+    """
+    True if a turn should be looked up in SEMANTIC_CACHE. Embedding the question must not be
+    what loads the model, so unless retrieval is about to load it anyway (action "retrieve"),
+    the lookup waits until the model is ready and lazy warm-up is preserved.
+    """
+    if not (use_cache and SEMANTIC_CACHE.enabled and rag_manager) or purpose == "integrator":
+        return False
+    return action == "retrieve" or rag_manager.ready
+
+
+def lookup_semantic_cache(user_input, purpose, current_purpose_summary, use_cache=True, action="retrieve"):
+    """
+    Looks up a step-purpose turn in SEMANTIC_CACHE, by the query vector retrieval uses anyway
+    (the search that follows a miss gets it from QUERY_EMBEDDING_CACHE). action is the turn's
+    plan_retrieval decision.
+
+    Returns:
+        SemanticCacheLookup or None: None when the cache is off, there is no embedding model,
+        or the lookup would be the first use of a model that is not loaded yet.
+    """
+    if not semantic_cache_applies(purpose, use_cache, action):
+        return None
+    try:
+        vector = rag_manager.embed_query(user_input)
+    except Exception as e:
+        print(f"Semantic cache skipped: {e}", file=os.sys.stderr)
+        return None
+    partition = (purpose, summary_hash(current_purpose_summary), rag_manager.embedding_model_name)
+    return SEMANTIC_CACHE.lookup(partition, user_input, vector)
+
+
+async def alookup_semantic_cache(user_input, purpose, current_purpose_summary, use_cache=True, action="retrieve"):
+    """Async counterpart of lookup_semantic_cache; a first-use model load runs in a worker thread."""
+    if not semantic_cache_applies(purpose, use_cache, action):
+        return None
+    return await asyncio.to_thread(lookup_semantic_cache, user_input, purpose, current_purpose_summary, use_cache, action)
+
+
+def apply_cached_step_reply(lookup, purpose, current_summary_array):
+    """Applies the summary of a semantic cache hit and returns its response payload."""
+    with SUMMARY_UPDATE_LOCK:
+        current_summary_array[purpose] = lookup.hit["summary"]
+    return dict(lookup.hit["response"])
+
+
+def store_step_reply(lookup, response_data, summary_response):
+    """Caches a fresh step reply and its summary for a semantic cache miss."""
+    if lookup is None:
+        return
+    text = f"{response_data['explanation']} {response_data['follow_up_question']}"
+    SEMANTIC_CACHE.store(lookup, {"response": response_data, "summary": summary_response}, text)
+
+# --- Prompt Builders ---
+def build_system_prompt_with_rag(persona, retrieved_context):
+    """Appends the retrieved reference material to a purpose persona."""
+    return f"""
+        {persona}
+        
+        **Reference Material**
+        Use the following information as reference to improve your output.
+        If the information does not directly help, you can ignore it.
+        
+        Reference:
+        {retrieved_context}
+        """
+
+
+def build_full_summary_text(current_summary_array):
+    """Joins all non-empty step summaries into the context shared by the integrator agents."""
+    full_summary_text = ""
+    for key, value in current_summary_array.items():
+        if value:
+            full_summary_text += f"**{key.capitalize()}**:\n{value}\n\n"
+    return full_summary_text
+
+
+def build_step_messages(system_prompt_with_rag, current_purpose_summary, user_input):
+    """Builds the conversational messages for a step purpose."""
+    return [
+        {"role": "system", "content": system_prompt_with_rag},
+        {"role": "assistant", "content": current_purpose_summary},
+        {"role": "user", "content": user_input}
+    ]
+
+
+def build_step_response(ai_response_json):
+    """Maps the model's JSON reply onto the 'summary_and_options' payload for the frontend."""
+    return {
+        "type": "summary_and_options",
+        "explanation": ai_response_json.get("explanation", "AI did not provide an explanation."),
+        "follow_up_question": ai_response_json.get("follow_up_question", "AI did not provide a follow-up question."),
+        "options": ai_response_json.get("new_options", [])
+    }
+
+
+def format_suggestions_section(suggestions_output):
+    """Returns the markdown appended to the proposal for the suggestions agent output, if any."""
+    if not suggestions_output:
+        return ""
+    return f"\n\n# Suggestions\n{suggestions_output}"
+
+
+# --- Token Budget ---
+def prepare_step_messages(purpose, persona, reference_chunks, current_purpose_summary, user_input):
+    """
+    Builds the step-purpose messages so the prompt stays under PROMPT_TOKEN_CEILING.
+    The persona is always sent in full; an oversized summary or input is compacted, and the
+    reference material is compressed (see context_compression.py) and gets what is left of its
+    budget, dropping or trimming low-ranked chunks. Per-section token counts are logged.
+    """
+    budget = get_budget(purpose)
+    fixed_tokens = count_tokens(build_system_prompt_with_rag(persona, ""))
+
+    compacted_summary = compact_summary(current_purpose_summary, budget["summary"])
+    compacted_input = truncate_to_tokens(user_input, budget["user_input"])
+    summary_tokens = count_tokens(compacted_summary)
+    input_tokens = count_tokens(compacted_input)
+
+    reference_budget = min(budget["reference"], PROMPT_TOKEN_CEILING - fixed_tokens - summary_tokens - input_tokens)
+    compressed_chunks, compression_report = compress_chunks(user_input, reference_chunks)
+    record_compression(purpose, compression_report)
+    kept_chunks, dropped, trimmed = fit_chunks(compressed_chunks, max(reference_budget, 0))
+    retrieved_context = " ".join(kept_chunks)
+    reference_tokens = count_tokens(retrieved_context)
+
+    tokens_removed = (
+        sum(count_tokens(chunk) for chunk in reference_chunks) - reference_tokens
+        + count_tokens(current_purpose_summary) - summary_tokens
+        + count_tokens(user_input) - input_tokens
+    )
+    record_sections(
+        purpose,
+        {"system": fixed_tokens, "reference": reference_tokens, "summary": summary_tokens, "user_input": input_tokens},
+        tokens_removed=tokens_removed, chunks_dropped=dropped, chunks_trimmed=trimmed,
+    )
+
+    # Add a note to the system prompt to instruct the AI to use the retrieved context
+    system_prompt_with_rag = build_system_prompt_with_rag(persona, retrieved_context)
+    return build_step_messages(system_prompt_with_rag, compacted_summary, compacted_input)
+
+
+def prepare_integrator_context(current_summary_array, user_input):
+    """
+    Builds the summary context and user message for the integrator agents within the token budget.
+
+    The frontend sends JSON.stringify(currentSummaries) as the integrator input, which repeats
+    the summaries already in the session. That payload is only used to fill steps the session
+    has lost (e.g. after a restart) and is replaced by a short instruction, so the summaries
+    are sent once. Oversized summaries are compacted to a fair share of the budget.
+
+    Returns:
+        tuple: (full_summary_text, proposal_input)
+    """
+    budget = get_budget("integrator")
+    summaries = dict(current_summary_array)
+
+    client_summaries = parse_client_summaries(user_input)
+    if client_summaries is not None:
+        for key, value in client_summaries.items():
+            if value and not summaries.get(key):
+                summaries[key] = value
+        missing_steps = [key for key, value in summaries.items() if not value]
+        proposal_input = INTEGRATOR_SYNTHESIS_INSTRUCTION
+        if missing_steps:
+            proposal_input += f" These sections have no summary yet: {', '.join(missing_steps)}."
+    else:
+        proposal_input = truncate_to_tokens(user_input, budget["user_input"])
+
+    fixed_tokens = count_tokens(SYSTEM_PROMPTS['integrator']['persona'])
+    input_tokens = count_tokens(proposal_input)
+    summaries_budget = max(min(budget["summaries"], PROMPT_TOKEN_CEILING - fixed_tokens - input_tokens), 0)
+
+    allowances = share_budget(summaries, summaries_budget)
+    compacted = {key: compact_summary(value, allowances.get(key, 0)) for key, value in summaries.items()}
+    full_summary_text = build_full_summary_text(compacted)
+    summaries_tokens = count_tokens(full_summary_text)
+
+    tokens_removed = count_tokens(user_input) - input_tokens + count_tokens(build_full_summary_text(summaries)) - summaries_tokens
+    record_sections(
+        "integrator",
+        {"system": fixed_tokens, "summaries": summaries_tokens, "user_input": input_tokens},
+        tokens_removed=tokens_removed,
+    )
+    return full_summary_text, proposal_input
+
+
+# --- Concurrent Agent Execution ---
+# Bounded pool shared by all requests so independent agent calls can overlap
+# without letting a burst of users open an unbounded number of upstream calls.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+AGENT_EXECUTOR = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="llm-agent")
+
+# "concurrent" overlaps the summary agent with the conversational reply for step purposes;
+# "sequential" keeps the original one-after-the-other behaviour.
+SUMMARY_EXECUTION_MODE = os.getenv("SUMMARY_EXECUTION_MODE", "concurrent").lower()
+SUMMARY_UPDATE_LOCK = threading.Lock()
+
+# --- Structured (JSON) Replies ---
+STRUCTURED_REPLY_MAX_RETRIES = 2
+JSON_CORRECTION_PROMPT = "The previous response was not a valid JSON. Please provide a valid JSON object without any additional text. Strictly adhere to the format."
+
+# Ask the model for a JSON object natively (as evaluate_rag.py does), so the
+# correction retry in request_structured_reply is only a last resort.
+STRUCTURED_REPLY_JSON_MODE = os.getenv("STRUCTURED_REPLY_JSON_MODE", "1").lower() not in ("0", "false", "no")
+
+# Counters for how often replies needed the tolerant parser or a correction round trip.
+STRUCTURED_REPLY_STATS = {"replies": 0, "attempts": 0, "tolerant_parses": 0, "retries": 0, "failures": 0}
+STRUCTURED_REPLY_STATS_LOCK = threading.Lock()
+
+def _count_structured_reply(**increments):
+    with STRUCTURED_REPLY_STATS_LOCK:
+        for name, value in increments.items():
+            STRUCTURED_REPLY_STATS[name] += value
+
+def get_structured_reply_stats():
+    """Returns the structured reply counters plus derived rates for the metrics endpoint."""
+    with STRUCTURED_REPLY_STATS_LOCK:
+        stats = dict(STRUCTURED_REPLY_STATS)
+    replies = stats["replies"]
+    stats["round_trips_per_reply"] = stats["attempts"] / replies if replies else 0.0
+    stats["retry_rate"] = stats["retries"] / replies if replies else 0.0
+    stats["json_mode"] = STRUCTURED_REPLY_JSON_MODE
+    return stats
+
+def structured_reply_options():
+    """Extra chat completion arguments for the conversational JSON reply."""
+    if STRUCTURED_REPLY_JSON_MODE:
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+def is_valid_json(text):
+    """Returns True if a JSON object can be parsed from text; keeps malformed replies out of the cache."""
+    try:
+        parse_model_json(text)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+def parse_structured_attempt(ai_response_str, messages):
+    """
+    Parses one reply attempt. On failure the invalid reply and a correction prompt are
+    appended to messages for the next attempt, and None is returned.
+    """
+    try:
+        # Parse the AI's JSON response for the conversation.
+        ai_response_json = json.loads(ai_response_str)
+        if isinstance(ai_response_json, dict):
+            return ai_response_json
+    except (TypeError, json.JSONDecodeError):
+        pass
+
+    try:
+        ai_response_json = parse_model_json(ai_response_str)
+        _count_structured_reply(tolerant_parses=1)
+        return ai_response_json
+    except json.JSONDecodeError:
+        # If JSON parsing fails, update the chat history with a correction message
+        messages.append({"role": "assistant", "content": ai_response_str}) # The invalid response
+        messages.append({"role": "user", "content": JSON_CORRECTION_PROMPT}) # The instruction to correct
+        return None
+
+def request_structured_reply(client, deployment_name, messages, max_retries, first_response_str=None, use_cache=True):
+    """
+    Requests the conversational JSON reply. Replies are parsed tolerantly (code fences,
+    surrounding text, single-quoted keys); only if that fails is the model asked again
+    with a correction prompt.
+
+    Args:
+        client (AzureOpenAI): The shared client.
+        deployment_name (str): The Azure deployment to call.
+        messages (list): The conversation; correction turns are appended to it in place.
+        max_retries (int): The total number of attempts.
+        first_response_str (str, optional): An already received reply (e.g. a streamed one)
+            that counts as the first attempt.
+        use_cache (bool): Whether completions may be served from / stored in LLM_CACHE.
+
+    Returns:
+        dict or None: The parsed reply, or None if every attempt was invalid.
+    """
+    _count_structured_reply(replies=1)
+    for i in range(max_retries):
+        if i > 0:
+            _count_structured_reply(retries=1)
+        _count_structured_reply(attempts=1)
+
+        if i == 0 and first_response_str is not None:
+            ai_response_str = first_response_str
+        else:
+            ai_response_str = cached_chat_completion(
+                client,
+                use_cache=use_cache,
+                validate=is_valid_json,
+                model=deployment_name,
+                messages=messages,
+                max_tokens=1000,
+                temperature=0.5,
+                **structured_reply_options(),
+            )
+
+        ai_response_json = parse_structured_attempt(ai_response_str, messages)
+        if ai_response_json is not None:
+            return ai_response_json
+
+    _count_structured_reply(failures=1)
+    return None
+
+def get_openai_reply(user_input, purpose, current_summary_array, use_cache=True, session_id=None):
     """
     Generates a reply from the OpenAI model based on user input and purpose.
     Manages the summary_array for conversational context.
@@ -83,6 +747,8 @@ def get_openai_reply(user_input, purpose, current_summary_array):
         user_input (str): The user's current input.
         purpose (str): The current stage/purpose of the conversation.
         current_summary_array (dict): The dictionary containing summaries of previous steps.
+        use_cache (bool): Set to False to bypass the LLM and semantic response caches for this request.
+        session_id (str): The caller's session, so a near-identical follow-up can reuse its retrieval.
 
     Returns:
         tuple: A tuple containing (json_response_string, updated_summary_array_dict).
@@ -105,75 +771,49 @@ def get_openai_reply(user_input, purpose, current_summary_array):
 
     # Mode 2: Call AI and get a structured response
     try:
-        if not all([AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_DEPLOYMENT_NAME]):
-            raise ValueError("Azure OpenAI configuration is incomplete. Check environment variables.")
+        # A rephrasing of an earlier question in the same summary state gets the earlier reply.
+        plan = plan_retrieval(user_input, purpose, session_id)
+        cache_lookup = lookup_semantic_cache(user_input, purpose, current_summary_array.get(purpose, ""), use_cache, plan[0])
+        if cache_lookup is not None and cache_lookup.hit is not None:
+            return json.dumps(apply_cached_step_reply(cache_lookup, purpose, current_summary_array)), current_summary_array
 
-        client = AzureOpenAI(
-            api_key=AZURE_OPENAI_API_KEY,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_version=AZURE_OPENAI_API_VERSION,
-        )
+        client = get_azure_client()
         deployment_name = AZURE_OPENAI_DEPLOYMENT_NAME
         
         # --- RAG Integration: Retrieve context from the document ---
-        retrieved_context = ""
-        if rag_manager:
-            retrieved_context = rag_manager.get_relevant_context(user_input)
-            
-        # Add a note to the system prompt to instruct the AI to use the retrieved context
-        system_prompt_with_rag = f"""
-        {config["persona"]}
-        
-        **Reference Material**
-        Use the following information as reference to improve your output.
-        If the information does not directly help, you can ignore it.
-        
-        Reference:
-        {retrieved_context}
-        """
-        
+        reference_chunks = retrieve_reference_chunks(user_input, purpose, session_id, plan)
 
         #Call multi-agents for integrator 
         if purpose == 'integrator':
-            # Step 1: Prepare the context for both agents
-            full_summary_text = ""
-            for key, value in current_summary_array.items():
-                if value:
-                    full_summary_text += f"**{key.capitalize()}**:\n{value}\n\n"
-
-            # Step 2: Call the primary 'integrator' agent to synthesize the proposal
-            proposal_messages = [
-                {"role": "system", "content": SYSTEM_PROMPTS['integrator']['persona']},
-                {"role": "assistant", "content": full_summary_text},
-                {"role": "user", "content": user_input}
-            ]
-            
-            proposal_completion = client.chat.completions.create(
-                model=deployment_name,
-                messages=proposal_messages,
-                max_tokens=2000,
-                temperature=0.5,
-            )
-            proposal_output = proposal_completion.choices[0].message.content
+            # Step 1: Prepare the context for both agents, within the token budget
+            full_summary_text, proposal_input = prepare_integrator_context(current_summary_array, user_input)
 
-            # Step 3: Call the separate 'suggestions' agent
-            # We use the same summary as context but with a new prompt
-            suggestions_messages = [
-                {"role": "system", "content": SUGGESTIONS_AGENT_SYSTEM_MESSAGE},
-                {"role": "user", "content": full_summary_text} # The user input for this agent is the summary itself
-            ]
-            
-            suggestions_completion = client.chat.completions.create(
-                model=deployment_name,
-                messages=suggestions_messages,
-                max_tokens=500,
-                temperature=0.5,
+            # Step 2: Call the 'integrator' and 'suggestions' agents concurrently.
+            # Both only depend on full_summary_text, so the wall-clock time is that of the slower call.
+            proposal_future = AGENT_EXECUTOR.submit(
+                call_proposal_agent, client, deployment_name, full_summary_text, proposal_input, use_cache
+            )
+            suggestions_future = AGENT_EXECUTOR.submit(
+                call_suggestions_agent, client, deployment_name, full_summary_text, use_cache
             )
-            suggestions_output = suggestions_completion.choices[0].message.content
+
+            # Step 3: Join both branches. The proposal is required; the suggestions are best-effort.
+            try:
+                proposal_output = proposal_future.result()
+            except Exception:
+                # No point finishing the suggestions if there is no proposal to attach them to.
+                suggestions_future.cancel()
+                raise
+
+            try:
+                suggestions_output = suggestions_future.result()
+            except Exception as e:
+                print(f"Suggestions agent failed, returning proposal only: {e}", file=os.sys.stderr)
+                suggestions_output = None
 
             # Step 4: Combine the outputs and return to the user
-            final_combined_output = f"{proposal_output}\n\n# Suggestions\n{suggestions_output}"
-            
+            final_combined_output = proposal_output + format_suggestions_section(suggestions_output)
+
             response_data = {
                 "type": "summary_only",
                 "summary": final_combined_output
@@ -185,49 +825,34 @@ def get_openai_reply(user_input, purpose, current_summary_array):
             # For all general purposes, we only provide the summary for the current purpose.
             current_purpose_summary = current_summary_array.get(purpose, "")
             
-            messages = [
-                {"role": "system", "content": system_prompt_with_rag},
-                {"role": "assistant", "content": current_purpose_summary},
-                {"role": "user", "content": user_input}
-            ]
-        
-            # Use a retry loop to handle JSON errors
-            max_retries = 2
-            for i in range(max_retries):
-                try:
-                    completion = client.chat.completions.create(
-                        model=deployment_name,
-                        messages=messages,
-                        max_tokens=1000,
-                        temperature=0.5,
-                    )
-                    ai_response_str = completion.choices[0].message.content
-
-                    # Parse the AI's JSON response for the conversation.
-                    ai_response_json = json.loads(ai_response_str)
-                    # If JSON parsing is successful, break the loop and proceed
-                    break
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, update the chat history with a correction message
-                    correction_prompt = "The previous response was not a valid JSON. Please provide a valid JSON object without any additional text. Strictly adhere to the format."
-                    # Append the correction to the messages list
-                    messages.append({"role": "assistant", "content": ai_response_str}) # The invalid response
-                    messages.append({"role": "user", "content": correction_prompt}) # The instruction to correct
-                
-                    if i == max_retries - 1:
-                        # If this is the last retry, return a failure message
-                        return json.dumps({"type": "error", "summary": f"Failed to get a valid JSON response after {max_retries} attempts. The AI did not adhere to the format."}), current_summary_array
-
-            # After getting the JSON response, we call a separate function to generate the summary.
-            summary_response = generate_summary(purpose, user_input, current_purpose_summary)
-            current_summary_array[purpose] = summary_response
+            # The retrieved reference material is added to the system prompt, within the token budget
+            messages = prepare_step_messages(purpose, config["persona"], reference_chunks, current_purpose_summary, user_input)
 
-            response_data = {
-                "type": "summary_and_options",
-                "explanation": ai_response_json.get("explanation", "AI did not provide an explanation."),
-                "follow_up_question": ai_response_json.get("follow_up_question", "AI did not provide a follow-up question."),
-                "options": ai_response_json.get("new_options", [])
-            }
+            # The summary agent only needs the user input and the current summary, so in
+            # concurrent mode it starts now and overlaps with the conversational call.
+            summary_future = None
+            if SUMMARY_EXECUTION_MODE == "concurrent":
+                summary_future = AGENT_EXECUTOR.submit(generate_summary, purpose, user_input, current_purpose_summary, use_cache)
+
+            ai_response_json = request_structured_reply(
+                client, deployment_name, messages, STRUCTURED_REPLY_MAX_RETRIES, use_cache=use_cache
+            )
+            if ai_response_json is None:
+                # Leave the summary untouched, as in sequential mode.
+                if summary_future:
+                    summary_future.cancel()
+                return json.dumps({"type": "error", "summary": f"Failed to get a valid JSON response after {STRUCTURED_REPLY_MAX_RETRIES} attempts. The AI did not adhere to the format."}), current_summary_array
+
+            # After getting the JSON response, join (or run) the summary agent.
+            if summary_future:
+                summary_response = summary_future.result()
+            else:
+                summary_response = generate_summary(purpose, user_input, current_purpose_summary, use_cache)
+            with SUMMARY_UPDATE_LOCK:
+                current_summary_array[purpose] = summary_response
+
+            response_data = build_step_response(ai_response_json)
+            store_step_reply(cache_lookup, response_data, summary_response)
             return json.dumps(response_data), current_summary_array
 
     except json.JSONDecodeError:
@@ -236,20 +861,13 @@ def get_openai_reply(user_input, purpose, current_summary_array):
         return json.dumps({"type": "error", "summary": f"An error occurred during AI processing for '{purpose}': {str(e)}"}), current_summary_array
 
 
-def generate_summary(purpose, user_input, current_summary_purpose):
+def generate_summary(purpose, user_input, current_summary_purpose, use_cache=True):
     """
     Generates a new summary by incorporating the latest user input into the existing summary.
     This prevents the summary from growing with repetitive content.
     """
     try:
-        if not all([AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_DEPLOYMENT_NAME]):
-            raise ValueError("Azure OpenAI configuration is incomplete.")
-
-        client = AzureOpenAI(
-            api_key=AZURE_OPENAI_API_KEY,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_version=AZURE_OPENAI_API_VERSION,
-        )
+        client = get_azure_client()
         deployment_name = AZURE_OPENAI_DEPLOYMENT_NAME
 
         # The system message should instruct the AI to update the list, not create a new one.
@@ -262,18 +880,391 @@ def generate_summary(purpose, user_input, current_summary_purpose):
             {"role": "user", "content": user_input}
         ]
 
-        completion = client.chat.completions.create(
+        ai_response = cached_chat_completion(
+            client,
+            use_cache=use_cache,
             model=deployment_name,
             messages=messages,
             max_tokens=500,
             temperature=0,
         )
-        ai_response = completion.choices[0].message.content
         return ai_response
 
     except Exception as e:
         return f"Error generating summary: {str(e)}"
 
+def build_proposal_messages(full_summary_text, user_input):
+    """Builds the messages for the primary 'integrator' agent."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPTS['integrator']['persona']},
+        {"role": "assistant", "content": full_summary_text},
+        {"role": "user", "content": user_input}
+    ]
+
+
+def call_proposal_agent(client, deployment_name, full_summary_text, user_input, use_cache=True):
+    """Calls the primary 'integrator' agent to synthesize the proposal from all summaries."""
+    return cached_chat_completion(
+        client,
+        use_cache=use_cache,
+        model=deployment_name,
+        messages=build_proposal_messages(full_summary_text, user_input),
+        max_tokens=2000,
+        temperature=0.5,
+    )
+
+
+def call_suggestions_agent(client, deployment_name, full_summary_text, use_cache=True):
+    """
+    Calls the separate 'suggestions' agent.
+    We use the same summary as context but with a new prompt.
+    """
+    suggestions_messages = [
+        {"role": "system", "content": SUGGESTIONS_AGENT_SYSTEM_MESSAGE},
+        {"role": "user", "content": full_summary_text} # The user input for this agent is the summary itself
+    ]
+
+    return cached_chat_completion(
+        client,
+        use_cache=use_cache,
+        model=deployment_name,
+        messages=suggestions_messages,
+        max_tokens=500,
+        temperature=0.5,
+    )
+
+def stream_chat_completion(client, use_cache=True, validate=None, **kwargs):
+    """
+    Calls the chat completions API in streaming mode and yields the text deltas.
+    A cached completion is yielded as a single delta; a streamed one is stored once complete.
+    """
+    key = None
+    if use_cache and LLM_CACHE.enabled:
+        key = make_cache_key(kwargs)
+        cached_content = LLM_CACHE.get(key)
+        if cached_content is not None:
+            yield cached_content
+            return
+
+    parts = []
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        # Azure sends a leading chunk with no choices that only carries content-filter results.
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+
+    content = "".join(parts)
+    if key and content and (validate is None or validate(content)):
+        LLM_CACHE.set(key, content)
+
+
+def stream_openai_reply(user_input, purpose, current_summary_array, use_cache=True, session_id=None):
+    """
+    Streaming counterpart of get_openai_reply.
+
+    Yields ("token", {"text": ...}) events as the model produces text: the proposal markdown
+    for the integrator and the 'explanation' field for step purposes. The last event is always
+    ("final", response_data), where response_data is the same payload get_openai_reply returns.
+    current_summary_array is updated in place before the final event.
+    """
+    config = SYSTEM_PROMPTS.get(purpose)
+
+    if not config:
+        yield "final", {"type": "error", "summary": "Invalid purpose provided."}
+        return
+
+    # --- Mode 1: Initial Question ---
+    if not user_input.strip() and purpose != "integrator":
+        yield "final", {
+            "type": "question",
+            "question": config["initial_question"],
+            "options": config["options"]
+        }
+        return
+
+    # Mode 2: Stream the AI response
+    try:
+        plan = plan_retrieval(user_input, purpose, session_id)
+        cache_lookup = lookup_semantic_cache(user_input, purpose, current_summary_array.get(purpose, ""), use_cache, plan[0])
+        if cache_lookup is not None and cache_lookup.hit is not None:
+            response_data = apply_cached_step_reply(cache_lookup, purpose, current_summary_array)
+            yield "token", {"text": response_data["explanation"]}
+            yield "final", response_data
+            return
+
+        client = get_azure_client()
+        deployment_name = AZURE_OPENAI_DEPLOYMENT_NAME
+
+        reference_chunks = retrieve_reference_chunks(user_input, purpose, session_id, plan)
+
+        if purpose == 'integrator':
+            full_summary_text, proposal_input = prepare_integrator_context(current_summary_array, user_input)
+
+            # The suggestions run in the background while the proposal streams to the user.
+            suggestions_future = AGENT_EXECUTOR.submit(
+                call_suggestions_agent, client, deployment_name, full_summary_text, use_cache
+            )
+            proposal_parts = []
+            try:
+                for delta in stream_chat_completion(
+                    client,
+                    use_cache=use_cache,
+                    model=deployment_name,
+                    messages=build_proposal_messages(full_summary_text, proposal_input),
+                    max_tokens=2000,
+                    temperature=0.5,
+                ):
+                    proposal_parts.append(delta)
+                    yield "token", {"text": delta}
+            except Exception:
+                suggestions_future.cancel()
+                raise
+
+            try:
+                suggestions_output = suggestions_future.result()
+            except Exception as e:
+                print(f"Suggestions agent failed, returning proposal only: {e}", file=os.sys.stderr)
+                suggestions_output = None
+
+            suggestions_section = format_suggestions_section(suggestions_output)
+            if suggestions_section:
+                yield "token", {"text": suggestions_section}
+
+            yield "final", {
+                "type": "summary_only",
+                "summary": "".join(proposal_parts) + suggestions_section
+            }
+            return
+
+        current_purpose_summary = current_summary_array.get(purpose, "")
+        messages = prepare_step_messages(purpose, config["persona"], reference_chunks, current_purpose_summary, user_input)
+
+        summary_future = None
+        if SUMMARY_EXECUTION_MODE == "concurrent":
+            summary_future = AGENT_EXECUTOR.submit(generate_summary, purpose, user_input, current_purpose_summary, use_cache)
+
+        # Only the 'explanation' value is forwarded while the JSON object streams in.
+        explanation_extractor = JsonStringFieldExtractor("explanation")
+        response_parts = []
+        for delta in stream_chat_completion(
+            client,
+            use_cache=use_cache,
+            validate=is_valid_json,
+            model=deployment_name,
+            messages=messages,
+            max_tokens=1000,
+            temperature=0.5,
+            **structured_reply_options(),
+        ):
+            response_parts.append(delta)
+            explanation_delta = explanation_extractor.feed(delta)
+            if explanation_delta:
+                yield "token", {"text": explanation_delta}
+
+        # The streamed reply counts as the first attempt of the usual JSON retry loop.
+        ai_response_json = request_structured_reply(
+            client, deployment_name, messages, STRUCTURED_REPLY_MAX_RETRIES,
+            first_response_str="".join(response_parts), use_cache=use_cache
+        )
+        if ai_response_json is None:
+            if summary_future:
+                summary_future.cancel()
+            yield "final", {"type": "error", "summary": f"Failed to get a valid JSON response after {STRUCTURED_REPLY_MAX_RETRIES} attempts. The AI did not adhere to the format."}
+            return
+
+        if summary_future:
+            summary_response = summary_future.result()
+        else:
+            summary_response = generate_summary(purpose, user_input, current_purpose_summary, use_cache)
+        with SUMMARY_UPDATE_LOCK:
+            current_summary_array[purpose] = summary_response
+
+        response_data = build_step_response(ai_response_json)
+        store_step_reply(cache_lookup, response_data, summary_response)
+        yield "final", response_data
+
+    except Exception as e:
+        yield "final", {"type": "error", "summary": f"An error occurred during AI processing for '{purpose}': {str(e)}"}
+
+# --- Async Counterparts (async serving mode, see asgi.py) ---
+# Same flow as the sync functions above, built on AsyncAzureOpenAI so one event loop can
+# hold many in-flight chats instead of blocking a worker thread per request.
+
+async def request_structured_reply_async(client, deployment_name, messages, max_retries, first_response_str=None, use_cache=True):
+    """Coroutine counterpart of request_structured_reply."""
+    _count_structured_reply(replies=1)
+    for i in range(max_retries):
+        if i > 0:
+            _count_structured_reply(retries=1)
+        _count_structured_reply(attempts=1)
+
+        if i == 0 and first_response_str is not None:
+            ai_response_str = first_response_str
+        else:
+            ai_response_str = await async_cached_chat_completion(
+                client,
+                use_cache=use_cache,
+                validate=is_valid_json,
+                model=deployment_name,
+                messages=messages,
+                max_tokens=1000,
+                temperature=0.5,
+                **structured_reply_options(),
+            )
+
+        ai_response_json = parse_structured_attempt(ai_response_str, messages)
+        if ai_response_json is not None:
+            return ai_response_json
+
+    _count_structured_reply(failures=1)
+    return None
+
+
+async def generate_summary_async(purpose, user_input, current_summary_purpose, use_cache=True):
+    """Coroutine counterpart of generate_summary."""
+    try:
+        client = get_async_azure_client()
+        messages = [
+            {"role": "system", "content": SUMMARY_AGENT_SYSTEM_MESSAGE[purpose]},
+            {"role": "assistant", "content": current_summary_purpose},
+            {"role": "user", "content": user_input}
+        ]
+        return await async_cached_chat_completion(
+            client,
+            use_cache=use_cache,
+            model=AZURE_OPENAI_DEPLOYMENT_NAME,
+            messages=messages,
+            max_tokens=500,
+            temperature=0,
+        )
+    except Exception as e:
+        return f"Error generating summary: {str(e)}"
+
+
+async def call_proposal_agent_async(client, deployment_name, full_summary_text, user_input, use_cache=True):
+    """Coroutine counterpart of call_proposal_agent."""
+    return await async_cached_chat_completion(
+        client,
+        use_cache=use_cache,
+        model=deployment_name,
+        messages=build_proposal_messages(full_summary_text, user_input),
+        max_tokens=2000,
+        temperature=0.5,
+    )
+
+
+async def call_suggestions_agent_async(client, deployment_name, full_summary_text, use_cache=True):
+    """Coroutine counterpart of call_suggestions_agent."""
+    return await async_cached_chat_completion(
+        client,
+        use_cache=use_cache,
+        model=deployment_name,
+        messages=[
+            {"role": "system", "content": SUGGESTIONS_AGENT_SYSTEM_MESSAGE},
+            {"role": "user", "content": full_summary_text}
+        ],
+        max_tokens=500,
+        temperature=0.5,
+    )
+
+
+async def get_openai_reply_async(user_input, purpose, current_summary_array, use_cache=True, session_id=None):
+    """
+    Coroutine counterpart of get_openai_reply, with the same arguments and return value.
+    Concurrent agent calls are asyncio tasks instead of AGENT_EXECUTOR threads.
+    """
+    config = SYSTEM_PROMPTS.get(purpose)
+
+    if not config:
+        return json.dumps({"type": "error", "summary": "Invalid purpose provided."}), current_summary_array
+
+    # --- Mode 1: Initial Question ---
+    if not user_input.strip() and purpose != "integrator":
+        response_data = {
+            "type": "question",
+            "question": config["initial_question"],
+            "options": config["options"]
+        }
+        return json.dumps(response_data), current_summary_array
+
+    # Mode 2: Call AI and get a structured response
+    try:
+        plan = plan_retrieval(user_input, purpose, session_id)
+        cache_lookup = await alookup_semantic_cache(user_input, purpose, current_summary_array.get(purpose, ""), use_cache, plan[0])
+        if cache_lookup is not None and cache_lookup.hit is not None:
+            return json.dumps(apply_cached_step_reply(cache_lookup, purpose, current_summary_array)), current_summary_array
+
+        client = get_async_azure_client()
+        deployment_name = AZURE_OPENAI_DEPLOYMENT_NAME
+
+        reference_chunks = await aretrieve_reference_chunks(user_input, purpose, session_id, plan)
+
+        if purpose == 'integrator':
+            full_summary_text, proposal_input = prepare_integrator_context(current_summary_array, user_input)
+
+            proposal_task = asyncio.create_task(
+                call_proposal_agent_async(client, deployment_name, full_summary_text, proposal_input, use_cache)
+            )
+            suggestions_task = asyncio.create_task(
+                call_suggestions_agent_async(client, deployment_name, full_summary_text, use_cache)
+            )
+
+            try:
+                proposal_output = await proposal_task
+            except BaseException:
+                # Also covers cancellation of this request (e.g. the client disconnected).
+                suggestions_task.cancel()
+                raise
+
+            try:
+                suggestions_output = await suggestions_task
+            except Exception as e:
+                print(f"Suggestions agent failed, returning proposal only: {e}", file=os.sys.stderr)
+                suggestions_output = None
+
+            response_data = {
+                "type": "summary_only",
+                "summary": proposal_output + format_suggestions_section(suggestions_output)
+            }
+            return json.dumps(response_data), current_summary_array
+
+        current_purpose_summary = current_summary_array.get(purpose, "")
+        messages = prepare_step_messages(purpose, config["persona"], reference_chunks, current_purpose_summary, user_input)
+
+        summary_task = None
+        if SUMMARY_EXECUTION_MODE == "concurrent":
+            summary_task = asyncio.create_task(
+                generate_summary_async(purpose, user_input, current_purpose_summary, use_cache)
+            )
+
+        try:
+            ai_response_json = await request_structured_reply_async(
+                client, deployment_name, messages, STRUCTURED_REPLY_MAX_RETRIES, use_cache=use_cache
+            )
+        except BaseException:
+            if summary_task:
+                summary_task.cancel()
+            raise
+
+        if ai_response_json is None:
+            if summary_task:
+                summary_task.cancel()
+            return json.dumps({"type": "error", "summary": f"Failed to get a valid JSON response after {STRUCTURED_REPLY_MAX_RETRIES} attempts. The AI did not adhere to the format."}), current_summary_array
+
+        if summary_task:
+            summary_response = await summary_task
+        else:
+            summary_response = await generate_summary_async(purpose, user_input, current_purpose_summary, use_cache)
+        with SUMMARY_UPDATE_LOCK:
+            current_summary_array[purpose] = summary_response
+
+        response_data = build_step_response(ai_response_json)
+        store_step_reply(cache_lookup, response_data, summary_response)
+        return json.dumps(response_data), current_summary_array
+
+    except Exception as e:
+        return json.dumps({"type": "error", "summary": f"An error occurred during AI processing for '{purpose}': {str(e)}"}), current_summary_array
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) == 2:
@@ -289,3 +1280,157 @@ if __name__ == "__main__":
     else:
         error_msg = {"type": "error", "summary": "Internal Server Error: Incorrect number of arguments for standalone script."}
         sys.stderr.write(json.dumps(error_msg))
+
+
+async def astream_chat_completion(client, use_cache=True, validate=None, **kwargs):
+    """Async generator counterpart of stream_chat_completion for an AsyncAzureOpenAI client."""
+    key = None
+    if use_cache and LLM_CACHE.enabled:
+        key = make_cache_key(kwargs)
+        cached_content = await LLM_CACHE.aget(key)
+        if cached_content is not None:
+            yield cached_content
+            return
+
+    parts = []
+    stream = await client.chat.completions.create(stream=True, **kwargs)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+
+    content = "".join(parts)
+    if key and content and (validate is None or validate(content)):
+        await LLM_CACHE.aset(key, content)
+
+
+async def astream_openai_reply(user_input, purpose, current_summary_array, use_cache=True, session_id=None):
+    """
+    Async generator counterpart of stream_openai_reply, with the same arguments and events.
+    Concurrent agent calls are asyncio tasks instead of AGENT_EXECUTOR threads.
+    """
+    config = SYSTEM_PROMPTS.get(purpose)
+
+    if not config:
+        yield "final", {"type": "error", "summary": "Invalid purpose provided."}
+        return
+
+    # --- Mode 1: Initial Question ---
+    if not user_input.strip() and purpose != "integrator":
+        yield "final", {
+            "type": "question",
+            "question": config["initial_question"],
+            "options": config["options"]
+        }
+        return
+
+    # Mode 2: Stream the AI response
+    try:
+        plan = plan_retrieval(user_input, purpose, session_id)
+        cache_lookup = await alookup_semantic_cache(user_input, purpose, current_summary_array.get(purpose, ""), use_cache, plan[0])
+        if cache_lookup is not None and cache_lookup.hit is not None:
+            response_data = apply_cached_step_reply(cache_lookup, purpose, current_summary_array)
+            yield "token", {"text": response_data["explanation"]}
+            yield "final", response_data
+            return
+
+        client = get_async_azure_client()
+        deployment_name = AZURE_OPENAI_DEPLOYMENT_NAME
+
+        reference_chunks = await aretrieve_reference_chunks(user_input, purpose, session_id, plan)
+
+        if purpose == 'integrator':
+            full_summary_text, proposal_input = prepare_integrator_context(current_summary_array, user_input)
+
+            # The suggestions run as a task while the proposal streams to the user.
+            suggestions_task = asyncio.create_task(
+                call_suggestions_agent_async(client, deployment_name, full_summary_text, use_cache)
+            )
+            proposal_parts = []
+            try:
+                async for delta in astream_chat_completion(
+                    client,
+                    use_cache=use_cache,
+                    model=deployment_name,
+                    messages=build_proposal_messages(full_summary_text, proposal_input),
+                    max_tokens=2000,
+                    temperature=0.5,
+                ):
+                    proposal_parts.append(delta)
+                    yield "token", {"text": delta}
+            except BaseException:
+                # Also covers the client disconnecting mid-stream.
+                suggestions_task.cancel()
+                raise
+
+            try:
+                suggestions_output = await suggestions_task
+            except Exception as e:
+                print(f"Suggestions agent failed, returning proposal only: {e}", file=os.sys.stderr)
+                suggestions_output = None
+
+            suggestions_section = format_suggestions_section(suggestions_output)
+            if suggestions_section:
+                yield "token", {"text": suggestions_section}
+
+            yield "final", {
+                "type": "summary_only",
+                "summary": "".join(proposal_parts) + suggestions_section
+            }
+            return
+
+        current_purpose_summary = current_summary_array.get(purpose, "")
+        messages = prepare_step_messages(purpose, config["persona"], reference_chunks, current_purpose_summary, user_input)
+
+        summary_task = None
+        if SUMMARY_EXECUTION_MODE == "concurrent":
+            summary_task = asyncio.create_task(
+                generate_summary_async(purpose, user_input, current_purpose_summary, use_cache)
+            )
+
+        try:
+            explanation_extractor = JsonStringFieldExtractor("explanation")
+            response_parts = []
+            async for delta in astream_chat_completion(
+                client,
+                use_cache=use_cache,
+                validate=is_valid_json,
+                model=deployment_name,
+                messages=messages,
+                max_tokens=1000,
+                temperature=0.5,
+                **structured_reply_options(),
+            ):
+                response_parts.append(delta)
+                explanation_delta = explanation_extractor.feed(delta)
+                if explanation_delta:
+                    yield "token", {"text": explanation_delta}
+
+            ai_response_json = await request_structured_reply_async(
+                client, deployment_name, messages, STRUCTURED_REPLY_MAX_RETRIES,
+                first_response_str="".join(response_parts), use_cache=use_cache
+            )
+        except BaseException:
+            if summary_task:
+                summary_task.cancel()
+            raise
+
+        if ai_response_json is None:
+            if summary_task:
+                summary_task.cancel()
+            yield "final", {"type": "error", "summary": f"Failed to get a valid JSON response after {STRUCTURED_REPLY_MAX_RETRIES} attempts. The AI did not adhere to the format."}
+            return
+
+        if summary_task:
+            summary_response = await summary_task
+        else:
+            summary_response = await generate_summary_async(purpose, user_input, current_purpose_summary, use_cache)
+        with SUMMARY_UPDATE_LOCK:
+            current_summary_array[purpose] = summary_response
+
+        response_data = build_step_response(ai_response_json)
+        store_step_reply(cache_lookup, response_data, summary_response)
+        yield "final", response_data
+
+    except Exception as e:
+        yield "final", {"type": "error", "summary": f"An error occurred during AI processing for '{purpose}': {str(e)}"}
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import threading
+from urllib.parse import parse_qs
+
+# Add the backend directory to the Python path to allow importing prompts
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from prompts import SYSTEM_PROMPTS, SUMMARY_AGENT_SYSTEM_MESSAGE, SUGGESTIONS_AGENT_SYSTEM_MESSAGE
+
+# --- Local Azure OpenAI Stand-in ---
+# An ASGI app that speaks the Azure chat-completions API (plain and streamed) with canned,
+# purpose-aware replies, so the whole serving stack can be load-tested offline:
+#     python mock_azure_server.py --port 8099 --latency-ms 800 --rate-limit-rate 0.02
+# then set AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8099 (any API key, version and deployment).
+# Latency, throughput and fault rates can also be set with MOCK_AZURE_* environment variables.
+
+MOCK_SETTINGS = {
+    # Time to first token: "fixed", "uniform" (latency_ms +/- latency_spread_ms),
+    # "normal" (sigma = latency_spread_ms) or "lognormal" (median latency_ms, sigma = latency_sigma).
+    "latency_distribution": os.getenv("MOCK_AZURE_LATENCY_DISTRIBUTION", "lognormal"),
+    "latency_ms": float(os.getenv("MOCK_AZURE_LATENCY_MS", "500")),
+    "latency_spread_ms": float(os.getenv("MOCK_AZURE_LATENCY_SPREAD_MS", "200")),
+    "latency_sigma": float(os.getenv("MOCK_AZURE_LATENCY_SIGMA", "0.5")),
+    # Generation speed after the first token; 0 returns the whole completion at once.
+    "tokens_per_second": float(os.getenv("MOCK_AZURE_TOKENS_PER_SECOND", "80")),
+    # Fault rates, each a probability per request.
+    "error_rate": float(os.getenv("MOCK_AZURE_ERROR_RATE", "0")),
+    "rate_limit_rate": float(os.getenv("MOCK_AZURE_RATE_LIMIT_RATE", "0")),
+    "malformed_json_rate": float(os.getenv("MOCK_AZURE_MALFORMED_JSON_RATE", "0")),
+    "retry_after_seconds": int(os.getenv("MOCK_AZURE_RETRY_AFTER_SECONDS", "1")),
+    "seed": os.getenv("MOCK_AZURE_SEED"),
+}
+
+MOCK_STATS = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "malformed": 0, "completion_tokens": 0}
+_stats_lock = threading.Lock()
+_rng = random.Random(MOCK_SETTINGS["seed"])
+
+MAX_REQUEST_BODY_BYTES = 4 * 1024 * 1024
+
+EVALUATION_REPLY = {"factual_accuracy": 0.9, "faithfulness": 0.85, "relevance": 0.95}
+
+SIMULATED_USER_INPUTS = [
+    "How can VR help my students understand 3D geometry?",
+    "What equipment would we need for a VR lab?",
+    "How do I measure whether VR improves learning?",
+    "We will pilot VR in MATH 1013 next semester.",
+    "We will start with one VR module on vector calculus.",
+]
+
+
+def configure(**settings):
+    """Updates MOCK_SETTINGS (ignoring None values) and reseeds the random generator."""
+    global _rng
+    MOCK_SETTINGS.update({key: value for key, value in settings.items() if value is not None})
+    _rng = random.Random(MOCK_SETTINGS["seed"])
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, amount in increments.items():
+            MOCK_STATS[name] += amount
+
+
+def get_mock_stats():
+    """Returns the request and fault counters."""
+    with _stats_lock:
+        stats = dict(MOCK_STATS)
+    stats["settings"] = dict(MOCK_SETTINGS)
+    return stats
+
+
+def sample_latency_seconds():
+    """Draws a time-to-first-token from the configured distribution."""
+    distribution = MOCK_SETTINGS["latency_distribution"]
+    latency_ms = MOCK_SETTINGS["latency_ms"]
+    spread_ms = MOCK_SETTINGS["latency_spread_ms"]
+    if distribution == "uniform":
+        latency_ms = _rng.uniform(latency_ms - spread_ms, latency_ms + spread_ms)
+    elif distribution == "normal":
+        latency_ms = _rng.gauss(latency_ms, spread_ms)
+    elif distribution == "lognormal":
+        latency_ms = latency_ms * math.exp(_rng.gauss(0, MOCK_SETTINGS["latency_sigma"]))
+    return max(latency_ms, 0) / 1000
+
+
+# --- Canned Replies ---
+def step_reply(purpose, user_input):
+    """A reply in the shape JSON_RESPONSE_FORMAT_INSTRUCTION asks for."""
+    config = SYSTEM_PROMPTS[purpose]
+    return json.dumps({
+        "explanation": f"You said: \"{user_input[:120]}\". That is a solid basis for the {purpose} of your project.",
+        "follow_up_question": config["initial_question"],
+        "new_options": config["options"][:3],
+    })
+
+
+def summary_reply(current_summary, user_input):
+    """Appends the user's input to the numbered summary list, as the summary agent does."""
+    lines = [line for line in (current_summary or "").splitlines() if line.strip()]
+    if user_input.strip():
+        lines.append(f"{len(lines) + 1}. {user_input.strip()[:160]}")
+    return "\n".join(lines)
+
+
+def proposal_reply(full_summary_text):
+    """A short markdown proposal built from the collected summaries."""
+    return f"# Project Proposal\n\n{full_summary_text.strip() or 'No summaries were collected yet.'}\n\n## Next Steps\nPilot the project for one semester and review the evaluation data."
+
+
+def suggestions_reply():
+    return "1. Name the target course and cohort size.\n2. Add a measurable success criterion for each learning outcome."
+
+
+def canned_reply(messages):
+    """Picks a reply that fits the agent that sent the messages. Returns (content, is_json)."""
+    system = messages[0].get("content", "") if messages else ""
+    assistant = next((m.get("content") or "" for m in messages if m.get("role") == "assistant"), "")
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+
+    if system == SUGGESTIONS_AGENT_SYSTEM_MESSAGE:
+        return suggestions_reply(), False
+    if system == SYSTEM_PROMPTS["integrator"]["persona"]:
+        return proposal_reply(assistant), False
+    if system in SUMMARY_AGENT_SYSTEM_MESSAGE.values():
+        return summary_reply(assistant, user), False
+    for purpose, config in SYSTEM_PROMPTS.items():
+        if purpose != "integrator" and config["persona"] in system:
+            return step_reply(purpose, user), True
+    if "factual_accuracy" in system:
+        return json.dumps(EVALUATION_REPLY), True
+    if "JSON array" in system or "Array object" in user:
+        return json.dumps(SIMULATED_USER_INPUTS), True
+    return "This is a canned reply from the local Azure OpenAI stand-in.", False
+
+
+def malform(content):
+    """Breaks a JSON reply the way models do: a code fence, single quotes or a truncated object."""
+    style = _rng.choice(["code_fence", "single_quotes", "truncated"])
+    if style == "code_fence":
+        return f"```json\n{content}\n```"
+    if style == "single_quotes":
+        return repr(json.loads(content))
+    return content[:max(len(content) // 2, 1)]
+
+
+def split_tokens(content):
+    """Splits content into word-sized pieces that stand in for tokens."""
+    pieces = []
+    current = ""
+    for char in content:
+        current += char
+        if char in " \n":
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+# --- ASGI Plumbing ---
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if len(body) > MAX_REQUEST_BODY_BYTES:
+            return None
+        if not message.get("more_body", False):
+            return body
+
+
+async def send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]
+    headers.extend(extra_headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def completion_payload(completion_id, model, content, prompt_tokens, completion_tokens):
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chunk_payload(completion_id, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+async def stream_completion(send, completion_id, model, pieces):
+    """Sends the completion as Server-Sent Events, paced by tokens_per_second."""
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+    })
+
+    async def send_event(payload):
+        await send({"type": "http.response.body", "body": f"data: {json.dumps(payload)}\n\n".encode("utf-8"), "more_body": True})
+
+    # Azure opens with a chunk that has no choices and only carries content-filter results.
+    await send_event({"id": "", "object": "", "created": 0, "model": "", "choices": [], "prompt_filter_results": []})
+    await send_event(chunk_payload(completion_id, model, {"role": "assistant", "content": ""}))
+    delay = 1 / MOCK_SETTINGS["tokens_per_second"] if MOCK_SETTINGS["tokens_per_second"] > 0 else 0
+    for piece in pieces:
+        if delay:
+            await asyncio.sleep(delay)
+        await send_event(chunk_payload(completion_id, model, {"content": piece}))
+    await send_event(chunk_payload(completion_id, model, {}, finish_reason="stop"))
+    await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+
+async def chat_completions(scope, receive, send, deployment):
+    """Handles one chat completion request with the configured latency and faults."""
+    body = await read_body(receive)
+    try:
+        request = json.loads(body or b"null")
+        messages = request["messages"]
+    except (TypeError, KeyError, json.JSONDecodeError):
+        await send_json(send, 400, {"error": {"code": "BadRequest", "message": "Invalid chat completion request."}})
+        return
+
+    stream = bool(request.get("stream"))
+    _count(requests=1, streamed=int(stream))
+
+    roll = _rng.random()
+    if roll < MOCK_SETTINGS["rate_limit_rate"]:
+        _count(rate_limited=1)
+        retry_after = str(MOCK_SETTINGS["retry_after_seconds"]).encode("latin-1")
+        await send_json(
+            send, 429,
+            {"error": {"code": "429", "message": "Requests to the ChatCompletions_Create Operation have exceeded the call rate limit."}},
+            [(b"retry-after", retry_after), (b"x-ratelimit-remaining-requests", b"0")],
+        )
+        return
+
+    await asyncio.sleep(sample_latency_seconds())
+
+    if roll < MOCK_SETTINGS["rate_limit_rate"] + MOCK_SETTINGS["error_rate"]:
+        _count(errors=1)
+        await send_json(send, 500, {"error": {"code": "InternalServerError", "message": "The server had an error while processing your request."}})
+        return
+
+    content, is_json = canned_reply(messages)
+    if is_json and _rng.random() < MOCK_SETTINGS["malformed_json_rate"]:
+        _count(malformed=1)
+        content = malform(content)
+
+    pieces = split_tokens(content)
+    prompt_tokens = sum(len(split_tokens(m.get("content") or "")) for m in messages)
+    _count(completion_tokens=len(pieces))
+    completion_id = f"chatcmpl-mock{_rng.getrandbits(48):012x}"
+    model = request.get("model") or deployment
+
+    if stream:
+        await stream_completion(send, completion_id, model, pieces)
+        return
+
+    if MOCK_SETTINGS["tokens_per_second"] > 0:
+        await asyncio.sleep(len(pieces) / MOCK_SETTINGS["tokens_per_second"])
+    await send_json(send, 200, completion_payload(completion_id, model, content, prompt_tokens, len(pieces)))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    """
+    Routes:
+        POST /openai/deployments/<deployment>/chat/completions  (Azure style)
+        POST .../chat/completions                                 (OpenAI style)
+        GET  /mock/stats                                          (counters and settings)
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    path = scope["path"].rstrip("/")
+    parts = path.strip("/").split("/")
+    if scope["method"] == "GET" and path == "/mock/stats":
+        await send_json(send, 200, get_mock_stats())
+    elif scope["method"] == "POST" and parts[-2:] == ["chat", "completions"]:
+        if parts[:2] == ["openai", "deployments"] and len(parts) == 5:
+            deployment = parts[2]
+        else:
+            deployment = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("deployment", ["mock"])[0]
+        await chat_completions(scope, receive, send, deployment)
+    else:
+        await send_json(send, 404, {"error": {"code": "404", "message": "Resource not found"}})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Azure OpenAI chat-completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-distribution", choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--latency-ms", type=float, help="Median time to first token.")
+    parser.add_argument("--latency-spread-ms", type=float, help="Half-width (uniform) or standard deviation (normal).")
+    parser.add_argument("--latency-sigma", type=float, help="Sigma of the lognormal distribution.")
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--error-rate", type=float, help="Share of requests answered with HTTP 500.")
+    parser.add_argument("--rate-limit-rate", type=float, help="Share of requests answered with HTTP 429.")
+    parser.add_argument("--malformed-json-rate", type=float, help="Share of JSON replies that are broken.")
+    parser.add_argument("--retry-after-seconds", type=int)
+    parser.add_argument("--seed")
+    args = parser.parse_args()
+
+    configure(**{key: value for key, value in vars(args).items() if key not in ("host", "port")})
+    print(f"Mock Azure OpenAI listening on http://{args.host}:{args.port} with {json.dumps(MOCK_SETTINGS)}")
+    uvicorn.run(application, host=args.host, port=args.port, log_level="warning")
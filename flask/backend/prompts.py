@@ -241,8 +241,13 @@ JSON_RESPONSE_FORMAT_INSTRUCTION = (
     "Example format: {'explanation': '...', 'follow_up_question': '...', 'new_options': ['...', '...']}"
 )
 # Each prompt is a dictionary containing the initial question/options and the persona for explanation and asking follow_up_question.
+# "retrieval" lists the chunk tags (or source files) a step searches in the knowledge base, see rag_metadata.py.
+# "general" holds the chunks not specific to any step, such as eligibility, format and submission rules.
+# "retrieval": False skips the knowledge base for a step; "min_score" (see retrieval_planner.py) drops
+# retrieved chunks whose best match is less similar than that.
 SYSTEM_PROMPTS = {
     "objective": {
+        "retrieval": {"tags": ["objective", "general"]},
         "initial_question": "What is the primary goal of your project?",
         "options": ["Improve student motivation", "Enhance learning effectiveness", "Foster collaboration & communication", "Develop critical thinking skills"],
         "persona": (
@@ -255,6 +260,7 @@ SYSTEM_PROMPTS = {
         )
     },
     "outcomes": {
+        "retrieval": {"tags": ["outcomes", "general"]},
         "initial_question": "Based on your objective, which coure(s) are you targeting on, and what should learners be able to DO after the project?",
         "options": [
             "The learner, when presented with a case study, will be able to analyze it by identifying its root causes and effects.",
@@ -274,6 +280,7 @@ SYSTEM_PROMPTS = {
         )
     },
     "pedagogy": {
+        "retrieval": {"tags": ["pedagogy", "general"]},
         "initial_question": "Considering your objectives and desired outcomes, what pedagogical approaches and technologies are you considering?",
         "options": [
             "Gamification",
@@ -295,6 +302,7 @@ SYSTEM_PROMPTS = {
         )
     },
     "development": {
+        "retrieval": {"tags": ["development", "general"]},
         "initial_question": "Based on your project idea, what are your initial thoughts on its development plan?",
         "options": [
             "What specific features are required?",
@@ -315,6 +323,7 @@ SYSTEM_PROMPTS = {
         )
     },
     "implementation": {
+        "retrieval": {"tags": ["implementation", "general"]},
         "initial_question": "What is your plan for implementing the project?",
         "options": [
             "Pilot testing strategy",
@@ -333,6 +342,7 @@ SYSTEM_PROMPTS = {
         )
     },
     "evaluation": {
+        "retrieval": {"tags": ["evaluation", "general"]},
         "initial_question": "How will you know if the project was successful?",
         "options": [
             "By measuring knowledge change (e.g., pre/post-tests)",
@@ -352,6 +362,8 @@ SYSTEM_PROMPTS = {
     },
     "integrator": {
         # Integrator doesn't have an initial question, it only synthesizes.
+        # It works from the step summaries; its agents never see reference material.
+        "retrieval": False,
         "persona": (
             f"{PERSONA['integrator']}"
             "**Mission:** Your task is to: "
@@ -428,6 +440,9 @@ SYSTEM_PROMPTS = {
     }
 }
 
+# The user message for the integrator agent; the summaries themselves are already in its context.
+INTEGRATOR_SYNTHESIS_INSTRUCTION = "Synthesize the project proposal from the collected summaries above."
+
 # Define a new, dedicated prompt for the suggestions agent
 SUGGESTIONS_AGENT_SYSTEM_MESSAGE = (
     "You are a critical project review expert. Your task is to analyze the provided project summaries and provide concise, actionable suggestions for improvement. The suggestions should be based solely on the content and any missing information in the summaries. Do not introduce new ideas. "
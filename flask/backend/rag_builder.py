@@ -1,37 +1,44 @@
 import os
-from docx import Document
+import time
+import argparse
+from functools import partial
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+from embedding_backends import make_embeddings
+from vector_index import VectorIndexWriter, read_index_dtype, VECTOR_DTYPES
+from keyword_index import KeywordIndexWriter
+from rag_manifest import (
+    hash_file, make_chunk_id, new_manifest, load_manifest, save_manifest, plan_update, stale_chunk_ids
+)
+from rag_metadata import chunk_metadata, METADATA_VERSION
+from document_sources import list_source_files, iter_source_units
+from ingest_pipeline import run_ingest, format_ingest_stats, INGEST_WORKERS, EMBED_BATCH_SIZE
 
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
 
-# Make sure you have the necessary libraries installed
-# pip install python-docx langchain langchain-community sentence-transformers chromadb
+# Storage dtype of the exported NumPy vectors: float32, or float16/int8 to cut the memory each
+# worker maps (searches re-score the top candidates with float32, see vector_index.py).
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float32")
+
+# Chroma rejects very large add/delete calls, so ids are sent in slices of this size.
+STORE_BATCH_SIZE = 1000
+
+# The exports read the store a page of this many chunks at a time and write each page to the
+# index files, so their memory does not grow with the corpus.
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+
+# Make sure you have the necessary libraries installed: requirements.txt (which includes
+# python-docx and pypdf>=3.17, for layout-mode PDF text) plus the build-only packages
+# pip install -r ../requirements.txt langchain langchain-community langchain-huggingface sentence-transformers chromadb
 
 # --- Step 1: Document Processing for Multiple Files ---
-def extract_text_from_multiple_docx(directory_path):
-    """Extracts text from all .docx files in a given directory."""
-    full_text = ""
-    if not os.path.isdir(directory_path):
-        print(f"Error: Directory not found at {directory_path}")
-        return None
-
-    # Iterate through all files in the specified directory
-    for filename in os.listdir(directory_path):
-        if filename.endswith(".docx"):
-            file_path = os.path.join(directory_path, filename)
-            try:
-                doc = Document(file_path)
-                for para in doc.paragraphs:
-                    full_text += para.text + "\n"
-                print(f"Successfully extracted text from: {filename}")
-            except Exception as e:
-                print(f"Error extracting text from {filename}: {e}")
-                
-    return full_text if full_text else None
+# The .docx and .pdf sources are listed and read unit by unit in document_sources.py.
 
 # --- Step 2: Chunking ---
-def chunk_text(text, chunk_size=1000, chunk_overlap=200):
+def chunk_text(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """Splits a large text document into smaller, overlapping chunks."""
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
@@ -40,40 +47,198 @@ def chunk_text(text, chunk_size=1000, chunk_overlap=200):
     )
     return text_splitter.split_text(text)
 
+
+def extract_chunks(data_dir, content_hashes, source):
+    """
+    Extracts and chunks one source file unit by unit (a .docx section or a PDF page), so no
+    chunk spans two headings or pages. Yields (chunk_id, text, metadata) with the source,
+    heading path, position, page and tags as each unit is read, never holding the whole file.
+    Runs in the ingest process pool, so it only takes picklable arguments.
+    """
+    position = 0
+    for section, (heading_path, text, page) in enumerate(iter_source_units(os.path.join(data_dir, source))):
+        for chunk in chunk_text(text):
+            yield (
+                make_chunk_id(source, content_hashes[source], position),
+                chunk,
+                chunk_metadata(source, heading_path, position, section, page=page),
+            )
+            position += 1
+
+
 # --- Step 3: Embedding and Storing ---
-def embed_and_store_chunks(chunks, persist_directory="./rag_db"):
+def write_chunks(vector_store, ids, texts, vectors, metadatas):
+    """Bulk-writes one batch of already embedded chunks; upsert, so a resumed build can rewrite them."""
+    vector_store._collection.upsert(
+        ids=ids, documents=texts, metadatas=metadatas,
+        embeddings=[list(map(float, vector)) for vector in vectors],
+    )
+
+
+def delete_chunks(vector_store, chunk_ids):
+    """Deletes chunks from the store by id."""
+    for start in range(0, len(chunk_ids), STORE_BATCH_SIZE):
+        vector_store.delete(ids=chunk_ids[start:start + STORE_BATCH_SIZE])
+
+
+def build_settings():
+    """The settings a stored vector depends on; a change forces a full rebuild."""
+    return {
+        "model": EMBEDDING_MODEL_NAME, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+        "metadata_version": METADATA_VERSION,
+    }
+
+
+def update_knowledge_base(data_dir, persist_directory="./rag_db", rebuild=False,
+                          workers=INGEST_WORKERS, batch_size=EMBED_BATCH_SIZE):
     """
-    Converts text chunks into vector embeddings and stores them in a
-    local vector database (ChromaDB).
+    Brings the vector store in line with the .docx and .pdf files in data_dir, embedding only what changed.
+
+    New and changed files are extracted, chunked and embedded; the chunks of changed and
+    deleted files are removed; unchanged files keep their vectors. Without a manifest (or with
+    different model/chunk settings, or rebuild=True) the store is emptied and rebuilt once.
+
+    Files are parsed in a pool of `workers` processes and their chunks streamed to the embedder,
+    `batch_size` chunks at a time.
+
+    Returns:
+        tuple: (vector_store, plan), where plan is the dict from rag_manifest.plan_update
+               plus the number of chunks added and deleted and the ingest throughput stats.
     """
-    embeddings_model = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2"
+    settings = build_settings()
+    current_hashes = {filename: hash_file(os.path.join(data_dir, filename)) for filename in list_source_files(data_dir)}
+    manifest = None if rebuild else load_manifest(persist_directory)
+    plan = plan_update(current_hashes, manifest, settings)
+
+    vector_store = Chroma(
+        persist_directory=persist_directory,
+        embedding_function=make_embeddings(EMBEDDING_MODEL_NAME)
     )
 
-    vector_store = Chroma.from_texts(
-        texts=chunks,
-        embedding=embeddings_model,
-        persist_directory=persist_directory
+    if plan["full_rebuild"]:
+        # Also clears the randomly-keyed chunks of stores built before manifests existed.
+        removed_ids = vector_store.get(include=[])["ids"]
+        manifest = new_manifest(settings)
+    else:
+        removed_ids = stale_chunk_ids(manifest, plan)
+    delete_chunks(vector_store, removed_ids)
+    for source in plan["changed"] + plan["deleted"]:
+        manifest["files"].pop(source, None)
+
+    def record_source(source, chunk_ids):
+        # Recorded per file once all of its chunks are stored, so an interrupted build resumes from here.
+        manifest["files"][source] = {"sha256": current_hashes[source], "chunk_ids": chunk_ids}
+        save_manifest(persist_directory, manifest)
+
+    # Parse in parallel, embed and write in batches (see ingest_pipeline.py).
+    to_embed = plan["added"] + plan["changed"]
+    ingest_stats = run_ingest(
+        to_embed,
+        extract=partial(extract_chunks, data_dir, current_hashes),
+        embed=vector_store.embeddings.embed_documents,
+        write=partial(write_chunks, vector_store),
+        on_source_done=record_source,
+        # A file that fails halfway is not in the manifest, so its chunks written so far go again.
+        on_source_failed=lambda source, chunk_ids: delete_chunks(vector_store, chunk_ids),
+        workers=workers,
+        batch_size=batch_size,
     )
-    
-    vector_store.persist()
-    print(f"Successfully embedded and stored {len(chunks)} chunks.")
-    return vector_store
+    plan["ingest"] = ingest_stats
+
+    save_manifest(persist_directory, manifest)
+    plan["chunks_added"] = ingest_stats["chunks"]
+    plan["chunks_deleted"] = len(removed_ids)
+    return vector_store, plan
+
+# --- Step 4: Exporting the In-process Vector and Keyword Indexes ---
+def iter_store_pages(vector_store, include, page_size=EXPORT_PAGE_SIZE):
+    """Yields the chunks of the Chroma store a page at a time, as collection.get results."""
+    collection = vector_store._collection
+    for offset in range(0, collection.count(), page_size):
+        yield collection.get(include=include, limit=page_size, offset=offset)
+
+
+def export_vector_index(vector_store, persist_directory="./rag_db", dtype=VECTOR_INDEX_DTYPE,
+                        page_size=EXPORT_PAGE_SIZE):
+    """
+    Exports every vector and chunk text of the Chroma store to the memory-mappable files
+    used by the "numpy" retriever backend in main.py (see vector_index.py), stored as `dtype`.
+    The store is read and written `page_size` chunks at a time.
+    """
+    index_dir = os.path.join(persist_directory, "numpy_index")
+    with VectorIndexWriter(index_dir, vector_store._collection.count(), EMBEDDING_MODEL_NAME, dtype=dtype) as writer:
+        for page in iter_store_pages(vector_store, ["embeddings", "documents", "metadatas"], page_size):
+            writer.add(page["ids"], page["documents"], page["embeddings"], metadatas=page["metadatas"])
+    print(f"Successfully exported {writer.written} {dtype} vectors to {index_dir}.")
+    return writer.written
+
+
+def export_keyword_index(vector_store, persist_directory="./rag_db", page_size=EXPORT_PAGE_SIZE):
+    """
+    Builds the BM25 inverted index over every chunk of the Chroma store, used for hybrid
+    retrieval in main.py (see keyword_index.py), reading the store `page_size` chunks at a time.
+    """
+    index_dir = os.path.join(persist_directory, "keyword_index")
+    with KeywordIndexWriter(index_dir) as writer:
+        for page in iter_store_pages(vector_store, ["documents", "metadatas"], page_size):
+            writer.add(page["ids"], page["documents"], metadatas=page["metadatas"])
+    print(f"Successfully indexed {writer.written} chunks for keyword search in {index_dir}.")
+    return writer.written
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the RAG knowledge base from the .docx and .pdf files in ../data.")
+    parser.add_argument("--export-only", action="store_true",
+                        help="Only export the existing rag_db chunks for the numpy retriever and keyword search.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-embed every file instead of only new and changed ones.")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES, default=VECTOR_INDEX_DTYPE,
+                        help="Storage dtype of the exported NumPy vectors.")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="Processes parsing documents in parallel (1 parses in this process).")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="Chunks per embedding call and store write.")
+    args = parser.parse_args()
+
+    if args.export_only:
+        db = Chroma(
+            persist_directory="./rag_db",
+            embedding_function=make_embeddings(EMBEDDING_MODEL_NAME)
+        )
+        export_vector_index(db, dtype=args.vector_dtype)
+        export_keyword_index(db)
+        raise SystemExit(0)
+
     # Define the path to your data directory
     data_dir = os.path.join(os.path.dirname(__file__), '../data')
-    
-    # 1. Extract text from all DOCX files in the data directory
-    raw_text = extract_text_from_multiple_docx(data_dir)
-    
-    if raw_text:
-        # 2. Split the combined text into manageable chunks
-        text_chunks = chunk_text(raw_text)
-        
-        # 3. Embed the chunks and store them in a vector database
-        db = embed_and_store_chunks(text_chunks)
+    if not os.path.isdir(data_dir):
+        print(f"Error: Directory not found at {data_dir}")
+        raise SystemExit(1)
+
+    # 1-3. Extract, chunk and embed the new and changed files; drop the chunks of changed and deleted ones
+    start = time.perf_counter()
+    db, plan = update_knowledge_base(data_dir, rebuild=args.rebuild, workers=args.workers, batch_size=args.batch_size)
+    if plan["ingest"]["docs"] or plan["ingest"]["failed"]:
+        print(f"Ingest: {format_ingest_stats(plan['ingest'])}")
+    print(
+        f"{'Full rebuild' if plan['full_rebuild'] else 'Incremental update'}: "
+        f"{len(plan['added'])} added, {len(plan['changed'])} changed, {len(plan['deleted'])} deleted, "
+        f"{len(plan['unchanged'])} unchanged files; {plan['chunks_added']} chunks embedded, "
+        f"{plan['chunks_deleted']} removed in {time.perf_counter() - start:.1f}s."
+    )
+
+    index_missing = not all(os.path.exists(os.path.join("./rag_db", name)) for name in ("numpy_index", "keyword_index"))
+    exported_dtype = read_index_dtype(os.path.join("./rag_db", "numpy_index"))
+    if exported_dtype is not None and exported_dtype != args.vector_dtype:
+        print(f"The NumPy index holds {exported_dtype} vectors; re-exporting them as {args.vector_dtype}.")
+    if (plan["full_rebuild"] or plan["chunks_added"] or plan["chunks_deleted"] or index_missing
+            or exported_dtype != args.vector_dtype):
+        db.persist()
+        # 4. Export the vectors for the in-process NumPy retriever and the keyword index for hybrid search
+        export_vector_index(db, dtype=args.vector_dtype)
+        export_keyword_index(db)
         print("RAG knowledge base for all documents built successfully!")
+    elif not plan["unchanged"]:
+        print("No text was extracted. Please check the data directory and file formats.")
     else:
-        print("No text was extracted. Please check the data directory and file formats.")
\ No newline at end of file
+        print("RAG knowledge base is already up to date.")
@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+
+
+# --- Knowledge Base Manifest ---
+# rag_builder.py records, for every source file, the hash of its content and the ids of the
+# chunks it produced. A rebuild then only embeds new or changed files and deletes the chunks
+# of changed or removed files; everything else stays in the store untouched.
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_file(path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(source, content_hash, position):
+    """Stable id of the chunk at `position` of a given version of a source file."""
+    return hashlib.sha256(f"{source}\x00{content_hash}\x00{position}".encode("utf-8")).hexdigest()[:32]
+
+
+def new_manifest(settings):
+    """An empty manifest for a store built with the given settings (model, chunking)."""
+    return {"version": MANIFEST_VERSION, "settings": dict(settings), "files": {}}
+
+
+def load_manifest(persist_directory):
+    """Returns the manifest stored with the knowledge base, or None if there is none."""
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_directory, manifest):
+    """Writes the manifest atomically, so an interrupted build never leaves a torn file."""
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_update(current_hashes, manifest, settings):
+    """
+    Compares the source files on disk with the manifest.
+
+    Args:
+        current_hashes (dict): {source name: content hash} of the files on disk.
+        manifest (dict or None): The manifest of the existing store.
+        settings (dict): The model and chunking settings of this build.
+
+    Returns:
+        dict: {"full_rebuild": bool, "added": [...], "changed": [...], "deleted": [...],
+               "unchanged": [...]} with source names; for a full rebuild every current
+               file is in "added".
+    """
+    if manifest is None or manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != settings:
+        # No manifest (e.g. a store built before manifests existed) or different settings:
+        # the existing vectors cannot be matched to files, so start over.
+        return {"full_rebuild": True, "added": sorted(current_hashes), "changed": [], "deleted": [], "unchanged": []}
+
+    known = manifest["files"]
+    plan = {"full_rebuild": False, "added": [], "changed": [], "deleted": [], "unchanged": []}
+    for source, content_hash in sorted(current_hashes.items()):
+        if source not in known:
+            plan["added"].append(source)
+        elif known[source]["sha256"] != content_hash:
+            plan["changed"].append(source)
+        else:
+            plan["unchanged"].append(source)
+    plan["deleted"] = sorted(source for source in known if source not in current_hashes)
+    return plan
+
+
+def stale_chunk_ids(manifest, plan):
+    """The ids of the chunks to delete: those of changed and deleted files."""
+    if manifest is None or plan["full_rebuild"]:
+        return []
+    return [chunk_id for source in plan["changed"] + plan["deleted"] for chunk_id in manifest["files"][source]["chunk_ids"]]
@@ -0,0 +1,172 @@
+import re
+
+
+# --- Chunk Metadata and Purpose Filters ---
+# rag_builder.py stores, with every chunk, its source file, heading path, position and purpose
+# tags. Each SYSTEM_PROMPTS entry declares under "retrieval" which tags and/or source files it
+# searches, e.g. {"tags": ["evaluation", "general"]}; RAG_CONTEXT_MANAGER turns that into a
+# store filter so a purpose only ranks its own part of the corpus.
+
+# Version 2 added DOCX tables, PDF sources and the page field; version 3 matches purpose
+# keywords on word boundaries.
+METADATA_VERSION = 3
+
+# A chunk gets a purpose tag when its heading path (or, without headings, its source file name)
+# mentions one of the keywords. Chunks matching no purpose are tagged "general".
+# Keywords match whole words (plural "s" allowed), so "ilo" does not match "pilot"; a keyword
+# ending in "*" matches any word starting with it ("pedagog*": pedagogy, pedagogical).
+PURPOSE_TAG_KEYWORDS = {
+    "objective": ("objective", "aim", "rationale", "background", "need", "motivation"),
+    "outcomes": ("outcome", "ilo", "learning goal", "competenc*"),
+    "pedagogy": ("pedagog*", "teaching", "learning activit*", "approach", "technolog*"),
+    "development": ("development", "deliverable", "budget", "resource", "staff"),
+    "implementation": ("implementation", "timeline", "schedule", "milestone", "dissemination", "sustainab*"),
+    "evaluation": ("evaluation", "assessment", "impact", "measur*", "indicator", "feedback"),
+}
+GENERAL_TAG = "general"
+
+
+def keyword_pattern(keywords):
+    """One regex matching any of the keywords on word boundaries (see PURPOSE_TAG_KEYWORDS)."""
+    alternatives = [
+        rf"{re.escape(keyword[:-1])}\w*" if keyword.endswith("*") else rf"{re.escape(keyword)}s?"
+        for keyword in keywords
+    ]
+    return re.compile(rf"\b(?:{'|'.join(alternatives)})\b")
+
+
+PURPOSE_TAG_PATTERNS = {tag: keyword_pattern(keywords) for tag, keywords in PURPOSE_TAG_KEYWORDS.items()}
+
+HEADING_STYLE_PATTERN = re.compile(r"^(?:Heading\s*(\d+)|Title)$", re.IGNORECASE)
+HEADING_PATH_SEPARATOR = " > "
+
+
+def tag_field(tag):
+    """The boolean metadata field marking a tag (Chroma metadata values must be scalars)."""
+    return f"tag_{tag}"
+
+
+def tags_for(heading_path, source):
+    """Returns the purpose tags of a chunk from its heading path and source file name."""
+    # Underscores and punctuation separate words too ("evaluation_examples.docx").
+    haystack = " ".join(re.sub(r"[\W_]+", " ", (heading_path or source).lower()).split())
+    tags = [tag for tag, pattern in PURPOSE_TAG_PATTERNS.items() if pattern.search(haystack)]
+    return tags or [GENERAL_TAG]
+
+
+def chunk_metadata(source, heading_path, position, section, page=None):
+    """
+    Builds the metadata stored with a chunk.
+
+    Args:
+        source (str): The source file name.
+        heading_path (str): The headings above the chunk, outermost first.
+        position (int): The chunk's index within its source.
+        section (int): The index of its section within the source.
+        page (int, optional): The 1-based page number, for sources with pages (PDF).
+    """
+    metadata = {
+        "source": source,
+        "heading_path": heading_path,
+        "position": position,
+        "section": section,
+        "tags": ",".join(tags_for(heading_path, source)),
+    }
+    if page is not None:
+        metadata["page"] = page
+    for tag in metadata["tags"].split(","):
+        metadata[tag_field(tag)] = True
+    return metadata
+
+
+def iter_sections(paragraphs, max_chars=None):
+    """
+    Groups (style_name, text) paragraphs into sections under their headings, yielding each
+    section as soon as the next heading starts it.
+
+    With max_chars, a longer section is yielded in parts of about that size (split between
+    paragraphs, each part under the same heading path), so a document without headings is
+    never held as one string.
+
+    Yields:
+        tuple: (heading_path, text); text before the first heading has an empty path.
+    """
+    headings = []
+    lines = []
+    size = 0
+
+    def close_section():
+        text = "\n".join(lines).strip()
+        lines.clear()
+        if text:
+            return HEADING_PATH_SEPARATOR.join(title for _, title in headings), text + "\n"
+        return None
+
+    for style_name, text in paragraphs:
+        match = HEADING_STYLE_PATTERN.match(style_name or "")
+        if match and text.strip():
+            section = close_section()
+            if section:
+                yield section
+            size = 0
+            level = int(match.group(1)) if match.group(1) else 0
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, text.strip()))
+        else:
+            lines.append(text)
+            size += len(text) + 1
+            if max_chars and size >= max_chars:
+                section = close_section()
+                if section:
+                    yield section
+                size = 0
+    section = close_section()
+    if section:
+        yield section
+
+
+def split_sections(paragraphs):
+    """
+    Groups (style_name, text) paragraphs into sections under their headings.
+
+    Returns:
+        list: [(heading_path, text), ...]; text before the first heading has an empty path.
+    """
+    return list(iter_sections(paragraphs))
+
+
+def retrieval_spec(config):
+    """
+    Normalizes a SYSTEM_PROMPTS entry's "retrieval" declaration to {"tags": [...], "sources": [...]},
+    or None when the purpose searches the whole corpus.
+    """
+    spec = (config or {}).get("retrieval")
+    if not spec or not (spec.get("tags") or spec.get("sources")):
+        return None
+    return {"tags": sorted(spec.get("tags") or []), "sources": sorted(spec.get("sources") or [])}
+
+
+def spec_key(spec):
+    """A hashable key for a retrieval spec (for caching filtered candidate sets)."""
+    if spec is None:
+        return None
+    return (tuple(spec["tags"]), tuple(spec["sources"]))
+
+
+def build_chroma_where(spec):
+    """Translates a retrieval spec into a Chroma `where` filter (None for no filter)."""
+    if spec is None:
+        return None
+    clauses = [{tag_field(tag): True} for tag in spec["tags"]]
+    if spec["sources"]:
+        clauses.append({"source": {"$in": spec["sources"]}})
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def matches_spec(metadata, spec):
+    """True if a chunk's metadata satisfies a retrieval spec (the in-process equivalent of the where filter)."""
+    if spec is None:
+        return True
+    metadata = metadata or {}
+    return any(metadata.get(tag_field(tag)) for tag in spec["tags"]) or metadata.get("source") in spec["sources"]
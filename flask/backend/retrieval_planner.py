@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from keyword_index import tokenize
+
+
+# --- Retrieval Planner Settings ---
+# Decides per purpose and per query whether a turn retrieves reference material at all:
+#   skip   - the purpose declares "retrieval": False in SYSTEM_PROMPTS (e.g. the integrator,
+#            whose prompt never includes reference material);
+#   reuse  - a near-identical follow-up in the same session and purpose within the reuse window
+#            gets the chunks retrieved last time, without embedding or searching again;
+#   retrieve - otherwise. RAG_CONTEXT_MANAGER then drops the results if the best match is
+#            below the purpose's "min_score" (default RAG_MIN_SCORE), so weak matches do not
+#            cost prompt tokens.
+RAG_MIN_SCORE = float(os.getenv("RAG_MIN_SCORE", "0.2"))
+RAG_REUSE_WINDOW_SECONDS = float(os.getenv("RAG_REUSE_WINDOW_SECONDS", "300"))
+# Token-set (Jaccard) similarity at which a follow-up counts as near-identical.
+RAG_REUSE_SIMILARITY = float(os.getenv("RAG_REUSE_SIMILARITY", "0.8"))
+RAG_REUSE_MAX_SESSIONS = int(os.getenv("RAG_REUSE_MAX_SESSIONS", "4096"))
+
+
+def retrieves(config):
+    """False if a SYSTEM_PROMPTS entry opts out of retrieval with "retrieval": False."""
+    return (config or {}).get("retrieval", True) is not False
+
+
+def min_score(config):
+    """The similarity a purpose's best match must reach for its chunks to be used."""
+    retrieval = (config or {}).get("retrieval")
+    if isinstance(retrieval, dict) and "min_score" in retrieval:
+        return float(retrieval["min_score"])
+    return RAG_MIN_SCORE
+
+
+def query_similarity(first, second):
+    """Jaccard similarity of the two queries' token sets (1.0 for two empty queries)."""
+    first, second = set(tokenize(first)), set(tokenize(second))
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+class RetrievalPlanner:
+    """
+    Per-session memory of the last retrieval per purpose, and the skip/reuse decision.
+    """
+    def __init__(self, reuse_window_seconds=RAG_REUSE_WINDOW_SECONDS, reuse_similarity=RAG_REUSE_SIMILARITY,
+                 max_sessions=RAG_REUSE_MAX_SESSIONS):
+        self.reuse_window_seconds = reuse_window_seconds
+        self.reuse_similarity = reuse_similarity
+        self.max_sessions = max_sessions
+        self._recent = OrderedDict() # (session_id, purpose) -> (time, query, chunks)
+        self._lock = threading.Lock()
+        self._stats = {"retrieved": 0, "skipped_purpose": 0, "reused": 0}
+
+    def plan(self, purpose, config, session_id, query):
+        """
+        Returns ("skip", []), ("reuse", chunks) or ("retrieve", None) for a turn.
+        """
+        if not retrieves(config):
+            with self._lock:
+                self._stats["skipped_purpose"] += 1
+            return "skip", []
+        if session_id is not None and self.reuse_window_seconds > 0:
+            with self._lock:
+                recent = self._recent.get((session_id, purpose))
+                if recent is not None:
+                    retrieved_at, previous_query, chunks = recent
+                    if (time.monotonic() - retrieved_at <= self.reuse_window_seconds
+                            and query_similarity(query, previous_query) >= self.reuse_similarity):
+                        self._stats["reused"] += 1
+                        return "reuse", list(chunks)
+        with self._lock:
+            self._stats["retrieved"] += 1
+        return "retrieve", None
+
+    def remember(self, purpose, session_id, query, chunks):
+        """Records a retrieval, so a near-identical follow-up in the session can reuse it."""
+        if session_id is None or self.reuse_window_seconds <= 0:
+            return
+        with self._lock:
+            key = (session_id, purpose)
+            self._recent[key] = (time.monotonic(), query, list(chunks))
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_sessions:
+                self._recent.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+    def stats(self):
+        """Counters for /api/metrics; retrievals_skipped counts the turns that did not search."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["remembered"] = len(self._recent)
+        stats["retrievals_skipped"] = stats["skipped_purpose"] + stats["reused"]
+        return stats
+
+
+RETRIEVAL_PLANNER = RetrievalPlanner()
@@ -0,0 +1,211 @@
+import os
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from retrieval_planner import query_similarity
+
+
+# --- Semantic Response Cache Settings ---
+# LLM_CACHE only matches byte-identical prompts. Faculty often ask the same thing again with
+# small changes (case, punctuation, a word or two), so step-purpose replies are also cached by
+# meaning: a question whose embedding (the one RAG_CONTEXT_MANAGER computes
+# for retrieval, shared through QUERY_EMBEDDING_CACHE) is at least SEMANTIC_CACHE_THRESHOLD
+# cosine-similar to an earlier question of the same purpose, asked with the same summary for
+# that purpose, gets the earlier structured reply and summary without any LLM call.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+# Looser rephrasings score lower; unit_test/bench_semantic_cache.py measures labelled pairs
+# with the retrieval model before the threshold is lowered.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(24 * 3600)))
+# False-hit sampling: this share of hits is answered fresh instead, and the fresh reply is
+# compared with the cached one. Below SEMANTIC_CACHE_AGREEMENT word overlap the hit counts as
+# false and the entry is dropped. The last SEMANTIC_CACHE_MAX_SAMPLES checks are kept for review.
+SEMANTIC_CACHE_VERIFY_RATE = float(os.getenv("SEMANTIC_CACHE_VERIFY_RATE", "0.05"))
+SEMANTIC_CACHE_AGREEMENT = float(os.getenv("SEMANTIC_CACHE_AGREEMENT", "0.3"))
+SEMANTIC_CACHE_MAX_SAMPLES = int(os.getenv("SEMANTIC_CACHE_MAX_SAMPLES", "50"))
+
+
+def summary_hash(summary):
+    """Hashes a purpose summary, so only questions asked in the same summary state share replies."""
+    return hashlib.sha256(" ".join((summary or "").split()).encode("utf-8")).hexdigest()
+
+
+def unit_vector(vector):
+    """The vector as float32 scaled to length 1, so a dot product is the cosine similarity."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticCacheEntry:
+    __slots__ = ("partition", "query", "vector", "reply", "text", "created_at")
+
+    def __init__(self, partition, query, vector, reply, text, created_at):
+        self.partition = partition
+        self.query = query
+        self.vector = vector
+        self.reply = reply
+        self.text = text
+        self.created_at = created_at
+
+
+class SemanticCacheLookup:
+    """
+    The result of SemanticResponseCache.lookup. hit is the cached reply, or None if the caller
+    must answer (and then pass the fresh reply to SemanticResponseCache.store).
+    """
+    __slots__ = ("partition", "query", "vector", "hit", "similarity", "verify")
+
+    def __init__(self, partition, query, vector, hit=None, similarity=None, verify=None):
+        self.partition = partition
+        self.query = query
+        self.vector = vector
+        self.hit = hit
+        self.similarity = similarity
+        self.verify = verify # (entry id, entry) a sampled hit is checked against
+
+
+class SemanticResponseCache:
+    """
+    In-memory nearest-neighbour cache of replies, partitioned by (purpose, summary hash, model).
+    A partition holds the few questions asked in one conversation state, so a lookup is one
+    matrix-vector product over that partition. Entries expire after ttl_seconds and the least
+    recently used are evicted beyond max_entries.
+    """
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                 ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS, verify_rate=SEMANTIC_CACHE_VERIFY_RATE,
+                 agreement=SEMANTIC_CACHE_AGREEMENT, max_samples=SEMANTIC_CACHE_MAX_SAMPLES,
+                 enabled=True, rng=None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.verify_rate = verify_rate
+        self.agreement = agreement
+        self.enabled = enabled
+        self._rng = rng or random.Random()
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # id -> SemanticCacheEntry, least recently used first
+        self._partitions = {} # partition -> {id: None}, in insertion order
+        self._matrices = {} # partition -> (ids, stacked vectors), rebuilt after a change
+        self._next_id = 0
+        self._samples = deque(maxlen=max_samples)
+        self._stats = {
+            "hits": 0, "sampled_hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0,
+            "verified": 0, "false_hits": 0,
+        }
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        members = self._partitions[entry.partition]
+        del members[entry_id]
+        if not members:
+            del self._partitions[entry.partition]
+        self._matrices.pop(entry.partition, None)
+
+    def _matrix(self, partition):
+        matrix = self._matrices.get(partition)
+        if matrix is None:
+            ids = list(self._partitions[partition])
+            matrix = ids, np.stack([self._entries[entry_id].vector for entry_id in ids])
+            self._matrices[partition] = matrix
+        return matrix
+
+    def lookup(self, partition, query, vector):
+        """
+        Finds the most similar earlier question in the partition. Returns a SemanticCacheLookup
+        whose hit is its reply if the similarity reaches the threshold.
+        """
+        vector = unit_vector(vector)
+        now = time.monotonic()
+        with self._lock:
+            if partition in self._partitions:
+                ids, matrix = self._matrix(partition)
+                expired = [entry_id for entry_id in ids if now - self._entries[entry_id].created_at > self.ttl_seconds]
+                for entry_id in expired:
+                    self._remove(entry_id)
+                self._stats["expired"] += len(expired)
+                if expired and partition in self._partitions:
+                    ids, matrix = self._matrix(partition)
+                if partition in self._partitions and matrix.shape[1] == vector.shape[0]:
+                    scores = matrix @ vector
+                    best = int(np.argmax(scores))
+                    similarity = float(scores[best])
+                    if similarity >= self.threshold:
+                        entry = self._entries[ids[best]]
+                        self._entries.move_to_end(ids[best])
+                        if self.verify_rate > 0 and self._rng.random() < self.verify_rate:
+                            # Answered fresh; store() compares the two replies.
+                            self._stats["sampled_hits"] += 1
+                            return SemanticCacheLookup(partition, query, vector, similarity=similarity, verify=(ids[best], entry))
+                        self._stats["hits"] += 1
+                        return SemanticCacheLookup(partition, query, vector, hit=entry.reply, similarity=similarity)
+            self._stats["misses"] += 1
+            return SemanticCacheLookup(partition, query, vector)
+
+    def store(self, lookup, reply, text):
+        """
+        Caches the fresh reply for a missed lookup; text is what false-hit checks compare.
+        For a sampled hit it records whether the cached reply agreed with the fresh one instead.
+        """
+        with self._lock:
+            if lookup.verify is not None:
+                verified_id, verified = lookup.verify
+                agreement = query_similarity(verified.text, text)
+                false_hit = agreement < self.agreement
+                self._stats["verified"] += 1
+                self._stats["false_hits"] += false_hit
+                self._samples.append({
+                    "purpose": lookup.partition[0],
+                    "query": lookup.query,
+                    "cached_query": verified.query,
+                    "similarity": round(lookup.similarity, 4),
+                    "agreement": round(agreement, 4),
+                    "false_hit": false_hit,
+                })
+                if not false_hit:
+                    return
+                # Replace the entry that answered wrongly with the fresh reply.
+                if self._entries.get(verified_id) is verified:
+                    self._remove(verified_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = SemanticCacheEntry(lookup.partition, lookup.query, lookup.vector, reply, text, time.monotonic())
+            self._partitions.setdefault(lookup.partition, {})[entry_id] = None
+            self._matrices.pop(lookup.partition, None)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        """Empties the cache and the false-hit samples."""
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+            self._matrices.clear()
+            self._samples.clear()
+
+    def stats(self):
+        """Returns the hit/miss and false-hit counters for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["partitions"] = len(self._partitions)
+            stats["recent_samples"] = list(self._samples)
+        lookups = stats["hits"] + stats["sampled_hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["false_hit_rate"] = stats["false_hits"] / stats["verified"] if stats["verified"] else 0.0
+        stats["threshold"] = self.threshold
+        stats["enabled"] = self.enabled
+        return stats
+
+
+SEMANTIC_CACHE = SemanticResponseCache(enabled=SEMANTIC_CACHE_ENABLED)
@@ -0,0 +1,169 @@
+import os
+import asyncio
+import threading
+
+
+# --- Single-Flight Settings ---
+# How long a follower waits for its leader before running the call itself, so a hung leader
+# cannot pin its followers' worker threads (or tasks) forever. 0 or less waits indefinitely.
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "300"))
+
+# Result of an async flight whose leader was cancelled: its followers start the call again.
+_ABANDONED = object()
+
+
+class Flight:
+    """One in-flight call that concurrent identical callers wait on."""
+    def __init__(self):
+        self._done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+    def finish(self, result=None, error=None, abandoned=False):
+        """Publishes the outcome to every waiting caller."""
+        self.result = result
+        self.error = error
+        self.abandoned = abandoned
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the leader finishes; returns False on timeout."""
+        return self._done.wait(timeout)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls: the first caller for a key (the leader) does the
+    work, later callers with the same key wait for it and share its result or exception.
+    Nothing is remembered once the call finishes; that is the response cache's job.
+    A follower that has waited wait_timeout seconds stops waiting and runs the call itself.
+
+    Usage:
+        CHAT_FLIGHTS.do(key, get_openai_reply, user_input, purpose, summary_array)
+    """
+    def __init__(self, name, wait_timeout=SINGLE_FLIGHT_WAIT_SECONDS):
+        self.name = name
+        self.wait_timeout = wait_timeout if wait_timeout and wait_timeout > 0 else None
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "abandoned": 0, "wait_timeouts": 0}
+
+    def begin(self, key):
+        """
+        Registers interest in key. Returns (flight, is_leader); the leader must call
+        end(key, flight, ...) exactly once, followers call wait(flight).
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            self._stats["leaders"] += 1
+            return flight, True
+
+    def wait(self, flight):
+        """
+        Waits up to wait_timeout for a flight; returns False (and counts it) on timeout, after
+        which the follower should run the call itself.
+        """
+        if flight.wait(self.wait_timeout):
+            return True
+        with self._lock:
+            self._stats["wait_timeouts"] += 1
+        return False
+
+    def end(self, key, flight, result=None, error=None, abandoned=False):
+        """Removes the flight and wakes its followers."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if abandoned:
+                self._stats["abandoned"] += 1
+        flight.finish(result, error, abandoned)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) once for all concurrent callers with the same key."""
+        flight, is_leader = self.begin(key)
+        if not is_leader:
+            if not self.wait(flight):
+                return fn(*args, **kwargs)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.end(key, flight, error=e)
+            raise
+        self.end(key, flight, result=result)
+        return result
+
+    async def ado(self, key, coro_fn, *args, **kwargs):
+        """
+        Coroutine counterpart of do(). Flights are tracked per event loop, so callers on
+        different loops (or threads) never await each other's futures. If the leader is
+        cancelled (e.g. its client disconnected), one of its followers runs the call instead.
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        while True:
+            with self._lock:
+                future = self._async_flights.get(flight_key)
+                is_leader = future is None
+                if is_leader:
+                    future = loop.create_future()
+                    self._async_flights[flight_key] = future
+                    self._stats["leaders"] += 1
+                else:
+                    self._stats["coalesced"] += 1
+            if is_leader:
+                break
+            # shield: a cancelled (or timed out) follower must not cancel the shared call.
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._stats["wait_timeouts"] += 1
+                return await coro_fn(*args, **kwargs)
+            if result is not _ABANDONED:
+                return result
+
+        try:
+            result = await coro_fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._async_flights.pop(flight_key, None)
+            if isinstance(e, asyncio.CancelledError):
+                with self._lock:
+                    self._stats["abandoned"] += 1
+                future.set_result(_ABANDONED)
+            else:
+                future.set_exception(e)
+                # Mark the exception as retrieved if nobody was waiting.
+                future.exception()
+            raise
+        with self._lock:
+            self._async_flights.pop(flight_key, None)
+        future.set_result(result)
+        return result
+
+    def stats(self):
+        """Returns the coalescing counters for the metrics endpoint."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights) + len(self._async_flights)
+        calls = stats["leaders"] + stats["coalesced"]
+        stats["coalesced_rate"] = stats["coalesced"] / calls if calls else 0.0
+        return stats
+
+
+# Identical chat requests from the same session (double-clicks, repeated submits).
+CHAT_FLIGHTS = SingleFlight("chat")
+
+# Identical cacheable completion requests from any session, keyed by the LLM cache key.
+LLM_FLIGHTS = SingleFlight("llm")
@@ -0,0 +1,234 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import threading
+
+# --- Token Budget Settings ---
+# Hard ceiling for the prompt of any single request, and the share of it each variable
+# section may use. The fixed sections (persona, format instructions) are always sent in full.
+PROMPT_TOKEN_CEILING = int(os.getenv("PROMPT_TOKEN_CEILING", "6000"))
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+# tiktoken downloads an encoding's BPE file on first use. Here it is read from a local cache
+# instead, filled once with `python3 token_budget.py --download`, so no request ever waits on
+# (or depends on) the download host. Without the file, tokens are estimated.
+TIKTOKEN_CACHE_DIR = os.getenv("TIKTOKEN_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "tiktoken"))
+os.environ["TIKTOKEN_CACHE_DIR"] = TIKTOKEN_CACHE_DIR
+# Where tiktoken fetches each encoding from; its cache file is named by the SHA-1 of the URL.
+TIKTOKEN_ENCODING_URLS = {
+    "o200k_base": "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+}
+
+# Per-purpose section budgets in tokens. Purposes not listed use "default".
+PURPOSE_TOKEN_BUDGETS = {
+    "default": {"reference": 1500, "summary": 800, "user_input": 600},
+    "integrator": {"summaries": 4000, "user_input": 300},
+}
+
+# A trimmed reference chunk shorter than this is dropped instead of being sent as a fragment.
+MIN_PARTIAL_CHUNK_TOKENS = 60
+
+# Characters per token for the fallback estimate when no local tokenizer is available.
+FALLBACK_CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+TOKEN_BUDGET_STATS = {"requests": 0, "chunks_dropped": 0, "chunks_trimmed": 0, "tokens_removed": 0}
+_stats_lock = threading.Lock()
+
+
+def encoding_file(name=TOKENIZER_ENCODING):
+    """The path of an encoding's BPE file in TIKTOKEN_CACHE_DIR (None for an unknown encoding)."""
+    url = TIKTOKEN_ENCODING_URLS.get(name)
+    return os.path.join(TIKTOKEN_CACHE_DIR, hashlib.sha1(url.encode()).hexdigest()) if url else None
+
+
+def _get_encoding():
+    """
+    Loads the tiktoken encoding once from TIKTOKEN_CACHE_DIR, never downloading it; returns None
+    (and warns once) if tiktoken or the encoding file is unavailable.
+    """
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                path = encoding_file()
+                if path is not None and not os.path.exists(path):
+                    raise FileNotFoundError(f"{path} is missing; run `python3 token_budget.py --download`")
+                import tiktoken
+                _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                print(f"Token budget: tokenizer unavailable ({e}); estimating {FALLBACK_CHARS_PER_TOKEN} chars per token.", file=sys.stderr)
+                _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+
+def load_encoding():
+    """Loads the tokenizer now (at warm-up), so the first request does not pay for it."""
+    return _get_encoding()
+
+
+def download_encoding(name=TOKENIZER_ENCODING):
+    """Fetches the encoding's BPE file into TIKTOKEN_CACHE_DIR (run once, at build time)."""
+    import tiktoken
+    tiktoken.get_encoding(name)
+    print(f"Saved the {name} encoding to {TIKTOKEN_CACHE_DIR}.")
+
+
+def count_tokens(text):
+    """Counts the tokens in text with the local tokenizer (or a character-based estimate)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // FALLBACK_CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    Cuts text to at most max_tokens, preferring to end at a sentence or line boundary.
+    Returns the text unchanged if it already fits.
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        cut = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        cut = text[:max_tokens * FALLBACK_CHARS_PER_TOKEN]
+
+    # Back off to the last sentence/line end if that keeps most of the allowance.
+    boundary = max(cut.rfind(". "), cut.rfind("\n"), cut.rfind("? "), cut.rfind("! "))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip()
+
+
+def fit_chunks(chunks, max_tokens):
+    """
+    Keeps the highest-ranked retrieved chunks that fit in max_tokens.
+    The first chunk that does not fit is trimmed if a useful part of it fits; the rest are dropped.
+
+    Args:
+        chunks (list): Chunk texts in rank order (best first).
+        max_tokens (int): The reference budget.
+
+    Returns:
+        tuple: (kept_chunks, dropped_count, trimmed_count)
+    """
+    kept = []
+    remaining = max_tokens
+    trimmed = 0
+    for index, chunk in enumerate(chunks):
+        chunk_tokens = count_tokens(chunk)
+        if chunk_tokens <= remaining:
+            kept.append(chunk)
+            remaining -= chunk_tokens
+            continue
+        if remaining >= MIN_PARTIAL_CHUNK_TOKENS:
+            kept.append(truncate_to_tokens(chunk, remaining))
+            trimmed = 1
+            index += 1
+        return kept, len(chunks) - index, trimmed
+    return kept, 0, trimmed
+
+
+def compact_summary(text, max_tokens):
+    """
+    Shrinks an oversized summary to max_tokens: first by collapsing whitespace,
+    then by keeping its leading items/lines.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n\s*\n+", "\n", text).strip()
+    return truncate_to_tokens(text, max_tokens)
+
+
+def share_budget(texts, max_tokens):
+    """
+    Splits max_tokens over several texts: short texts keep everything and their unused
+    share goes to the longer ones. Returns {key: allowance}.
+    """
+    sizes = {key: count_tokens(value) for key, value in texts.items() if value}
+    allowances = {}
+    remaining = max_tokens
+    pending = sorted(sizes, key=sizes.get)
+    while pending:
+        fair_share = remaining // len(pending)
+        key = pending[0]
+        if sizes[key] <= fair_share:
+            allowances[key] = sizes[key]
+        else:
+            # Every remaining text is larger than the fair share.
+            for key in pending:
+                allowances[key] = fair_share
+            break
+        remaining -= sizes[key]
+        pending.pop(0)
+    return allowances
+
+
+def get_budget(purpose):
+    """Returns the section budgets for a purpose."""
+    return PURPOSE_TOKEN_BUDGETS.get(purpose, PURPOSE_TOKEN_BUDGETS["default"])
+
+
+def record_sections(purpose, section_tokens, tokens_removed=0, chunks_dropped=0, chunks_trimmed=0):
+    """Logs the per-section token counts of a request and updates the aggregate counters."""
+    total = sum(section_tokens.values())
+    sections = " ".join(f"{name}={tokens}" for name, tokens in section_tokens.items())
+    print(f"prompt tokens purpose={purpose} total={total} {sections} removed={tokens_removed}", file=sys.stderr)
+    with _stats_lock:
+        TOKEN_BUDGET_STATS["requests"] += 1
+        TOKEN_BUDGET_STATS["chunks_dropped"] += chunks_dropped
+        TOKEN_BUDGET_STATS["chunks_trimmed"] += chunks_trimmed
+        TOKEN_BUDGET_STATS["tokens_removed"] += tokens_removed
+        for name, tokens in section_tokens.items():
+            TOKEN_BUDGET_STATS[f"{name}_tokens"] = TOKEN_BUDGET_STATS.get(f"{name}_tokens", 0) + tokens
+
+
+def get_token_budget_stats():
+    """Returns the aggregate token counters for the metrics endpoint."""
+    with _stats_lock:
+        stats = dict(TOKEN_BUDGET_STATS)
+    stats["prompt_token_ceiling"] = PROMPT_TOKEN_CEILING
+    stats["tokenizer"] = TOKENIZER_ENCODING if _get_encoding() is not None else "estimate"
+    return stats
+
+
+def parse_client_summaries(user_input):
+    """
+    Returns the summaries dict if user_input is the frontend's JSON.stringify(currentSummaries)
+    payload for the integrator, otherwise None.
+    """
+    try:
+        parsed = json.loads(user_input)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(parsed, dict) and parsed and all(isinstance(value, str) for value in parsed.values()):
+        return parsed
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetches the tokenizer encoding used for the prompt token budget.")
+    parser.add_argument("--download", action="store_true", help="Download the encoding to TIKTOKEN_CACHE_DIR.")
+    parser.add_argument("--encoding", default=TOKENIZER_ENCODING)
+    args = parser.parse_args()
+    if args.download:
+        download_encoding(args.encoding)
+    else:
+        parser.print_help()
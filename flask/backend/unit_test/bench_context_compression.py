@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("RAG_WARMUP_MODE", "lazy")
+
+import main
+from context_compression import COMPRESSION_LEVELS, compress_chunks
+from bench_hybrid_retrieval import load_dataset
+
+# --- Benchmark: reference tokens per context compression level ---
+# Retrieves the chunks for every golden dataset query once, then compresses them at each level
+# and reports the reference tokens left, the tokens each stage removed and the time it took.
+# Requires a built rag_db (python3 rag_builder.py).
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokens removed by each context compression stage.")
+    parser.add_argument("--k", type=int, default=main.RAG_TOP_K)
+    args = parser.parse_args()
+
+    dataset = load_dataset()
+    manager = main.RAG_CONTEXT_MANAGER(main.VECTOR_DB_PATH)
+    chunk_lists = manager.get_relevant_chunks_batch([item["query"] for item in dataset], k=args.k)
+
+    results = {}
+    print(f"\n--- Context Compression (k={args.k}, {len(dataset)} queries) ---")
+    for level in COMPRESSION_LEVELS:
+        reports, seconds = [], []
+        for item, chunks in zip(dataset, chunk_lists):
+            start = time.perf_counter()
+            _, report = compress_chunks(item["query"], chunks, level=level)
+            seconds.append(time.perf_counter() - start)
+            reports.append(report)
+        tokens_in = sum(report["tokens_in"] for report in reports)
+        tokens_out = sum(report["tokens_out"] for report in reports)
+        result = {
+            "mean_tokens_in": round(tokens_in / len(reports), 1),
+            "mean_tokens_out": round(tokens_out / len(reports), 1),
+            "reduction": round(1 - tokens_out / tokens_in, 4) if tokens_in else 0.0,
+            "p50_ms": round(statistics.median(seconds) * 1000, 3),
+        }
+        for stage in COMPRESSION_LEVELS[level]:
+            result[f"{stage}_tokens_removed"] = sum(report.get(f"{stage}_tokens_removed", 0) for report in reports)
+        results[level] = result
+        print(f"  {level:10s} tokens {result['mean_tokens_in']} -> {result['mean_tokens_out']} "
+              f"({result['reduction']:.1%} less) in {result['p50_ms']}ms")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+# --- Benchmark: huggingface (PyTorch) vs onnx (ONNX Runtime) embedding backends ---
+# Each backend runs in a fresh interpreter, so the cold start (imports plus model load) and the
+# peak RSS are those of a new worker. The golden dataset queries are then embedded one at a
+# time (query latency) and all at once (ingest throughput), and the parent process compares
+# the vectors of both backends by cosine similarity.
+# The onnx backend needs an exported model (python3 embedding_backends.py --export).
+
+DATASET_PATH = os.path.join(script_dir, 'golden_dataset.json')
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def load_texts():
+    with open(DATASET_PATH, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)["golden_dataset"]
+    return [item["query"] for item in dataset], [item["ground_truth"] for item in dataset]
+
+
+def run_child(backend, repeat, output_path):
+    """Measures one backend in this (fresh) process and writes the results and vectors."""
+    import numpy as np
+
+    start = time.perf_counter()
+    from embedding_backends import make_embeddings
+    model = make_embeddings(MODEL_NAME, backend=backend)
+    model.embed_query("warm-up")
+    cold_start = time.perf_counter() - start
+
+    queries, passages = load_texts()
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            query_start = time.perf_counter()
+            model.embed_query(query)
+            latencies.append(time.perf_counter() - query_start)
+    batch_start = time.perf_counter()
+    vectors = model.embed_documents(queries + passages)
+    batch_seconds = time.perf_counter() - batch_start
+
+    np.save(output_path + ".npy", np.array(vectors, dtype=np.float32))
+    with open(output_path + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "cold_start_seconds": round(cold_start, 3),
+            "query_p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "query_p95_ms": round(sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+            "batch_texts_per_second": round(len(vectors) / batch_seconds, 1),
+            # ru_maxrss is in KiB on Linux.
+            "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }, f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold start, latency and memory of the embedding backends.")
+    parser.add_argument("--backends", nargs="+", default=["huggingface", "onnx"])
+    parser.add_argument("--repeat", type=int, default=10, help="Passes over the queries for the latency.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.repeat, args.output)
+        raise SystemExit(0)
+
+    import numpy as np
+
+    results, vectors = {}, {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in args.backends:
+            output = os.path.join(tmp_dir, backend)
+            completed = subprocess.run(
+                [sys.executable, __file__, "--child", backend, "--repeat", str(args.repeat), "--output", output],
+                capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                results[backend] = {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+                continue
+            with open(output + ".json", "r", encoding="utf-8") as f:
+                results[backend] = json.load(f)
+            vectors[backend] = np.load(output + ".npy")
+
+    if len(vectors) == 2:
+        first, second = vectors.values()
+        cosines = (first * second).sum(axis=1) / (np.linalg.norm(first, axis=1) * np.linalg.norm(second, axis=1))
+        results["cosine"] = {"min": round(float(cosines.min()), 6), "mean": round(float(cosines.mean()), 6)}
+
+    print("\n--- Embedding Backends ---")
+    for backend in args.backends:
+        result = results[backend]
+        if "error" in result:
+            print(f"  {backend:12s} failed: {result['error']}")
+            continue
+        print(f"  {backend:12s} cold start {result['cold_start_seconds']}s, query p50={result['query_p50_ms']}ms "
+              f"p95={result['query_p95_ms']}ms, batch {result['batch_texts_per_second']} texts/s, "
+              f"peak RSS {result['peak_rss_mib']} MiB")
+    if "cosine" in results:
+        print(f"  cosine similarity between backends: min={results['cosine']['min']} mean={results['cosine']['mean']}")
+    print(json.dumps(results, indent=2))
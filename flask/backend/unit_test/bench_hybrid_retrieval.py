@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("RAG_WARMUP_MODE", "lazy")
+
+import main
+from keyword_index import tokenize
+from bench_vector_index import percentile
+
+# --- Benchmark: vector-only vs hybrid (BM25 + vector) retrieval ---
+# Runs the golden dataset queries through RAG_CONTEXT_MANAGER with and without the keyword
+# index. Query vectors are embedded (and cached) once before timing, so the latencies cover the
+# searches and the fusion. A retrieved chunk counts as a hit when it contains at least
+# --min-overlap of the ground truth's terms; queries whose ground truth says the answer is not in
+# the documents are skipped for recall.
+# Requires a built rag_db and its exports (python3 rag_builder.py [--export-only]).
+
+DATASET_PATH = os.path.join(script_dir, 'golden_dataset.json')
+
+
+def load_dataset():
+    with open(DATASET_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)["golden_dataset"]
+
+
+def is_hit(chunk, ground_truth, min_overlap):
+    """True if the chunk contains at least min_overlap of the ground truth's terms."""
+    expected = set(tokenize(ground_truth))
+    return bool(expected) and len(expected & set(tokenize(chunk))) / len(expected) >= min_overlap
+
+
+def answerable(item):
+    return "not specified" not in item["ground_truth"].lower()
+
+
+def run(manager, dataset, k, repeat, min_overlap):
+    """Per-query latencies and recall@k (share of answerable queries with a hit in the top k)."""
+    queries = [item["query"] for item in dataset]
+    manager.get_relevant_chunks_batch(queries, k=k) # Embed and cache every query, warm the indexes
+    latencies, results = [], []
+    for _ in range(repeat):
+        results = []
+        for query in queries:
+            start = time.perf_counter()
+            results.append(manager.get_relevant_chunks_batch([query], k=k)[0])
+            latencies.append(time.perf_counter() - start)
+    graded = [
+        any(is_hit(chunk, item["ground_truth"], min_overlap) for chunk in chunks)
+        for item, chunks in zip(dataset, results) if answerable(item)
+    ]
+    return {
+        "queries": len(queries),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "recall_at_k": round(sum(graded) / len(graded), 4) if graded else None,
+        "context_chars": round(statistics.mean(sum(len(chunk) for chunk in chunks) for chunks in results), 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and recall@k of vector-only vs hybrid retrieval.")
+    parser.add_argument("--k", type=int, nargs="+", default=[2, main.RAG_TOP_K])
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the query set.")
+    parser.add_argument("--min-overlap", type=float, default=0.6, help="Share of ground-truth terms a hit must contain.")
+    args = parser.parse_args()
+
+    dataset = load_dataset()
+    managers = {
+        "vector": main.RAG_CONTEXT_MANAGER(main.VECTOR_DB_PATH, hybrid=False),
+        "hybrid": main.RAG_CONTEXT_MANAGER(main.VECTOR_DB_PATH, hybrid=True),
+    }
+    for manager in managers.values():
+        manager.load()
+    if managers["hybrid"].keyword_index is None:
+        raise SystemExit("No keyword index found. Please run rag_builder.py --export-only first.")
+
+    results = {}
+    print("\n--- Vector-only vs Hybrid Retrieval ---")
+    for k in args.k:
+        for mode, manager in managers.items():
+            result = run(manager, dataset, k, args.repeat, args.min_overlap)
+            results[f"{mode}_k{k}"] = result
+            print(f"  {mode:6s} k={k}: recall@k={result['recall_at_k']} p50={result['p50_ms']}ms "
+                  f"p95={result['p95_ms']}ms context={result['context_chars']} chars")
+    print(json.dumps(results, indent=2))
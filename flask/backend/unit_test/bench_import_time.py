@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+
+# --- Benchmark: cold-start time of app.py ---
+# Each sample imports app.py in a fresh interpreter, as a restarted or newly scaled-out
+# gunicorn worker would. "ready" is the extra time until the RAG model and store are loaded.
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+import main
+ready = None
+if main.rag_manager is not None:
+    try:
+        main.rag_manager.load()
+        ready = time.perf_counter() - start
+    except Exception:
+        pass
+print(f"{imported} {ready}")
+"""
+
+
+def run_sample(warmup_mode, python=sys.executable):
+    """Imports app.py in a new interpreter; returns (import_seconds, ready_seconds or None)."""
+    env = dict(os.environ, RAG_WARMUP_MODE=warmup_mode)
+    output = subprocess.run(
+        [python, "-c", IMPORT_SNIPPET], cwd=backend_dir, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1]
+    imported, ready = output.split()
+    return float(imported), (None if ready == "None" else float(ready))
+
+
+def slowest_imports(top, python=sys.executable):
+    """Returns the top modules by cumulative import time (from python -X importtime)."""
+    env = dict(os.environ, RAG_WARMUP_MODE="lazy")
+    stderr = subprocess.run(
+        [python, "-X", "importtime", "-c", "import app"], cwd=backend_dir, env=env,
+        capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <module>"
+        _, cumulative_us, name = line.split("|", 2)
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def summarize(values):
+    """Returns min/median/max of a list of seconds, rounded to milliseconds."""
+    return {
+        "min_ms": round(min(values) * 1000, 1),
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start (import) time of app.py per RAG warm-up mode.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per mode.")
+    parser.add_argument("--modes", default="lazy,background,eager", help="Comma-separated RAG_WARMUP_MODE values.")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list (0 to skip).")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(","):
+        imported, ready = [], []
+        for _ in range(args.runs):
+            import_seconds, ready_seconds = run_sample(mode)
+            imported.append(import_seconds)
+            if ready_seconds is not None:
+                ready.append(ready_seconds)
+        results[mode] = {"import": summarize(imported)}
+        if ready:
+            results[mode]["ready"] = summarize(ready)
+
+    print("\n--- app.py Cold Start ---")
+    for mode, result in results.items():
+        line = f"  {mode:10s} import median={result['import']['median_ms']}ms"
+        if "ready" in result:
+            line += f" ready median={result['ready']['median_ms']}ms"
+        print(line)
+
+    if args.top:
+        print("\n--- Slowest imports (cumulative, RAG_WARMUP_MODE=lazy) ---")
+        for cumulative_us, name in slowest_imports(args.top):
+            print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+    print(json.dumps(results, indent=2))
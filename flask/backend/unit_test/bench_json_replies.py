@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import random
+import argparse
+from unittest.mock import patch, MagicMock
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+from prompts import SYSTEM_PROMPTS
+
+# --- Benchmark: round trips per structured (JSON) reply ---
+# Compares the legacy path (free-form reply + strict json.loads + correction retry) with
+# JSON mode (response_format=json_object + tolerant parser, retry only as a fallback).
+#
+# By default the model is simulated with the reply-shape mix below, so the benchmark runs
+# offline. Both modes get the same mix (same seed, same replies), so the simulated difference
+# is only what the tolerant parser recovers; the effect of response_format itself on the reply
+# shapes is measured with --live, which sends the option texts of every purpose to the
+# configured Azure deployment.
+
+VALID_REPLY = {
+    "explanation": "Great choice. Let's make the objective concrete.",
+    "follow_up_question": "Which course will this run in?",
+    "new_options": ["MATH 1013", "MATH 2111"]
+}
+
+# Observed shapes of free-form replies, as (shape, probability). "truncated" (cut off, e.g. at
+# max_tokens) is the one shape parse_model_json cannot recover.
+REPLY_MIX = [
+    ("valid", 0.70),
+    ("code_fence", 0.12),
+    ("single_quotes", 0.08),
+    ("prose_around", 0.06),
+    ("truncated", 0.04),
+]
+
+
+def render_reply(shape):
+    """Renders VALID_REPLY in one of the free-form shapes."""
+    text = json.dumps(VALID_REPLY)
+    if shape == "code_fence":
+        return f"```json\n{text}\n```"
+    if shape == "single_quotes":
+        return repr(VALID_REPLY)
+    if shape == "prose_around":
+        return f"Here is the JSON you asked for:\n{text}\nLet me know if you need more."
+    if shape == "truncated":
+        return text[:-20]
+    return text
+
+
+def make_simulated_client(rng):
+    """Returns a mock client whose replies follow REPLY_MIX, with or without JSON mode."""
+    shapes = [shape for shape, _ in REPLY_MIX]
+    weights = [weight for _, weight in REPLY_MIX]
+
+    def create(**kwargs):
+        content = render_reply(rng.choices(shapes, weights)[0])
+        completion = MagicMock()
+        completion.choices[0].message.content = content
+        return completion
+
+    client = MagicMock()
+    client.chat.completions.create.side_effect = create
+    return client
+
+
+def strict_parse(text):
+    """The pre-JSON-mode parser: plain json.loads, so every deviation costs a retry."""
+    parsed = json.loads(text)
+    if not isinstance(parsed, dict):
+        raise json.JSONDecodeError("Expected a JSON object", text, 0)
+    return parsed
+
+
+def run_turns(client, inputs, json_mode):
+    """Runs one structured reply per input and returns (round_trips, failures)."""
+    round_trips = 0
+    failures = 0
+    parser = main.parse_model_json if json_mode else strict_parse
+    with patch('main.STRUCTURED_REPLY_JSON_MODE', json_mode), patch('main.parse_model_json', parser):
+        for purpose, user_input in inputs:
+            calls_before = client.chat.completions.create.call_count
+            messages = main.build_step_messages(SYSTEM_PROMPTS[purpose]["persona"], "", user_input)
+            reply = main.request_structured_reply(
+                client, main.AZURE_OPENAI_DEPLOYMENT_NAME, messages,
+                main.STRUCTURED_REPLY_MAX_RETRIES, use_cache=False
+            )
+            round_trips += client.chat.completions.create.call_count - calls_before
+            failures += reply is None
+    return round_trips, failures
+
+
+class CountingClient:
+    """Wraps a real client and counts chat completion calls."""
+    def __init__(self, client):
+        self.client = client
+        self.chat = MagicMock()
+        self.chat.completions.create = MagicMock(side_effect=client.chat.completions.create)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Round trips per structured reply: legacy vs JSON mode.")
+    parser.add_argument("--turns", type=int, default=1000, help="Simulated turns per mode.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live", action="store_true", help="Call the configured Azure deployment instead of the simulator.")
+    args = parser.parse_args()
+
+    step_purposes = [purpose for purpose in SYSTEM_PROMPTS if purpose != "integrator"]
+    if args.live:
+        inputs = [(purpose, option) for purpose in step_purposes for option in SYSTEM_PROMPTS[purpose]["options"]]
+    else:
+        rng = random.Random(args.seed)
+        inputs = [(rng.choice(step_purposes), "I want to adopt VR in my math course.") for _ in range(args.turns)]
+
+    results = {}
+    for mode_name, json_mode in (("legacy", False), ("json_mode", True)):
+        if args.live:
+            client = CountingClient(main.get_azure_client())
+        else:
+            client = make_simulated_client(random.Random(args.seed))
+        round_trips, failures = run_turns(client, inputs, json_mode)
+        results[mode_name] = {
+            "turns": len(inputs),
+            "round_trips": round_trips,
+            "round_trips_per_turn": round_trips / len(inputs),
+            "failed_turns": failures,
+        }
+
+    legacy, json_mode = results["legacy"], results["json_mode"]
+    results["difference"] = {
+        "round_trips_saved_per_turn": legacy["round_trips_per_turn"] - json_mode["round_trips_per_turn"],
+        "round_trips_saved_percent": round(100 * (1 - json_mode["round_trips"] / legacy["round_trips"]), 1) if legacy["round_trips"] else None,
+        "failed_turns_saved": legacy["failed_turns"] - json_mode["failed_turns"],
+    }
+
+    print(f"\n--- Structured Reply Round Trips ({'live' if args.live else 'simulated, same reply mix in both modes'}) ---")
+    for mode_name in ("legacy", "json_mode"):
+        result = results[mode_name]
+        print(f"  {mode_name:10s} turns={result['turns']} round_trips/turn={result['round_trips_per_turn']:.3f} failed={result['failed_turns']}")
+    difference = results["difference"]
+    print(f"  JSON mode saves {difference['round_trips_saved_per_turn']:.3f} round trips per turn "
+          f"({difference['round_trips_saved_percent']}%) and {difference['failed_turns_saved']} failed turns.")
+    print(json.dumps(results, indent=2))
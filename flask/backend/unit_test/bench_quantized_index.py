@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+
+import numpy as np
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("RAG_WARMUP_MODE", "lazy")
+
+import main
+from vector_index import NumpyVectorIndex, write_vector_index, VECTOR_DTYPES
+from bench_vector_index import load_queries, percentile, recall_at_k
+
+# --- Benchmark: float32 vs float16 vs int8 vector storage ---
+# Re-exports the float32 vectors of the NumPy index in every dtype and searches each with the
+# same query vectors (the golden dataset queries and option texts). It reports the bytes scanned
+# per search, per-query latency and recall@k against the exact float32 results, with and
+# without re-scoring. --synthetic-rows pads the index with random unit vectors to see how the
+# numbers scale beyond the current corpus.
+# Requires a built rag_db and its float32 export (python3 rag_builder.py [--export-only]).
+
+
+def time_search(index, query_vectors, k):
+    """Searches one query at a time; returns (positions per query, latencies in seconds)."""
+    results, latencies = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        positions, _ = index.search(vector, k)
+        latencies.append(time.perf_counter() - start)
+        results.append(positions[0].tolist())
+    return results, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory, latency and recall of quantized vector storage.")
+    parser.add_argument("--k", type=int, default=main.RAG_TOP_K)
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the query set.")
+    parser.add_argument("--synthetic-rows", type=int, default=0, help="Random rows added to the index.")
+    args = parser.parse_args()
+
+    source = NumpyVectorIndex(main.VECTOR_INDEX_PATH)
+    if source.dtype != "float32":
+        raise SystemExit("Export the index as float32 first (python3 rag_builder.py --export-only --vector-dtype float32).")
+    vectors = np.asarray(source.vectors, dtype=np.float32)
+    if args.synthetic_rows:
+        padding = np.random.default_rng(0).normal(size=(args.synthetic_rows, vectors.shape[1])).astype(np.float32)
+        vectors = np.vstack([vectors, padding])
+    ids = [str(i) for i in range(len(vectors))]
+    texts = [""] * len(vectors)
+
+    manager = main.RAG_CONTEXT_MANAGER(main.VECTOR_DB_PATH, backend="numpy")
+    query_vectors = manager.embed_queries(load_queries(args.repeat))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reference = None
+        for dtype in VECTOR_DTYPES:
+            index_dir = os.path.join(tmp_dir, dtype)
+            write_vector_index(index_dir, ids, texts, vectors, source.model_name, dtype=dtype)
+            index = NumpyVectorIndex(index_dir)
+            variants = [("", index.rescore_factor)] if dtype == "float32" else [("", index.rescore_factor), ("_no_rescore", 0)]
+            for suffix, rescore_factor in variants:
+                index.rescore_factor = rescore_factor
+                time_search(index, query_vectors[:10], args.k) # Warm the mapped pages
+                positions, latencies = time_search(index, query_vectors, args.k)
+                reference = reference or positions
+                results[dtype + suffix] = {
+                    "rows": len(index),
+                    "scanned_bytes": index.nbytes,
+                    "p50_ms": round(statistics.median(latencies) * 1000, 3),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                    "recall_at_k_vs_float32": round(recall_at_k(positions, reference), 4),
+                }
+
+    print(f"\n--- Quantized Vector Storage (k={args.k}, {len(query_vectors)} queries) ---")
+    for name, result in results.items():
+        print(f"  {name:18s} {result['scanned_bytes'] / 1024:10.1f} KiB  p50={result['p50_ms']}ms "
+              f"p95={result['p95_ms']}ms recall@{args.k}={result['recall_at_k_vs_float32']}")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("RAG_WARMUP_MODE", "lazy")
+
+import main
+from token_budget import count_tokens
+from vector_index import write_vector_index
+from keyword_index import write_keyword_index
+from rag_metadata import chunk_metadata
+from bench_vector_index import percentile
+
+# --- Benchmark: offline retrieval quality and speed ---
+# Grades retrieval against the "expected_passages" of golden_dataset.json, verbatim passages of
+# the built corpus that answer (or best address) each query. A retrieved chunk is relevant when
+# it contains one of them, ignoring case and whitespace. For each retriever configuration it
+# reports recall@k (share of expected passages in the top k), MRR (reciprocal rank of the first
+# relevant chunk), reference tokens per query and p50/p95/p99 latency and throughput. Queries
+# without passages (the corpus does not answer them) only count for latency and tokens.
+# Configurations: the chroma and numpy backends, vector-only and hybrid, on the built rag_db;
+# --chunk-settings SIZE:OVERLAP ... re-chunks the sources in --data-dir into a temporary numpy
+# and keyword index per setting. Query vectors are embedded (and cached) once before timing, so
+# the latencies cover the search, fusion and filters. No Azure access is needed.
+# Requires a built rag_db and its exports (python3 rag_builder.py [--export-only]).
+
+DATASET_PATH = os.path.join(script_dir, 'golden_dataset.json')
+DATA_DIR = os.path.join(backend_dir, '..', 'data')
+
+
+def load_dataset():
+    with open(DATASET_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)["golden_dataset"]
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def grade(chunks, passages):
+    """
+    Returns (recall, reciprocal_rank) of one ranked chunk list against the expected passages.
+    """
+    chunks = [normalize(chunk) for chunk in chunks]
+    passages = [normalize(passage) for passage in passages]
+    found = sum(1 for passage in passages if any(passage in chunk for chunk in chunks))
+    rank = next((rank for rank, chunk in enumerate(chunks, 1) if any(passage in chunk for passage in passages)), None)
+    return found / len(passages), 1.0 / rank if rank else 0.0
+
+
+def unmatched_passages(dataset, corpus_texts):
+    """Expected passages that no chunk of the corpus contains, e.g. after the sources changed."""
+    corpus = [normalize(text) for text in corpus_texts]
+    return [
+        passage for item in dataset for passage in item.get("expected_passages", [])
+        if not any(normalize(passage) in text for text in corpus)
+    ]
+
+
+def evaluate(retrieve, dataset, k, repeat):
+    """
+    Runs every query through retrieve(query, purpose, k) -> chunks, `repeat` times.
+    Quality is graded on the first pass; latency covers every call.
+    """
+    latencies, results = [], []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = []
+        for item in dataset:
+            call_start = time.perf_counter()
+            results.append(retrieve(item["query"], item.get("purpose"), k))
+            latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    graded = [grade(chunks, item["expected_passages"]) for item, chunks in zip(dataset, results) if item.get("expected_passages")]
+    tokens = [count_tokens("\n".join(chunks)) for chunks in results]
+    return {
+        "queries": len(dataset),
+        "graded_queries": len(graded),
+        f"recall_at_{k}": round(sum(recall for recall, _ in graded) / len(graded), 4) if graded else None,
+        "mrr": round(sum(rr for _, rr in graded) / len(graded), 4) if graded else None,
+        "context_tokens_mean": round(sum(tokens) / len(tokens), 1),
+        "context_tokens_max": max(tokens),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "queries_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def warm_up(retrieve, dataset, k):
+    """Runs every query once, with the purpose evaluate passes, to embed it and warm the indexes and filters."""
+    for item in dataset:
+        retrieve(item["query"], item.get("purpose"), k)
+
+
+def manager_retriever(manager, use_purpose):
+    def retrieve(query, purpose, k):
+        return manager.get_relevant_chunks_batch([query], k=k, purpose=purpose if use_purpose else None)[0]
+    return retrieve
+
+
+def build_chunked_index(index_dir, data_dir, chunk_size, chunk_overlap, embeddings_model, model_name):
+    """Chunks the sources with one setting and writes a numpy and a keyword index to index_dir."""
+    from rag_builder import chunk_text
+    from document_sources import list_source_files, iter_source_units
+
+    ids, texts, metadatas = [], [], []
+    for source in list_source_files(data_dir):
+        position = 0
+        for section, (heading_path, text, page) in enumerate(iter_source_units(os.path.join(data_dir, source))):
+            for chunk in chunk_text(text, chunk_size, chunk_overlap):
+                ids.append(f"{source}:{position}")
+                texts.append(chunk)
+                metadatas.append(chunk_metadata(source, heading_path, position, section, page=page))
+                position += 1
+    vectors = embeddings_model.embed_documents(texts)
+    write_vector_index(os.path.join(index_dir, "numpy_index"), ids, texts, vectors, model_name, metadatas=metadatas)
+    write_keyword_index(os.path.join(index_dir, "keyword_index"), ids, texts, metadatas=metadatas)
+    return texts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline recall@k, MRR, context tokens and latency of the retrievers.")
+    parser.add_argument("--k", type=int, default=main.RAG_TOP_K)
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the query set for the latencies.")
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy"])
+    parser.add_argument("--chunk-settings", nargs="*", default=[], metavar="SIZE:OVERLAP",
+                        help="Also evaluate the sources re-chunked with these settings (numpy backend).")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Sources for --chunk-settings.")
+    parser.add_argument("--ignore-purpose", action="store_true", help="Search the whole corpus for every query.")
+    parser.add_argument("--output", help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    dataset = load_dataset()
+    use_purpose = not args.ignore_purpose
+    results = {"k": args.k, "repeat": args.repeat, "purpose_filters": use_purpose, "configs": {}}
+
+    built_texts = None
+    for backend in args.backends:
+        for hybrid in (False, True):
+            manager = main.RAG_CONTEXT_MANAGER(main.VECTOR_DB_PATH, backend=backend, hybrid=hybrid)
+            manager.load()
+            if hybrid and manager.keyword_index is None:
+                continue
+            if backend == "numpy":
+                built_texts = [manager.vector_index.text(i) for i in range(len(manager.vector_index))]
+            retrieve = manager_retriever(manager, use_purpose)
+            warm_up(retrieve, dataset, args.k)
+            name = f"{backend}_{'hybrid' if hybrid else 'vector'}"
+            results["configs"][name] = evaluate(retrieve, dataset, args.k, args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.chunk_settings:
+            from rag_builder import EMBEDDING_MODEL_NAME
+            from embedding_backends import make_embeddings
+            embeddings_model = make_embeddings(EMBEDDING_MODEL_NAME)
+        for setting in args.chunk_settings:
+            chunk_size, chunk_overlap = (int(value) for value in setting.split(":"))
+            index_dir = os.path.join(tmp_dir, setting.replace(":", "_"))
+            os.makedirs(index_dir)
+            texts = build_chunked_index(index_dir, args.data_dir, chunk_size, chunk_overlap, embeddings_model, EMBEDDING_MODEL_NAME)
+            for hybrid in (False, True):
+                manager = main.RAG_CONTEXT_MANAGER(index_dir, backend="numpy", hybrid=hybrid)
+                manager.load()
+                retrieve = manager_retriever(manager, use_purpose)
+                warm_up(retrieve, dataset, args.k)
+                name = f"numpy_{'hybrid' if hybrid else 'vector'}_chunks_{chunk_size}_{chunk_overlap}"
+                results["configs"][name] = dict(
+                    evaluate(retrieve, dataset, args.k, args.repeat),
+                    chunks=len(texts), unmatched_passages=len(unmatched_passages(dataset, texts)),
+                )
+
+    if built_texts is not None:
+        results["unmatched_passages"] = unmatched_passages(dataset, built_texts)
+
+    print(f"\n--- Retrieval Benchmark (k={args.k}, {len(dataset)} queries x {args.repeat}) ---")
+    for name, result in results["configs"].items():
+        print(f"  {name:36s} recall@{args.k}={result[f'recall_at_{args.k}']} MRR={result['mrr']} "
+              f"tokens={result['context_tokens_mean']} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+              f"p99={result['p99_ms']}ms {result['queries_per_second']} q/s")
+    if results.get("unmatched_passages"):
+        print(f"  {len(results['unmatched_passages'])} expected passages are not in the built corpus; re-annotate golden_dataset.json.")
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,87 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from semantic_cache import SEMANTIC_CACHE_THRESHOLD, unit_vector
+
+# --- Benchmark: SEMANTIC_CACHE_THRESHOLD calibration ---
+# Embeds labelled question pairs with the retrieval model and prints their cosine similarity.
+# For each threshold it reports the share of same-question pairs that would hit the semantic
+# cache and the share of different-question pairs that would get a wrong reply. A different-
+# question pair above the threshold is a false hit, so the suggested threshold is the lowest
+# one that none of them reaches.
+# Needs the embedding model (see embedding_backends.py), but no rag_db or Azure access.
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Rephrasings a faculty member might send for the same step question.
+SAME_QUESTION_PAIRS = [
+    ("What is the maximum number of pages for the proposal?", "what is the maximum number of pages for the proposal"),
+    ("How many reference letters are required?", "How many reference letters are needed?"),
+    ("How will the outcomes be measured?", "How will outcomes be measured?"),
+    ("Who is eligible to apply?", "Who is eligible to apply for the grant?"),
+    ("What can the budget include?", "What can I include in the budget?"),
+    ("how long can the proposal be", "max pages for proposal"),
+    ("How do I collect student feedback?", "How should student feedback be collected?"),
+    ("When must the project be completed?", "By when does the project have to be completed?"),
+]
+
+# Questions on the same topic that need different replies.
+DIFFERENT_QUESTION_PAIRS = [
+    ("What is the maximum number of pages for the proposal?", "What is the maximum budget for the proposal?"),
+    ("How many reference letters are required?", "Who should write the reference letters?"),
+    ("How will the outcomes be measured?", "What outcomes should the project have?"),
+    ("What can the budget include?", "What can the budget not include?"),
+    ("How do I collect student feedback?", "How do I report student feedback?"),
+    ("When must the project be completed?", "When must the proposal be submitted?"),
+]
+
+
+def pair_similarities(model, pairs):
+    """Cosine similarity of each pair's embeddings."""
+    texts = [text for pair in pairs for text in pair]
+    vectors = [unit_vector(vector) for vector in model.embed_documents(texts)]
+    return [float(np.dot(vectors[2 * i], vectors[2 * i + 1])) for i in range(len(pairs))]
+
+
+def threshold_rates(same, different, threshold):
+    """(share of same-question pairs that hit, share of different-question pairs that hit)."""
+    return (
+        sum(score >= threshold for score in same) / len(same),
+        sum(score >= threshold for score in different) / len(different),
+    )
+
+
+def suggest_threshold(different, step=0.01):
+    """The lowest threshold, rounded up to `step`, that no different-question pair reaches."""
+    return round((np.floor(max(different) / step) + 1) * step, 4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrates SEMANTIC_CACHE_THRESHOLD on labelled question pairs.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.80, 0.85, 0.88, 0.90, 0.92, 0.95])
+    args = parser.parse_args()
+
+    from embedding_backends import make_embeddings
+    model = make_embeddings(MODEL_NAME)
+    same = pair_similarities(model, SAME_QUESTION_PAIRS)
+    different = pair_similarities(model, DIFFERENT_QUESTION_PAIRS)
+
+    for label, pairs, scores in (("same", SAME_QUESTION_PAIRS, same), ("different", DIFFERENT_QUESTION_PAIRS, different)):
+        print(f"\n{label} question pairs:")
+        for (first, second), score in zip(pairs, scores):
+            print(f"  {score:.3f}  {first!r} / {second!r}")
+
+    print(f"\n{'threshold':>9}  {'hits':>6}  {'false hits':>10}")
+    for threshold in sorted(set(args.thresholds) | {SEMANTIC_CACHE_THRESHOLD}):
+        hit_rate, false_rate = threshold_rates(same, different, threshold)
+        marker = "  (current)" if threshold == SEMANTIC_CACHE_THRESHOLD else ""
+        print(f"{threshold:>9.2f}  {hit_rate:>6.0%}  {false_rate:>10.0%}{marker}")
+    print(f"\nLowest threshold without false hits: {suggest_threshold(different):.2f}")
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import tempfile
+import importlib.util
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+# --- Benchmark: streaming vs whole-corpus ingestion ---
+# Generates a synthetic corpus of PDF (and, with python-docx installed, DOCX) files with
+# paragraphs and tables, then ingests it in a fresh interpreter per corpus size and mode:
+#   whole_corpus - every unit's text joined into one string, chunked, then embedded (the old
+#                  rag_builder.py flow);
+#   streaming    - rag_builder.extract_chunks through ingest_pipeline.run_ingest.
+# It reports pages/s, chunks and the peak Python heap (tracemalloc) and RSS of each run. A flat
+# peak across corpus sizes means memory does not grow with the corpus. Embeddings come from a
+# cheap hashing stand-in unless --embed is given, so the numbers isolate the ingest stage.
+# Needs pypdf and the rag_builder.py dependencies (langchain, chromadb).
+
+VOCABULARY = (
+    "project learning students teaching evaluation outcomes course feedback assessment budget "
+    "timeline implementation technology pedagogy survey rubric faculty support design report"
+).split()
+TABLE_COLUMNS = (50, 250, 420)
+
+
+def sentence(rng, words=14):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_page_content(rng, number):
+    """A page of text lines followed by a three-column table, as a PDF content stream."""
+    commands = [f"BT /F1 14 Tf 50 760 Td (Section {number}) Tj ET", "BT /F1 10 Tf 50 730 Td 13 TL"]
+    for _ in range(30):
+        commands.append(f"({pdf_string(sentence(rng, 12))}) Tj T*")
+    commands.append("ET")
+    for row in range(6):
+        y = 300 - row * 16
+        cells = ("Item", "Cost", "Year") if row == 0 else (rng.choice(VOCABULARY), f"${rng.randint(1, 90)},000", f"Year {rng.randint(1, 3)}")
+        for x, cell in zip(TABLE_COLUMNS, cells):
+            commands.append(f"BT /F1 10 Tf {x} {y} Td ({pdf_string(cell)}) Tj ET")
+    return "\n".join(commands).encode("latin-1")
+
+
+def write_synthetic_pdf(path, pages, rng):
+    """Writes an uncompressed PDF page by page (no PDF library needed)."""
+    offsets = {}
+    with open(path, "wb") as f:
+        def write_object(number, body):
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(pages))
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for i in range(pages):
+            write_object(4 + 2 * i, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+            ).encode())
+            content = pdf_page_content(rng, i + 1)
+            write_object(5 + 2 * i, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+        xref = f.tell()
+        count = 4 + 2 * pages
+        f.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+        for number in range(1, count):
+            f.write(f"{offsets[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def write_synthetic_docx(path, pages, rng):
+    """Writes a .docx with one heading, 30 sentences and a table per "page"."""
+    from docx import Document
+
+    doc = Document()
+    for number in range(1, pages + 1):
+        doc.add_heading(f"Section {number}", level=1)
+        doc.add_paragraph(" ".join(sentence(rng, 12) for _ in range(30)))
+        table = doc.add_table(rows=6, cols=3)
+        for row_index, row in enumerate(table.rows):
+            cells = ("Item", "Cost", "Year") if row_index == 0 else (rng.choice(VOCABULARY), f"${rng.randint(1, 90)},000", f"Year {rng.randint(1, 3)}")
+            for cell, text in zip(row.cells, cells):
+                cell.text = text
+    doc.save(path)
+
+
+def write_corpus(corpus_dir, pages, pages_per_file):
+    """Writes pages of synthetic sources to corpus_dir, alternating PDF and DOCX files."""
+    rng = random.Random(pages)
+    with_docx = importlib.util.find_spec("docx") is not None
+    os.makedirs(corpus_dir, exist_ok=True)
+    for index, start in enumerate(range(0, pages, pages_per_file)):
+        count = min(pages_per_file, pages - start)
+        if with_docx and index % 2:
+            write_synthetic_docx(os.path.join(corpus_dir, f"report_{index:04d}.docx"), count, rng)
+        else:
+            write_synthetic_pdf(os.path.join(corpus_dir, f"report_{index:04d}.pdf"), count, rng)
+
+
+def hashing_embed(texts, dimensions=384):
+    """A cheap stand-in for the embedding model with the same output size."""
+    return [[(hash((text, i)) % 1000) / 1000 for i in range(dimensions)] for text in texts]
+
+
+def run_child(mode, corpus_dir, workers, batch_size, embed_with_model):
+    """Ingests the corpus once in this (fresh) process; returns the measurements."""
+    import tracemalloc
+    from functools import partial
+    from rag_builder import extract_chunks, chunk_text, EMBEDDING_MODEL_NAME
+    from rag_manifest import hash_file
+    from document_sources import list_source_files, iter_source_units
+    from ingest_pipeline import run_ingest
+
+    embed = hashing_embed
+    if embed_with_model:
+        from embedding_backends import make_embeddings
+        embed = make_embeddings(EMBEDDING_MODEL_NAME).embed_documents
+    sources = list_source_files(corpus_dir)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == "whole_corpus":
+        text = "".join(unit for source in sources for _, unit, _ in iter_source_units(os.path.join(corpus_dir, source)))
+        chunks = chunk_text(text)
+        for batch_start in range(0, len(chunks), batch_size):
+            embed(chunks[batch_start:batch_start + batch_size])
+        chunk_count = len(chunks)
+    else:
+        hashes = {source: hash_file(os.path.join(corpus_dir, source)) for source in sources}
+        stats = run_ingest(
+            sources, partial(extract_chunks, corpus_dir, hashes), embed, lambda *args: None,
+            workers=workers, batch_size=batch_size,
+        )
+        chunk_count = stats["chunks"]
+    seconds = time.perf_counter() - start
+    _, peak_heap = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # ru_maxrss is in KiB on Linux; RUSAGE_CHILDREN covers the extraction workers.
+    peak_rss = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return {
+        "seconds": round(seconds, 2),
+        "chunks": chunk_count,
+        "peak_heap_mib": round(peak_heap / 1024 / 1024, 1),
+        "peak_rss_mib": round(peak_rss / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and throughput of streaming vs whole-corpus ingestion.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[500, 1000, 2000, 4000], help="Corpus sizes in pages.")
+    parser.add_argument("--pages-per-file", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", default=["whole_corpus", "streaming"])
+    parser.add_argument("--workers", type=int, default=1, help="Extraction processes for the streaming mode.")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--embed", action="store_true", help="Embed with the configured model instead of a stand-in.")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "CORPUS_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child[0], args.child[1], args.workers, args.batch_size, args.embed)))
+        raise SystemExit(0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for pages in args.pages:
+            corpus_dir = os.path.join(tmp_dir, f"corpus_{pages}")
+            write_corpus(corpus_dir, pages, args.pages_per_file)
+            for mode in args.modes:
+                command = [sys.executable, __file__, "--child", mode, corpus_dir, "--workers", str(args.workers),
+                           "--batch-size", str(args.batch_size)] + (["--embed"] if args.embed else [])
+                completed = subprocess.run(command, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    result = {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+                else:
+                    result = json.loads(completed.stdout.strip().splitlines()[-1])
+                    result["pages_per_second"] = round(pages / result["seconds"], 1) if result["seconds"] else None
+                results[f"{mode}_{pages}"] = dict(result, mode=mode, pages=pages)
+
+    print(f"\n--- Streaming Ingestion (workers={args.workers}, batch={args.batch_size}) ---")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"  {name:20s} failed: {result['error']}")
+            continue
+        print(f"  {name:20s} {result['chunks']:7d} chunks  {result['pages_per_second']} pages/s  "
+              f"peak heap {result['peak_heap_mib']} MiB  peak RSS {result['peak_rss_mib']} MiB")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+os.environ.setdefault("RAG_WARMUP_MODE", "lazy")
+
+import main
+
+# --- Benchmark: Chroma retriever vs in-process NumPy index ---
+# Both backends search with the same query vectors (embedded once, outside the timings), so the
+# numbers compare only the nearest-neighbour step. Recall@k is measured against the NumPy
+# results, which are exact; Chroma's HNSW index is approximate.
+# Requires a built rag_db and its export (python3 rag_builder.py [--export-only]).
+
+DATASET_PATH = os.path.join(script_dir, 'golden_dataset.json')
+
+
+def load_queries(repeat):
+    """The golden dataset queries plus every option button text, repeated `repeat` times."""
+    with open(DATASET_PATH, 'r', encoding='utf-8') as f:
+        queries = [item["query"] for item in json.load(f)["golden_dataset"]]
+    return (queries + main.option_queries()) * repeat
+
+
+def time_searches(manager, query_vectors, k):
+    """Searches one query at a time; returns (results, per-query latencies in seconds)."""
+    results, latencies = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        results.append(manager.search_by_vectors([vector], k)[0])
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def recall_at_k(results, reference):
+    """Mean fraction of the reference top-k found in results."""
+    scores = [len(set(got) & set(expected)) / len(expected) for got, expected in zip(results, reference) if expected]
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency and recall of the chroma and numpy retriever backends.")
+    parser.add_argument("--k", type=int, default=main.RAG_TOP_K)
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the query set.")
+    args = parser.parse_args()
+
+    queries = load_queries(args.repeat)
+    managers = {backend: main.RAG_CONTEXT_MANAGER(main.VECTOR_DB_PATH, backend=backend) for backend in ("numpy", "chroma")}
+    load_seconds = {}
+    for backend, manager in managers.items():
+        start = time.perf_counter()
+        manager.load()
+        load_seconds[backend] = time.perf_counter() - start
+
+    query_vectors = managers["numpy"].embed_queries(queries)
+    batch_start = time.perf_counter()
+    managers["numpy"].search_by_vectors(query_vectors, args.k)
+    numpy_batch_seconds = time.perf_counter() - batch_start
+
+    results = {}
+    outputs = {}
+    for backend, manager in managers.items():
+        time_searches(manager, query_vectors[:10], args.k) # Warm caches and mapped pages
+        outputs[backend], latencies = time_searches(manager, query_vectors, args.k)
+        results[backend] = {
+            "queries": len(queries),
+            "load_seconds": round(load_seconds[backend], 3),
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "queries_per_second": round(len(latencies) / sum(latencies), 1),
+        }
+    results["numpy"]["batch_queries_per_second"] = round(len(queries) / numpy_batch_seconds, 1)
+    results["chroma"]["recall_at_k_vs_exact"] = round(recall_at_k(outputs["chroma"], outputs["numpy"]), 4)
+    results["numpy"]["index_bytes"] = managers["numpy"].vector_index.nbytes
+
+    print(f"\n--- Retriever Backends (k={args.k}) ---")
+    for backend, result in results.items():
+        print(f"  {backend:7s} p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms qps={result['queries_per_second']}")
+    print(f"  chroma recall@{args.k} vs exact: {results['chroma']['recall_at_k_vs_exact']}")
+    print(json.dumps(results, indent=2))
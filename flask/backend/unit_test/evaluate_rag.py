@@ -1,9 +1,13 @@
 import os
+import sys
 import json
 from openai import AzureOpenAI
 from dotenv import load_dotenv
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+
+# Dynamically add the 'backend' directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("RAG_WARMUP_MODE", "lazy")
+from main import RAG_CONTEXT_MANAGER
 
 # --- Configuration ---
 # Load environment variables
@@ -18,31 +22,18 @@ AZURE_OPENAI_EVAL_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 VECTOR_DB_PATH = os.path.join(os.path.dirname(__file__), '../rag_db')
 DATASET_PATH = os.path.join(os.path.dirname(__file__), 'golden_dataset.json')
 
-# --- Core RAG Logic (Re-used from main.py) ---
-class RAG_CONTEXT_MANAGER:
-    """Manages the RAG pipeline for retrieving context."""
-    def __init__(self, vector_db_path, embedding_model_name="all-MiniLM-L6-v2"):
-        if not os.path.exists(vector_db_path):
-            raise FileNotFoundError(f"Vector database not found at {vector_db_path}. Please run rag_builder.py first.")
-        
-        self.embeddings_model = HuggingFaceEmbeddings(
-            model_name=embedding_model_name
-        )
-        self.vector_store = Chroma(
-            persist_directory=vector_db_path,
-            embedding_function=self.embeddings_model
-        )
-        self.retriever = self.vector_store.as_retriever()
-
-    def get_relevant_context(self, query):
-        docs = self.retriever.invoke(query)
-        return " ".join([doc.page_content for doc in docs])
+# --- Core RAG Logic ---
+# RAG_CONTEXT_MANAGER is the one from main.py, so the evaluation measures the retrieval the app uses.
 
 # --- Evaluation Functions ---
 
-def run_rag_pipeline(query, rag_manager, client):
-    """Simulates the RAG pipeline to get a generated answer."""
-    retrieved_context = rag_manager.get_relevant_context(query)
+def run_rag_pipeline(query, rag_manager, client, retrieved_context=None):
+    """
+    Simulates the RAG pipeline to get a generated answer.
+    Pass retrieved_context when it was already fetched (e.g. by get_relevant_context_batch).
+    """
+    if retrieved_context is None:
+        retrieved_context = rag_manager.get_relevant_context(query)
     
     # Prompt the LLM to generate an answer based on the retrieved context
     messages = [
@@ -118,14 +109,17 @@ if __name__ == "__main__":
         total_scores = {"factual_accuracy": 0, "faithfulness": 0, "relevance": 0}
         num_evaluated = 0
 
-        # 3. Run evaluation loop
+        # 3. Retrieve the context for every query at once (one embedding pass, one search)
+        contexts = rag_manager.get_relevant_context_batch([item["query"] for item in golden_dataset])
+
+        # 4. Run evaluation loop
         print("\n--- Starting RAG Pipeline Evaluation ---")
-        for item in golden_dataset:
+        for item, context in zip(golden_dataset, contexts):
             query = item["query"]
             ground_truth = item["ground_truth"]
 
             # Run the RAG pipeline for the given query
-            generated_answer, retrieved_context = run_rag_pipeline(query, rag_manager, eval_client)
+            generated_answer, retrieved_context = run_rag_pipeline(query, rag_manager, eval_client, retrieved_context=context)
 
             # Evaluate the generated answer
             eval_scores = evaluate_answer(query, generated_answer, retrieved_context, ground_truth, eval_client)
@@ -144,7 +138,7 @@ if __name__ == "__main__":
             else:
                 print(f"\nSkipping evaluation for query: {query} due to an error.")
 
-        # 4. Print final results
+        # 5. Print final results
         if num_evaluated > 0:
             avg_scores = {k: v / num_evaluated for k, v in total_scores.items()}
             print("\n--- Final Average Scores ---")
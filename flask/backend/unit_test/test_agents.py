@@ -0,0 +1,189 @@
+import unittest
+import json
+import os
+import sys
+import time
+from unittest.mock import patch, MagicMock
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+from prompts import SUGGESTIONS_AGENT_SYSTEM_MESSAGE
+
+
+def make_completion(content):
+    """Builds a MagicMock shaped like a chat completion response."""
+    completion = MagicMock()
+    completion.choices[0].message.content = content
+    return completion
+
+
+class TestIntegratorAgents(unittest.TestCase):
+    """Tests for the multi-agent 'integrator' path of get_openai_reply."""
+
+    def setUp(self):
+        self.summary_array = {
+            "objective": "1. Adopt VR in math", "outcomes": "", "pedagogy": "",
+            "development": "", "implementation": "", "evaluation": ""
+        }
+        self.client = MagicMock()
+        patchers = [
+            patch('main.get_azure_client', return_value=self.client),
+            patch('main.rag_manager', None),
+            patch('llm_cache.LLM_CACHE.enabled', False),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_proposal_and_suggestions_run_concurrently(self):
+        def slow_create(**kwargs):
+            time.sleep(0.3)
+            if kwargs["messages"][0]["content"] == SUGGESTIONS_AGENT_SYSTEM_MESSAGE:
+                return make_completion("Consider a pilot.")
+            return make_completion("# Proposal")
+
+        self.client.chat.completions.create.side_effect = slow_create
+
+        start = time.perf_counter()
+        response_str, _ = main.get_openai_reply("Synthesize", "integrator", self.summary_array)
+        elapsed = time.perf_counter() - start
+
+        response = json.loads(response_str)
+        self.assertEqual(response["type"], "summary_only")
+        self.assertEqual(response["summary"], "# Proposal\n\n# Suggestions\nConsider a pilot.")
+        self.assertLess(elapsed, 0.55)
+
+    def test_suggestions_failure_still_returns_proposal(self):
+        def create(**kwargs):
+            if kwargs["messages"][0]["content"] == SUGGESTIONS_AGENT_SYSTEM_MESSAGE:
+                raise RuntimeError("suggestions unavailable")
+            return make_completion("# Proposal")
+
+        self.client.chat.completions.create.side_effect = create
+
+        response_str, _ = main.get_openai_reply("Synthesize", "integrator", self.summary_array)
+        response = json.loads(response_str)
+        self.assertEqual(response["type"], "summary_only")
+        self.assertEqual(response["summary"], "# Proposal")
+
+    def test_proposal_failure_returns_error(self):
+        def create(**kwargs):
+            if kwargs["messages"][0]["content"] == SUGGESTIONS_AGENT_SYSTEM_MESSAGE:
+                return make_completion("Consider a pilot.")
+            raise RuntimeError("proposal unavailable")
+
+        self.client.chat.completions.create.side_effect = create
+
+        response_str, _ = main.get_openai_reply("Synthesize", "integrator", self.summary_array)
+        self.assertEqual(json.loads(response_str)["type"], "error")
+
+
+class TestStepAgents(unittest.TestCase):
+    """Tests for the step-purpose path of get_openai_reply."""
+
+    def setUp(self):
+        self.summary_array = {
+            "objective": "", "outcomes": "", "pedagogy": "",
+            "development": "", "implementation": "", "evaluation": ""
+        }
+        self.client = MagicMock()
+        patchers = [
+            patch('main.get_azure_client', return_value=self.client),
+            patch('main.rag_manager', None),
+            patch('llm_cache.LLM_CACHE.enabled', False),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def slow_create(self, **kwargs):
+        time.sleep(0.3)
+        if kwargs["temperature"] == 0: # The summary agent
+            return make_completion("1. Adopt VR in math")
+        return make_completion(json.dumps({
+            "explanation": "VR can help.",
+            "follow_up_question": "Which course?",
+            "new_options": ["MATH 1013"]
+        }))
+
+    @patch('main.SUMMARY_EXECUTION_MODE', 'concurrent')
+    def test_summary_overlaps_conversational_reply(self):
+        self.client.chat.completions.create.side_effect = self.slow_create
+
+        start = time.perf_counter()
+        response_str, summary_array = main.get_openai_reply("I want VR", "objective", self.summary_array)
+        elapsed = time.perf_counter() - start
+
+        response = json.loads(response_str)
+        self.assertEqual(response["type"], "summary_and_options")
+        self.assertEqual(response["options"], ["MATH 1013"])
+        self.assertEqual(summary_array["objective"], "1. Adopt VR in math")
+        self.assertLess(elapsed, 0.55)
+
+    @patch('main.SUMMARY_EXECUTION_MODE', 'sequential')
+    def test_sequential_mode(self):
+        self.client.chat.completions.create.side_effect = self.slow_create
+
+        start = time.perf_counter()
+        _, summary_array = main.get_openai_reply("I want VR", "objective", self.summary_array)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(summary_array["objective"], "1. Adopt VR in math")
+        self.assertGreaterEqual(elapsed, 0.6)
+
+    @patch('main.SUMMARY_EXECUTION_MODE', 'concurrent')
+    def test_summary_not_updated_when_reply_is_invalid(self):
+        def create(**kwargs):
+            if kwargs["temperature"] == 0:
+                return make_completion("1. Adopt VR in math")
+            return make_completion("not json")
+
+        self.client.chat.completions.create.side_effect = create
+
+        response_str, summary_array = main.get_openai_reply("I want VR", "objective", self.summary_array)
+        self.assertEqual(json.loads(response_str)["type"], "error")
+        self.assertEqual(summary_array["objective"], "")
+
+    def test_json_mode_and_tolerant_parsing_avoid_retry(self):
+        fenced_reply = "```json\n{'explanation': 'VR can help.', 'follow_up_question': 'Which course?', 'new_options': []}\n```"
+
+        def create(**kwargs):
+            if kwargs["temperature"] == 0:
+                return make_completion("1. Adopt VR in math")
+            self.assertEqual(kwargs["response_format"], {"type": "json_object"})
+            return make_completion(fenced_reply)
+
+        self.client.chat.completions.create.side_effect = create
+        stats_before = main.get_structured_reply_stats()
+
+        response_str, _ = main.get_openai_reply("I want VR", "objective", self.summary_array)
+
+        self.assertEqual(json.loads(response_str)["explanation"], "VR can help.")
+        self.assertEqual(self.client.chat.completions.create.call_count, 2) # Reply + summary, no retry
+        stats = main.get_structured_reply_stats()
+        self.assertEqual(stats["tolerant_parses"] - stats_before["tolerant_parses"], 1)
+        self.assertEqual(stats["retries"] - stats_before["retries"], 0)
+
+    def test_correction_retry_is_last_resort(self):
+        replies = iter(["not json", json.dumps({"explanation": "Fixed.", "new_options": []})])
+
+        def create(**kwargs):
+            if kwargs["temperature"] == 0:
+                return make_completion("1. Adopt VR in math")
+            return make_completion(next(replies))
+
+        self.client.chat.completions.create.side_effect = create
+        stats_before = main.get_structured_reply_stats()
+
+        response_str, _ = main.get_openai_reply("I want VR", "objective", self.summary_array)
+
+        self.assertEqual(json.loads(response_str)["explanation"], "Fixed.")
+        self.assertEqual(main.get_structured_reply_stats()["retries"] - stats_before["retries"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import httpx
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+from asgi import application, chat as asgi_chat
+from prompts import SUGGESTIONS_AGENT_SYSTEM_MESSAGE
+
+STEP_REPLY = json.dumps({
+    "explanation": "VR can help.",
+    "follow_up_question": "Which course?",
+    "new_options": ["MATH 1013"]
+})
+
+
+def make_completion(content):
+    """Builds a MagicMock shaped like a chat completion response."""
+    completion = MagicMock()
+    completion.choices[0].message.content = content
+    return completion
+
+
+async def make_async_stream(content, size=5):
+    """Yields chunks shaped like a streamed chat completion (plain objects: MagicMocks are slow)."""
+    for i in range(0, len(content), size):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + size]))])
+
+
+def make_async_client(delay=0.2, fail_suggestions=False):
+    """Returns a mock AsyncAzureOpenAI client whose calls take `delay` seconds."""
+    async def create(stream=False, **kwargs):
+        await asyncio.sleep(delay)
+        if stream:
+            return make_async_stream((await create(**kwargs)).choices[0].message.content)
+        if kwargs["messages"][0]["content"] == SUGGESTIONS_AGENT_SYSTEM_MESSAGE:
+            if fail_suggestions:
+                raise RuntimeError("suggestions unavailable")
+            return make_completion("Consider a pilot.")
+        if kwargs["temperature"] == 0:
+            return make_completion("1. Adopt VR in math")
+        if kwargs["max_tokens"] == 2000:
+            return make_completion("# Proposal")
+        return make_completion(STEP_REPLY)
+
+    client = MagicMock()
+    client.chat.completions.create = create
+    return client
+
+
+class TestAsyncServingMode(unittest.TestCase):
+    """Tests for get_openai_reply_async and the ASGI entry point."""
+
+    def setUp(self):
+        patchers = [
+            patch('main.rag_manager', None),
+            patch('llm_cache.LLM_CACHE.enabled', False),
+            patch('main.SUMMARY_EXECUTION_MODE', 'concurrent'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_step_reply_overlaps_summary(self):
+        with patch('main.get_async_azure_client', return_value=make_async_client()):
+            start = time.perf_counter()
+            response_str, summary_array = asyncio.run(main.get_openai_reply_async("I want VR", "objective", {"objective": ""}))
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(json.loads(response_str)["options"], ["MATH 1013"])
+        self.assertEqual(summary_array["objective"], "1. Adopt VR in math")
+        self.assertLess(elapsed, 0.35)
+
+    def test_integrator_without_suggestions(self):
+        with patch('main.get_async_azure_client', return_value=make_async_client(fail_suggestions=True)):
+            response_str, _ = asyncio.run(main.get_openai_reply_async("Synthesize", "integrator", {"objective": "1. VR"}))
+        self.assertEqual(json.loads(response_str), {"type": "summary_only", "summary": "# Proposal"})
+
+    def test_many_concurrent_chats_in_one_process(self):
+        async def run_chats(count):
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http_client:
+                requests = [
+                    http_client.post("/api/chat", json={"userInput": f"Idea {i}", "purpose": "objective"})
+                    for i in range(count)
+                ]
+                return await asyncio.gather(*requests)
+
+        with patch('main.get_async_azure_client', return_value=make_async_client(delay=0.2)):
+            start = time.perf_counter()
+            responses = asyncio.run(run_chats(300))
+            elapsed = time.perf_counter() - start
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertTrue(all(response.json()["type"] == "summary_and_options" for response in responses))
+        # 300 chats of two overlapping 0.2s calls each finish together, not one per thread.
+        self.assertLess(elapsed, 3)
+
+    def test_many_concurrent_streams_in_one_process(self):
+        async def run_streams(count):
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http_client:
+                requests = [
+                    http_client.post("/api/chat/stream", json={"userInput": f"Idea {i}", "purpose": "objective"})
+                    for i in range(count)
+                ]
+                return await asyncio.gather(*requests)
+
+        with patch('main.get_async_azure_client', return_value=make_async_client(delay=0.2)), \
+                patch('app.stream_openai_reply', side_effect=AssertionError("served by Flask")):
+            start = time.perf_counter()
+            responses = asyncio.run(run_streams(300))
+            elapsed = time.perf_counter() - start
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertTrue(all(response.headers["content-type"].startswith("text/event-stream") for response in responses))
+        for response in responses:
+            events = [block.split("\n", 1) for block in response.text.strip().split("\n\n")]
+            self.assertEqual("".join(json.loads(data[6:])["text"] for event, data in events if event == "event: token"), "VR can help.")
+            self.assertEqual(events[-1][0], "event: final")
+            final = json.loads(events[-1][1][6:])
+            self.assertEqual((final["type"], final["options"]), ("summary_and_options", ["MATH 1013"]))
+            self.assertEqual(final["full_summary_state"]["objective"], "1. Adopt VR in math")
+        # 300 streamed chats of two overlapping 0.2s calls each finish together, not one at a time.
+        self.assertLess(elapsed, 3)
+
+    def test_integrator_streams_proposal_then_suggestions(self):
+        async def collect():
+            return [event async for event in main.astream_openai_reply("Synthesize", "integrator", {"objective": "1. VR"})]
+
+        with patch('main.get_async_azure_client', return_value=make_async_client(delay=0)):
+            events = asyncio.run(collect())
+
+        text = "".join(payload["text"] for event, payload in events if event == "token")
+        self.assertTrue(text.startswith("# Proposal"))
+        self.assertIn("Consider a pilot.", text)
+        self.assertEqual(events[-1], ("final", {"type": "summary_only", "summary": text}))
+
+    def test_session_cookie_is_reused(self):
+        async def run_two_turns():
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http_client:
+                first = await http_client.post("/api/chat", json={"userInput": "I want VR", "purpose": "objective"})
+                second = await http_client.post("/api/chat", json={"userInput": "", "purpose": "outcomes"})
+                return first, second
+
+        with patch('main.get_async_azure_client', return_value=make_async_client(delay=0)):
+            first, second = asyncio.run(run_two_turns())
+
+        self.assertIn("set-cookie", first.headers)
+        self.assertNotIn("set-cookie", second.headers)
+        self.assertEqual(second.json()["full_summary_state"]["objective"], "1. Adopt VR in math")
+
+    def test_coalesced_request_survives_a_cancelled_leader(self):
+        async def post(sent):
+            body = json.dumps({"userInput": "I want VR", "purpose": "objective"}).encode("utf-8")
+            messages = iter([{"type": "http.request", "body": body, "more_body": False}])
+
+            async def receive():
+                return next(messages)
+
+            async def send(message):
+                sent.append(message)
+
+            await asgi_chat({"type": "http", "headers": []}, receive, send)
+
+        async def run():
+            leader_sent, follower_sent = [], []
+            leader = asyncio.create_task(post(leader_sent))
+            await asyncio.sleep(0.05)
+            follower = asyncio.create_task(post(follower_sent))
+            await asyncio.sleep(0.05)
+            leader.cancel() # The leader's client disconnected
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            await follower
+            return leader_sent, follower_sent
+
+        # Both requests share one flight key, as a double submit in one session would.
+        with patch('main.get_async_azure_client', return_value=make_async_client(delay=0.2)), \
+                patch('asgi.chat_flight_key', return_value="same-turn"):
+            leader_sent, follower_sent = asyncio.run(run())
+
+        self.assertEqual(leader_sent[0]["status"], 503)
+        self.assertEqual(follower_sent[0]["status"], 200)
+        self.assertEqual(json.loads(follower_sent[1]["body"])["options"], ["MATH 1013"])
+
+    def test_other_routes_are_served_by_flask(self):
+        async def get_metrics():
+            transport = httpx.ASGITransport(app=application)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as http_client:
+                return await http_client.get("/api/metrics")
+
+        response = asyncio.run(get_metrics())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("llm_client", response.json())
+
+
+if __name__ == '__main__':
+    unittest.main()
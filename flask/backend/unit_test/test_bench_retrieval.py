@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, script_dir)
+
+from bench_retrieval import load_dataset, grade, unmatched_passages, evaluate, warm_up
+
+CORPUS = [
+    "Funding\nUp to HK$300,000 with one-third matching from the department/division.",
+    "Project Objectives (maximum 1 page)\nProject Plan and Methodology (maximum 2 pages)",
+    "Important Dates\nPreliminary Proposal Submission: \t30th August 2025",
+]
+
+
+class TestRetrievalGrading(unittest.TestCase):
+    """Tests for the recall@k and MRR grading of the offline retrieval benchmark."""
+
+    def test_grade(self):
+        passages = ["project objectives (maximum 1 page)", "Up to HK$300,000 with one-third matching"]
+        self.assertEqual(grade(CORPUS, passages), (1.0, 1.0))
+        self.assertEqual(grade([CORPUS[2], CORPUS[1]], passages), (0.5, 0.5))
+        self.assertEqual(grade([CORPUS[2]], passages), (0.0, 0.0))
+
+    def test_evaluate(self):
+        dataset = [
+            {"query": "pages", "purpose": "objective", "expected_passages": ["Project Plan and Methodology (maximum 2 pages)"]},
+            {"query": "dates", "purpose": "objective", "expected_passages": ["Preliminary Proposal Submission: 30th August 2025"]},
+            {"query": "joke", "purpose": "irrelevant", "expected_passages": []},
+        ]
+        ranked = {"pages": [CORPUS[1], CORPUS[0]], "dates": [CORPUS[0], CORPUS[1]], "joke": [CORPUS[0]]}
+        calls = []
+
+        def retrieve(query, purpose, k):
+            calls.append((query, purpose, k))
+            return ranked[query][:k]
+
+        result = evaluate(retrieve, dataset, k=2, repeat=3)
+        self.assertEqual(len(calls), 9)
+        self.assertEqual((result["queries"], result["graded_queries"]), (3, 2))
+        self.assertEqual(result["recall_at_2"], 0.5)
+        self.assertEqual(result["mrr"], 0.5)
+        self.assertGreater(result["context_tokens_mean"], 0)
+        self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        # The warm-up makes the same calls as one evaluation pass, purposes included.
+        warmed = []
+        warm_up(lambda query, purpose, k: warmed.append((query, purpose, k)), dataset, k=2)
+        self.assertEqual(warmed, calls[:3])
+
+    def test_golden_dataset_annotations(self):
+        dataset = load_dataset()
+        self.assertTrue(all(isinstance(item["expected_passages"], list) for item in dataset))
+        self.assertTrue(any(item["expected_passages"] for item in dataset))
+        for item in dataset:
+            if item["purpose"] == "irrelevant":
+                self.assertEqual(item["expected_passages"], [])
+        self.assertEqual(unmatched_passages([{"expected_passages": ["30th  August 2025", "a missing passage"]}], CORPUS),
+                         ["a missing passage"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import io
+import os
+import sys
+from unittest.mock import patch
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+import context_compression
+from context_compression import mmr_select, remove_overlaps, trim_sentences, compress_chunks, get_compression_stats
+from token_budget import count_tokens
+from prompts import SYSTEM_PROMPTS
+
+DOCUMENT = (
+    "The proposal document has a maximum length of 15 pages, excluding the appendices. "
+    "Appendices may include letters of support and a detailed budget. "
+    "Two reference letters are required, one from a direct supervisor. "
+    "The committee meets twice a year to review proposals. "
+    "Evaluation should collect student feedback through surveys and focus groups."
+)
+
+
+def split_with_overlap(text, size, overlap):
+    """Character windows like RecursiveCharacterTextSplitter's, for overlapping test chunks."""
+    return [text[start:start + size] for start in range(0, len(text) - overlap, size - overlap)]
+
+
+class TestContextCompression(unittest.TestCase):
+    """Tests for the MMR, overlap and sentence stages applied to retrieved chunks."""
+
+    def test_mmr_drops_near_duplicates_and_keeps_rank_otherwise(self):
+        chunks = [
+            "Budget may include student helpers and equipment.",
+            "The budget may include student helpers and equipment!",
+            "Evaluation uses surveys and focus groups.",
+            "Projects must finish within two years.",
+        ]
+        self.assertEqual(mmr_select(chunks), [chunks[0], chunks[2], chunks[3]])
+        self.assertEqual(mmr_select(chunks, duplicate_threshold=1.1)[0], chunks[0])
+        self.assertEqual(mmr_select([]), [])
+
+    def test_overlap_windows_are_cut(self):
+        chunks = split_with_overlap(DOCUMENT, 160, 60)
+        # Retrieved out of document order, as a retriever would.
+        compressed = remove_overlaps([chunks[1], chunks[0], chunks[2]])
+
+        self.assertEqual(compressed[0], chunks[1])
+        self.assertLess(len(compressed[1]), len(chunks[0]))
+        self.assertLess(len(compressed[2]), len(chunks[2]))
+        for piece in compressed[1:]:
+            self.assertIn(piece, DOCUMENT)
+            self.assertNotIn(piece[-50:], compressed[0])
+        self.assertEqual(remove_overlaps([DOCUMENT, DOCUMENT[10:90]]), [DOCUMENT])
+
+    def test_short_shared_phrases_are_kept(self):
+        chunks = ["Projects must be approved.", "approved. Then funding starts."]
+        self.assertEqual(remove_overlaps(chunks), chunks)
+
+    def test_sentence_trimming_keeps_the_relevant_sentences_in_order(self):
+        trimmed = trim_sentences("Maximum proposal length, and are reference letters required?", DOCUMENT, keep_ratio=0.4)
+        self.assertEqual(trimmed, (
+            "The proposal document has a maximum length of 15 pages, excluding the appendices. "
+            "Two reference letters are required, one from a direct supervisor."
+        ))
+        self.assertEqual(trim_sentences("letters", "One sentence. Two sentences."), "One sentence. Two sentences.")
+
+    def test_levels_report_tokens_removed_per_stage(self):
+        chunks = split_with_overlap(DOCUMENT, 160, 60)
+        chunks = [chunks[1], chunks[1], chunks[0], chunks[2]]
+
+        unchanged, report = compress_chunks("reference letters", chunks, level="off")
+        self.assertEqual(unchanged, chunks)
+        self.assertEqual(report["tokens_out"], report["tokens_in"])
+
+        compressed, report = compress_chunks("reference letters", chunks, level="aggressive")
+        self.assertTrue({"mmr_tokens_removed", "overlap_tokens_removed", "sentences_tokens_removed"} <= set(report))
+        self.assertGreater(report["mmr_tokens_removed"], 0)
+        self.assertGreater(report["overlap_tokens_removed"], 0)
+        self.assertEqual(
+            report["tokens_in"] - report["tokens_out"],
+            report["mmr_tokens_removed"] + report["overlap_tokens_removed"] + report["sentences_tokens_removed"],
+        )
+        self.assertEqual(report["tokens_out"], sum(count_tokens(chunk) for chunk in compressed))
+        self.assertEqual(report["chunks_out"], 3)
+
+    def test_step_prompt_uses_compressed_reference(self):
+        chunks = ["Two reference letters are required, one from a direct supervisor."] * 3
+        persona = SYSTEM_PROMPTS["objective"]["persona"]
+        before = get_compression_stats()["requests"]
+        with patch.object(context_compression, "CONTEXT_COMPRESSION", "balanced"), \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            messages = main.prepare_step_messages("objective", persona, chunks, "1. VR", "How many letters?")
+        self.assertEqual(messages[0]["content"].count(chunks[0]), 1)
+        self.assertRegex(stderr.getvalue(), r"context compression purpose=objective level=balanced tokens=\d+->\d+ mmr_tokens_removed=\d+")
+        self.assertEqual(get_compression_stats()["requests"], before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
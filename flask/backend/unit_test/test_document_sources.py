@@ -0,0 +1,122 @@
+import unittest
+import os
+import sys
+import types
+import tempfile
+import importlib.util
+from unittest.mock import patch
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from document_sources import (
+    list_source_files, format_table_row, normalize_pdf_text, pdf_outline_headings, iter_pdf_units, iter_source_units
+)
+
+
+def make_fake_pypdf(page_texts, outline, opened):
+    """Fake pypdf: outline entries are (title, page_index) tuples or nested lists of them."""
+    class FakePage:
+        def __init__(self, text):
+            self.text = text
+
+        def extract_text(self, extraction_mode="plain"):
+            assert extraction_mode == "layout"
+            return self.text
+
+    class FakeReader:
+        def __init__(self, path):
+            opened.append(path)
+            self.pages = [FakePage(text) for text in page_texts]
+
+        @property
+        def outline(self):
+            def convert(items):
+                return [convert(item) if isinstance(item, list) else types.SimpleNamespace(title=item[0], page=item[1])
+                        for item in items]
+            return convert(outline)
+
+        def get_destination_page_number(self, destination):
+            return destination.page
+
+    return types.SimpleNamespace(PdfReader=FakeReader)
+
+
+class TestDocumentSources(unittest.TestCase):
+    """Tests for reading .docx and .pdf sources as streams of text units."""
+
+    def test_lists_docx_and_pdf_without_lock_files(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            for name in ("b.pdf", "a.docx", "~$a.docx", "notes.txt", "C.PDF"):
+                open(os.path.join(data_dir, name), "wb").close()
+            self.assertEqual(list_source_files(data_dir), ["C.PDF", "a.docx", "b.pdf"])
+
+    def test_table_rows_and_pdf_columns(self):
+        self.assertEqual(format_table_row(["Item", "Item", " Cost\n(CAD) ", ""]), "Item | Cost (CAD)")
+        self.assertEqual(
+            normalize_pdf_text("  Budget\n\n  Student helper      $5,000    Year 1   \n"),
+            "Budget\nStudent helper | $5,000 | Year 1",
+        )
+
+    def test_pdf_pages_under_outline_headings(self):
+        opened = []
+        outline = [("Application", 0), [("Budget", 2)], ("Evaluation", 3)]
+        pages = ["Intro", "   ", "Student helper      $5,000", "Surveys", "Focus groups"]
+        with patch.dict(sys.modules, {"pypdf": make_fake_pypdf(pages, outline, opened)}):
+            units = list(iter_pdf_units("report.pdf", pages_per_reader=2))
+
+        self.assertEqual(units, [
+            ("Application", "Intro\n", 1),
+            ("Application > Budget", "Student helper | $5,000\n", 3),
+            ("Evaluation", "Surveys\n", 4),
+            ("Evaluation", "Focus groups\n", 5),
+        ])
+        # The file is reopened every 2 pages, so pypdf's object cache does not grow with the file.
+        self.assertEqual(len(opened), 3)
+
+    def test_damaged_outline_keeps_text(self):
+        broken = type("BrokenReader", (), {"outline": property(lambda self: 1 / 0)})()
+        self.assertEqual(pdf_outline_headings(broken), {})
+        reader = types.SimpleNamespace(
+            outline=[types.SimpleNamespace(title="Budget", page=None)],
+            get_destination_page_number=lambda destination: destination.page,
+        )
+        self.assertEqual(pdf_outline_headings(reader), {})
+
+    def test_unsupported_source(self):
+        with self.assertRaises(ValueError):
+            iter_source_units("notes.txt")
+
+
+@unittest.skipUnless(importlib.util.find_spec("docx"), "needs python-docx")
+class TestDocxUnits(unittest.TestCase):
+    """Reads a real .docx, including its tables."""
+
+    def test_tables_are_read_in_document_order(self):
+        from docx import Document
+
+        doc = Document()
+        doc.add_heading("Budget", level=1)
+        doc.add_paragraph("Eligible expenses:")
+        table = doc.add_table(rows=2, cols=2)
+        for row, cells in zip(table.rows, [("Item", "Cost"), ("Student helper", "$5,000")]):
+            for cell, text in zip(row.cells, cells):
+                cell.text = text
+        doc.add_paragraph("Equipment is capped.")
+        doc.add_heading("Timeline", level=1)
+        doc.add_paragraph("Two years.")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "guide.docx")
+            doc.save(path)
+            units = list(iter_source_units(path))
+
+        self.assertEqual(units, [
+            ("Budget", "Eligible expenses:\nItem | Cost\nStudent helper | $5,000\nEquipment is capped.\n", None),
+            ("Timeline", "Two years.\n", None),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
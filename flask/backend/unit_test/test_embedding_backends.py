@@ -0,0 +1,145 @@
+import unittest
+import os
+import sys
+import json
+import types
+import tempfile
+import importlib.util
+from unittest.mock import patch
+
+import numpy as np
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import embedding_backends
+from embedding_backends import OnnxEmbeddings, make_embeddings, mean_pool, ONNX_MODEL_DIR
+
+DIMENSIONS = 8
+
+
+def make_fake_onnx_modules(runs, options):
+    """Fake onnxruntime and tokenizers: token i embeds as a one-hot of (id % DIMENSIONS)."""
+    class FakeEncoding:
+        def __init__(self, ids, length):
+            self.ids = ids + [0] * (length - len(ids))
+            self.attention_mask = [1] * len(ids) + [0] * (length - len(ids))
+            self.type_ids = [0] * length
+
+    class FakeTokenizer:
+        @classmethod
+        def from_file(cls, path):
+            return cls()
+
+        def enable_truncation(self, max_length):
+            self.max_length = max_length
+
+        def enable_padding(self):
+            pass
+
+        def encode_batch(self, texts):
+            token_ids = [[len(word) for word in text.split()][:self.max_length] for text in texts]
+            length = max(len(ids) for ids in token_ids)
+            return [FakeEncoding(ids, length) for ids in token_ids]
+
+    class FakeSession:
+        def __init__(self, path, sess_options, providers):
+            options.append(sess_options)
+
+        def get_inputs(self):
+            # Like many exports, this model has no token_type_ids input.
+            return [types.SimpleNamespace(name="input_ids"), types.SimpleNamespace(name="attention_mask")]
+
+        def run(self, output_names, inputs):
+            runs.append(sorted(inputs))
+            ids = inputs["input_ids"]
+            hidden = np.zeros(ids.shape + (DIMENSIONS,), dtype=np.float32)
+            np.put_along_axis(hidden, (ids % DIMENSIONS)[..., None], 1.0, axis=2)
+            hidden[inputs["attention_mask"] == 0] = 100.0 # Padding must not leak into the mean
+            return [hidden]
+
+    onnxruntime = types.ModuleType("onnxruntime")
+    onnxruntime.SessionOptions = types.SimpleNamespace
+    onnxruntime.InferenceSession = FakeSession
+    tokenizers = types.ModuleType("tokenizers")
+    tokenizers.Tokenizer = FakeTokenizer
+    return {"onnxruntime": onnxruntime, "tokenizers": tokenizers}
+
+
+class TestOnnxEmbeddings(unittest.TestCase):
+    """Tests for the ONNX Runtime embedding backend."""
+
+    def setUp(self):
+        self.model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.model_dir.cleanup)
+        for name in ("model.onnx", "tokenizer.json"):
+            with open(os.path.join(self.model_dir.name, name), "wb") as f:
+                f.write(b"placeholder")
+        self.runs, self.options = [], []
+        patcher = patch.dict(sys.modules, make_fake_onnx_modules(self.runs, self.options))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_mean_pool_ignores_padding_and_normalizes(self):
+        tokens = np.array([[[3.0, 0.0], [0.0, 4.0], [9.0, 9.0]]])
+        pooled = mean_pool(tokens, np.array([[1, 1, 0]]))
+        np.testing.assert_allclose(pooled, [[0.6, 0.8]])
+
+    def test_embeds_in_batches_with_thread_setting(self):
+        model = OnnxEmbeddings(self.model_dir.name, intra_op_threads=2, batch_size=2)
+        vectors = model.embed_documents(["a bb", "ccc", "a bb ccc dddd", "a", "bb bb"])
+
+        self.assertEqual(len(self.runs), 3)
+        self.assertEqual(self.runs[0], ["attention_mask", "input_ids"])
+        self.assertEqual(self.options[0].intra_op_num_threads, 2)
+        self.assertEqual(self.options[0].inter_op_num_threads, 1)
+        self.assertEqual(len(vectors), 5)
+        np.testing.assert_allclose(vectors[1], np.eye(DIMENSIONS)[3])
+        np.testing.assert_allclose(vectors[0], (np.eye(DIMENSIONS)[1] + np.eye(DIMENSIONS)[2]) / np.sqrt(2), rtol=1e-6)
+        # A text's vector does not depend on what it was batched with.
+        np.testing.assert_allclose(model.embed_query("a bb"), vectors[0])
+        self.assertEqual(model.embed_documents([]), [])
+
+    def test_missing_model(self):
+        with self.assertRaises(FileNotFoundError):
+            OnnxEmbeddings(os.path.join(self.model_dir.name, "missing"))
+
+    def test_make_embeddings_selects_backend(self):
+        with patch.object(embedding_backends, "ONNX_MODEL_DIR", self.model_dir.name), \
+                patch.object(embedding_backends, "ONNX_INTRA_OP_THREADS", 3):
+            self.assertIsInstance(make_embeddings("all-MiniLM-L6-v2", backend="onnx"), OnnxEmbeddings)
+        self.assertEqual(self.options[-1].intra_op_num_threads, 3)
+        fake_huggingface = types.SimpleNamespace(HuggingFaceEmbeddings=lambda model_name: ("hf", model_name))
+        with patch.dict(sys.modules, {"langchain_huggingface": types.ModuleType("langchain_huggingface"),
+                                      "langchain_huggingface.embeddings": fake_huggingface}):
+            self.assertEqual(make_embeddings("all-MiniLM-L6-v2", backend="huggingface"), ("hf", "all-MiniLM-L6-v2"))
+        with self.assertRaises(ValueError):
+            make_embeddings("all-MiniLM-L6-v2", backend="tensorflow")
+
+
+def real_backends_available():
+    modules = ("onnxruntime", "tokenizers", "langchain_huggingface")
+    return all(importlib.util.find_spec(name) for name in modules) and os.path.exists(os.path.join(ONNX_MODEL_DIR, "model.onnx"))
+
+
+@unittest.skipUnless(real_backends_available(), "needs onnxruntime, langchain_huggingface and an exported ONNX model")
+class TestOnnxMatchesHuggingFace(unittest.TestCase):
+    """The ONNX export must embed like the PyTorch model that built rag_db."""
+
+    def test_cosine_equivalence(self):
+        with open(os.path.join(script_dir, 'golden_dataset.json'), 'r', encoding='utf-8') as f:
+            dataset = json.load(f)["golden_dataset"]
+        texts = [item["query"] for item in dataset] + [item["ground_truth"] for item in dataset]
+
+        onnx_vectors = np.array(make_embeddings("all-MiniLM-L6-v2", backend="onnx").embed_documents(texts))
+        torch_vectors = np.array(make_embeddings("all-MiniLM-L6-v2", backend="huggingface").embed_documents(texts))
+
+        cosines = (onnx_vectors * torch_vectors).sum(axis=1) / (
+            np.linalg.norm(onnx_vectors, axis=1) * np.linalg.norm(torch_vectors, axis=1))
+        self.assertGreater(cosines.min(), 0.999)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from embedding_cache import QueryEmbeddingCache, make_embedding_key
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    """Tests for the query embedding LRU cache."""
+
+    def setUp(self):
+        self.calls = []
+
+    def embed(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 0.5]
+
+    def test_hit_on_normalized_text(self):
+        cache = QueryEmbeddingCache(max_entries=8)
+        first = cache.get_or_embed("model", "Improve student motivation", self.embed)
+        second = cache.get_or_embed("model", "  Improve  student motivation\n", self.embed)
+
+        self.assertEqual(self.calls, ["Improve student motivation"])
+        self.assertIs(first, second)
+        self.assertEqual(first.dtype, np.float32)
+        self.assertFalse(first.flags.writeable)
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_keys_include_the_model(self):
+        self.assertNotEqual(make_embedding_key("model-a", "query"), make_embedding_key("model-b", "query"))
+        cache = QueryEmbeddingCache(max_entries=8)
+        cache.get_or_embed("model-a", "query", self.embed)
+        cache.get_or_embed("model-b", "query", self.embed)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_lru_eviction(self):
+        cache = QueryEmbeddingCache(max_entries=2)
+        cache.get_or_embed("model", "a", self.embed)
+        cache.get_or_embed("model", "b", self.embed)
+        cache.get_or_embed("model", "a", self.embed) # "a" is now the most recently used
+        cache.get_or_embed("model", "c", self.embed)
+
+        self.assertIsNotNone(cache.get("model", "a"))
+        self.assertIsNone(cache.get("model", "b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_get_or_embed_many_embeds_misses_in_one_call(self):
+        cache = QueryEmbeddingCache(max_entries=8)
+        cache.get_or_embed("model", "a", self.embed)
+        batches = []
+
+        def embed_many(texts):
+            batches.append(list(texts))
+            return [self.embed(text) for text in texts]
+
+        vectors = cache.get_or_embed_many("model", ["a", "bb", "bb ", "ccc"], embed_many)
+        self.assertEqual(batches, [["bb", "ccc"]])
+        self.assertEqual([vector[0] for vector in vectors], [1.0, 2.0, 2.0, 3.0])
+        self.assertIs(vectors[1], vectors[2])
+
+    def test_disabled_cache_always_embeds(self):
+        cache = QueryEmbeddingCache(max_entries=8, enabled=False)
+        cache.get_or_embed("model", "a", self.embed)
+        cache.get_or_embed("model", "a", self.embed)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_warm_set_round_trip(self):
+        cache = QueryEmbeddingCache(max_entries=8)
+        for text in ("a", "bb", "ccc"):
+            cache.get_or_embed("model", text, self.embed)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "warm.npz")
+            self.assertEqual(cache.save(path, max_entries=2), 2)
+
+            restarted = QueryEmbeddingCache(max_entries=8)
+            self.assertEqual(restarted.load(path), 2)
+
+        self.assertIsNone(restarted.get("model", "a"))
+        np.testing.assert_array_equal(restarted.get("model", "ccc"), [3.0, 0.5])
+        self.assertEqual(restarted.stats()["warm_loaded"], 2)
+
+    def test_unreadable_warm_set_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "warm.npz")
+            with open(path, "w") as f:
+                f.write("not an npz file")
+            self.assertEqual(QueryEmbeddingCache(max_entries=8).load(path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
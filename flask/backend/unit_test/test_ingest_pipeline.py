@@ -0,0 +1,151 @@
+import unittest
+import os
+import sys
+from functools import partial
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from ingest_pipeline import run_ingest, format_ingest_stats
+
+DOCUMENTS = {
+    "a.docx": ["a0", "a1", "a2"],
+    "b.docx": ["b0"],
+    "empty.docx": [],
+    "c.docx": ["c0", "c1", "c2", "c3", "c4"],
+}
+
+
+def extract_document(documents, source):
+    """Module-level, so it can be sent to the process pool."""
+    if source == "broken.docx":
+        raise ValueError("not a zip file")
+    return [(f"{source}:{i}", text, {"source": source, "position": i}) for i, text in enumerate(documents[source])]
+
+
+def stream_document(pages, source, fail_at=None, progress=None):
+    """A generator extract: one chunk per page of a long document, yielded as it is read."""
+    for page in range(pages):
+        if source.startswith("broken") and page == fail_at:
+            raise ValueError("truncated file")
+        if progress is not None:
+            progress.append(page)
+        yield f"{source}:{page}", f"page {page}", {"source": source, "position": page}
+
+
+class TestIngestPipeline(unittest.TestCase):
+    """Tests for the extract -> embed -> write pipeline used by rag_builder.py."""
+
+    def run_pipeline(self, workers, batch_size=2, sources=None):
+        self.embed_calls = []
+        self.written = {}
+        self.done = {}
+
+        def embed(texts):
+            self.embed_calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+
+        def write(ids, texts, vectors, metadatas):
+            # A source is only reported done after all of its chunks were written.
+            for source in self.done:
+                self.assertTrue(all(chunk_id in self.written for chunk_id in self.done[source]))
+            self.assertEqual([metadata["source"] for metadata in metadatas], [chunk_id.split(":")[0] for chunk_id in ids])
+            self.written.update(zip(ids, texts))
+
+        def on_source_done(source, chunk_ids):
+            self.assertTrue(all(chunk_id in self.written for chunk_id in chunk_ids))
+            self.done[source] = chunk_ids
+
+        return run_ingest(
+            sources or list(DOCUMENTS), partial(extract_document, DOCUMENTS), embed, write,
+            on_source_done=on_source_done, workers=workers, batch_size=batch_size, max_pending_sources=2,
+        )
+
+    def test_inline_pipeline(self):
+        stats = self.run_pipeline(workers=1)
+
+        self.assertEqual(stats["docs"], 4)
+        self.assertEqual(stats["chunks"], 9)
+        self.assertEqual([len(call) for call in self.embed_calls], [2, 2, 2, 2, 1])
+        self.assertEqual(sorted(self.done), sorted(DOCUMENTS))
+        self.assertEqual(self.done["a.docx"], ["a.docx:0", "a.docx:1", "a.docx:2"])
+        self.assertEqual(self.done["empty.docx"], [])
+        self.assertLessEqual(stats["peak_buffered_chunks"], 6)
+        self.assertIn("docs/s", format_ingest_stats(stats))
+
+    def test_process_pool_pipeline(self):
+        stats = self.run_pipeline(workers=2, batch_size=4)
+        self.assertEqual(stats["chunks"], 9)
+        self.assertEqual(len(self.written), 9)
+        self.assertEqual(sorted(self.done), sorted(DOCUMENTS))
+        self.assertTrue(all(len(call) <= 4 for call in self.embed_calls))
+
+    def test_failed_source_is_skipped(self):
+        for workers in (1, 2):
+            stats = self.run_pipeline(workers=workers, sources=["a.docx", "broken.docx", "b.docx"])
+            self.assertEqual(stats["failed"], ["broken.docx"])
+            self.assertEqual(sorted(self.done), ["a.docx", "b.docx"])
+
+
+class TestStreamingIngest(unittest.TestCase):
+    """Chunks of a long document reach the embedder while it is still being extracted."""
+
+    def test_chunks_are_embedded_as_they_are_produced(self):
+        progress, embedded_at = [], []
+
+        def embed(texts):
+            embedded_at.append(len(progress))
+            return [[1.0] for _ in texts]
+
+        stats = run_ingest(
+            ["long.pdf"], partial(stream_document, 1000, progress=progress), embed, lambda *args: None,
+            workers=1, batch_size=10, block_size=5,
+        )
+        self.assertEqual(stats["chunks"], 1000)
+        self.assertEqual(embedded_at[0], 10) # The first batch is embedded after reading 10 pages
+        self.assertLessEqual(stats["peak_buffered_chunks"], 10)
+
+    def test_process_pool_memory_is_bounded(self):
+        done = {}
+        stats = run_ingest(
+            ["a.pdf", "b.pdf", "c.pdf"], partial(stream_document, 500), lambda texts: [[1.0] for _ in texts],
+            lambda *args: None, on_source_done=lambda source, chunk_ids: done.update({source: chunk_ids}),
+            workers=2, batch_size=8, block_size=4, max_pending_blocks=2,
+        )
+        self.assertEqual(stats["chunks"], 1500)
+        self.assertEqual(done["b.pdf"], [f"b.pdf:{page}" for page in range(500)])
+        # Far below one document: only the queued blocks and one batch are ever held.
+        self.assertLess(stats["peak_buffered_chunks"], 100)
+
+    def test_failure_midway_reports_written_chunks(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                written, failed, done = [], {}, {}
+                stats = run_ingest(
+                    ["a.pdf", "broken.pdf"], partial(stream_document, 10, fail_at=7), lambda texts: [[1.0] for _ in texts],
+                    lambda ids, texts, vectors, metadatas: written.extend(ids),
+                    on_source_done=lambda source, chunk_ids: done.update({source: chunk_ids}),
+                    on_source_failed=lambda source, chunk_ids: failed.update({source: chunk_ids}),
+                    workers=workers, batch_size=4, block_size=2,
+                )
+                self.assertEqual(stats["failed"], ["broken.pdf"])
+                self.assertEqual(list(done), ["a.pdf"])
+                # Every written chunk of the failed source is reported, and no other.
+                self.assertEqual(list(failed), ["broken.pdf"])
+                self.assertEqual(sorted(failed["broken.pdf"]), sorted(i for i in written if i.startswith("broken")))
+
+
+    def test_embedder_failure_stops_the_pool(self):
+        def embed(texts):
+            raise RuntimeError("model unavailable")
+
+        # The workers are blocked on the full queue; they must be released, not waited for forever.
+        with self.assertRaises(RuntimeError):
+            run_ingest(["a.pdf", "b.pdf"], partial(stream_document, 500), embed, lambda *args: None,
+                       workers=2, batch_size=4, block_size=2, max_pending_blocks=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
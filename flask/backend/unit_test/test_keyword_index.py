@@ -0,0 +1,106 @@
+import unittest
+import os
+import sys
+import math
+import tempfile
+
+import numpy as np
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from keyword_index import KeywordIndex, KeywordIndexWriter, write_keyword_index, tokenize, reciprocal_rank_fusion, BM25_K1, BM25_B
+
+TEXTS = [
+    "The proposal document has a maximum length of 15 pages, excluding the appendices.",
+    "Two reference letters are required, one from a direct supervisor.",
+    "The page limit for each appendix is two pages.",
+    "Evaluation should collect student feedback through surveys and focus groups.",
+    "Proposals are reviewed by the committee.",
+]
+
+
+def brute_force_bm25(texts, query):
+    """BM25 computed directly from the formula, for comparison."""
+    documents = [tokenize(text) for text in texts]
+    average_length = sum(len(document) for document in documents) / len(documents)
+    scores = []
+    for document in documents:
+        score = 0.0
+        for term in set(tokenize(query)):
+            freq = document.count(term)
+            if not freq:
+                continue
+            df = sum(term in other for other in documents)
+            idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            score += idf * freq * (BM25_K1 + 1) / (freq + BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length))
+        scores.append(score)
+    return scores
+
+
+class TestKeywordIndex(unittest.TestCase):
+    """Tests for the BM25 inverted index and reciprocal rank fusion."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.index_dir = os.path.join(self.tmp_dir.name, "keyword_index")
+        metadatas = [{"source": "guide.docx", "tag_general": True}] * 3 + [{"source": "eval.docx", "tag_evaluation": True}] * 2
+        write_keyword_index(self.index_dir, [str(i) for i in range(len(TEXTS))], TEXTS, metadatas)
+        self.index = KeywordIndex(self.index_dir)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("What is the maximum number of Pages?"), ["maximum", "number", "page"])
+        self.assertEqual(tokenize("Appendices, class"), ["appendice", "class"])
+
+    def test_scores_match_bm25_formula(self):
+        query = "What is the maximum number of pages for the proposal?"
+        expected = brute_force_bm25(TEXTS, query)
+        for got, want in zip(self.index.scores(query), expected):
+            self.assertAlmostEqual(float(got), want, places=5)
+
+    def test_search_ranks_keyword_matches(self):
+        (positions, scores), = self.index.search(["maximum number of pages for the proposal"], k=3)
+        self.assertEqual(positions[0], 0)
+        self.assertTrue(all(scores[i] >= scores[i + 1] for i in range(len(scores) - 1)))
+        self.assertEqual(self.index.search_texts(["How many reference letters?"], k=1), [[TEXTS[1]]])
+
+    def test_no_matching_terms_returns_nothing(self):
+        self.assertEqual(self.index.search_texts(["zebra", "the of"], k=3), [[], []])
+
+    def test_filtered_search(self):
+        spec = {"tags": ["evaluation"], "sources": []}
+        self.assertEqual(self.index.search_texts(["proposal feedback"], k=5, spec=spec), [[TEXTS[3], TEXTS[4]]])
+        self.assertIs(self.index.candidate_mask(spec), self.index.candidate_mask(dict(spec)))
+
+    def test_missing_index(self):
+        with self.assertRaises(FileNotFoundError):
+            KeywordIndex(os.path.join(self.tmp_dir.name, "missing"))
+
+    def test_block_writes_match_a_single_write(self):
+        blocks_dir = os.path.join(self.tmp_dir.name, "blocks")
+        metadatas = [{"source": "guide.docx", "tag_general": True}] * 3 + [{"source": "eval.docx", "tag_evaluation": True}] * 2
+        ids = [str(i) for i in range(len(TEXTS))]
+        with KeywordIndexWriter(blocks_dir) as writer:
+            for start in range(0, len(TEXTS), 2):
+                writer.add(ids[start:start + 2], TEXTS[start:start + 2], metadatas[start:start + 2])
+        self.assertEqual(os.listdir(self.tmp_dir.name).count("blocks"), 1)
+        blocks = KeywordIndex(blocks_dir)
+
+        self.assertEqual((blocks.ids, blocks.texts, blocks.metadatas), (self.index.ids, self.index.texts, self.index.metadatas))
+        self.assertEqual(blocks.term_ids, self.index.term_ids)
+        for name in ("term_offsets", "doc_ids", "term_freqs", "idf", "length_norm"):
+            np.testing.assert_array_equal(getattr(blocks, name), getattr(self.index, name))
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], limit=3, rrf_k=60)
+        self.assertEqual(fused, ["a", "c", "b"])
+        # Equal scores keep the order in which the items were first seen.
+        self.assertEqual(reciprocal_rank_fusion([["x"], ["y"]], limit=2), ["x", "y"])
+        self.assertEqual(reciprocal_rank_fusion([[], []], limit=4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
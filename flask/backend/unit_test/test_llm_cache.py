@@ -0,0 +1,158 @@
+import unittest
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+from unittest.mock import patch, MagicMock, AsyncMock
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from llm_cache import LLMResponseCache, make_cache_key, cached_chat_completion, async_cached_chat_completion
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """Tests for the two-tier completion cache."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, 'llm_cache.sqlite3')
+
+    def make_cache(self, **kwargs):
+        settings = {"ttl_seconds": 60, "memory_max_entries": 2, "disk_max_entries": 3}
+        settings.update(kwargs)
+        return LLMResponseCache(self.db_path, **settings)
+
+    def test_key_depends_on_output_fields_only(self):
+        request = {"model": "gpt", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.5, "max_tokens": 10}
+        self.assertEqual(make_cache_key(request), make_cache_key(dict(request, stream=True)))
+        self.assertNotEqual(make_cache_key(request), make_cache_key(dict(request, temperature=0)))
+        self.assertNotEqual(make_cache_key(request), make_cache_key(dict(request, max_tokens=11)))
+
+    def test_memory_and_disk_tiers(self):
+        cache = self.make_cache()
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", "reply")
+        self.assertEqual(cache.get("a"), "reply")
+
+        # A second cache on the same file (e.g. another worker) hits the disk tier.
+        other = self.make_cache()
+        self.assertEqual(other.get("a"), "reply")
+        self.assertEqual(cache.stats()["memory_hits"], 1)
+        self.assertEqual(other.stats()["disk_hits"], 1)
+        self.assertEqual(other.stats()["misses"], 0)
+
+    def test_ttl_expiry(self):
+        cache = self.make_cache(ttl_seconds=10)
+        with patch('llm_cache.time.time', return_value=1000.0):
+            cache.set("a", "reply")
+        with patch('llm_cache.time.time', return_value=1011.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expired"], 2) # Memory and disk copies
+
+    def test_size_eviction(self):
+        cache = self.make_cache()
+        for i in range(5):
+            with patch('llm_cache.time.time', return_value=1000.0 + i):
+                cache.set(f"key{i}", f"reply{i}")
+        self.assertEqual(cache.stats()["memory_entries"], 2)
+        self.assertEqual(cache.stats()["disk_evictions"], 2)
+        fresh = self.make_cache()
+        with patch('llm_cache.time.time', return_value=1010.0):
+            self.assertIsNone(fresh.get("key0"))
+            self.assertEqual(fresh.get("key4"), "reply4")
+
+    def test_cached_chat_completion(self):
+        cache = self.make_cache()
+        client = MagicMock()
+        client.chat.completions.create.return_value.choices[0].message.content = "not json"
+        request = {"model": "gpt", "messages": [{"role": "user", "content": "hi"}], "temperature": 0, "max_tokens": 10}
+
+        with patch('llm_cache.LLM_CACHE', cache):
+            # Responses failing validation are not stored.
+            cached_chat_completion(client, validate=lambda text: text.startswith("{"), **request)
+            cached_chat_completion(client, validate=lambda text: text.startswith("{"), **request)
+            self.assertEqual(client.chat.completions.create.call_count, 2)
+
+            cached_chat_completion(client, **request)
+            cached_chat_completion(client, **request)
+            self.assertEqual(client.chat.completions.create.call_count, 3)
+
+            cached_chat_completion(client, use_cache=False, **request)
+            self.assertEqual(client.chat.completions.create.call_count, 4)
+
+    def test_memory_hits_do_not_wait_for_the_disk_tier(self):
+        cache = self.make_cache()
+        cache.set("a", "reply")
+        other = self.make_cache()
+        with cache._disk_lock:
+            # A disk read of another key would block here; a memory hit returns at once.
+            self.assertEqual(cache.get("a"), "reply")
+            reader = threading.Thread(target=cache.get, args=("b",))
+            reader.start()
+            reader.join(0.2)
+            self.assertTrue(reader.is_alive())
+            self.assertEqual(cache.get("a"), "reply")
+        reader.join(5)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(other.get("a"), "reply")
+
+    def test_async_tiers_run_off_the_event_loop(self):
+        cache = self.make_cache()
+        disk_threads = []
+        for name in ("_disk_get", "_disk_set"):
+            method = getattr(cache, name)
+            def record(*args, method=method):
+                disk_threads.append(threading.get_ident())
+                return method(*args)
+            setattr(cache, name, record)
+
+        async def scenario():
+            loop_thread = threading.get_ident()
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(ticker())
+            with cache._disk_lock:
+                # The loop keeps running while the SQLite tier is held by another writer.
+                lookup = asyncio.create_task(cache.aget("a"))
+                await asyncio.sleep(0.05)
+                self.assertFalse(lookup.done())
+                self.assertGreater(len(ticks), 10)
+            self.assertIsNone(await lookup)
+            await cache.aset("a", "reply")
+            self.assertEqual(await cache.aget("a"), "reply")
+            task.cancel()
+            return loop_thread
+
+        loop_thread = asyncio.run(scenario())
+        self.assertEqual(len(disk_threads), 2) # The memory hit never reaches the disk tier
+        self.assertNotIn(loop_thread, disk_threads)
+        self.assertEqual(self.make_cache().get("a"), "reply")
+
+    def test_async_cached_chat_completion(self):
+        cache = self.make_cache()
+        client = MagicMock()
+        completion = MagicMock()
+        completion.choices[0].message.content = "reply"
+        client.chat.completions.create = AsyncMock(return_value=completion)
+        request = {"model": "gpt", "messages": [{"role": "user", "content": "hi"}], "temperature": 0, "max_tokens": 10}
+
+        with patch('llm_cache.LLM_CACHE', cache):
+            self.assertEqual(asyncio.run(async_cached_chat_completion(client, **request)), "reply")
+            self.assertEqual(asyncio.run(async_cached_chat_completion(client, **request)), "reply")
+        self.assertEqual(client.chat.completions.create.await_count, 1)
+        self.assertEqual(cache.stats()["memory_hits"], 1)
+        self.assertEqual(self.make_cache().get(make_cache_key(request)), "reply")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import llm_client
+
+
+class TestPooledClient(unittest.TestCase):
+    """Tests for the process-wide AzureOpenAI client factory."""
+
+    def setUp(self):
+        llm_client._reset_after_fork()
+
+    @patch('llm_client.AzureOpenAI')
+    def test_client_is_reused(self, mock_azure_openai):
+        first = llm_client.get_client("key", "https://example", "2024-02-01")
+        second = llm_client.get_client("key", "https://example", "2024-02-01")
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_azure_openai.call_count, 1)
+        stats = llm_client.get_client_stats()
+        self.assertEqual(stats["clients_created"], 1)
+        self.assertEqual(stats["client_reuses"], 1)
+
+    @patch('llm_client.AzureOpenAI')
+    def test_client_rebuilt_on_config_change(self, mock_azure_openai):
+        llm_client.get_client("key", "https://example", "2024-02-01")
+        llm_client.get_client("other-key", "https://example", "2024-02-01")
+        self.assertEqual(mock_azure_openai.call_count, 2)
+
+    @patch('llm_client.AzureOpenAI')
+    def test_client_rebuilt_in_new_process(self, mock_azure_openai):
+        llm_client.get_client("key", "https://example", "2024-02-01")
+        with patch('llm_client.os.getpid', return_value=-1):
+            llm_client.get_client("key", "https://example", "2024-02-01")
+        self.assertEqual(mock_azure_openai.call_count, 2)
+
+
+def make_async_clients(*args, **kwargs):
+    client = MagicMock()
+    client.close = AsyncMock()
+    return client
+
+
+class TestAsyncClient(unittest.TestCase):
+    """Tests for the per-loop AsyncAzureOpenAI client factory."""
+
+    def setUp(self):
+        llm_client._reset_after_fork()
+
+    async def get(self, api_key="key"):
+        client = llm_client.get_async_client(api_key, "https://example", "2024-02-01")
+        await asyncio.sleep(0) # lets a scheduled close of the previous client run
+        return client
+
+    @patch('llm_client.AsyncAzureOpenAI', side_effect=make_async_clients)
+    def test_client_is_reused_on_the_same_loop(self, mock_async_azure_openai):
+        async def twice():
+            return await self.get(), await self.get()
+
+        first, second = asyncio.run(twice())
+        self.assertIs(first, second)
+        first.close.assert_not_awaited()
+
+    @patch('llm_client.AsyncAzureOpenAI', side_effect=make_async_clients)
+    def test_replaced_client_is_closed_on_a_new_loop(self, mock_async_azure_openai):
+        first = asyncio.run(self.get())
+        second = asyncio.run(self.get())
+
+        self.assertIsNot(first, second)
+        first.close.assert_awaited_once()
+        second.close.assert_not_awaited()
+        self.assertEqual(llm_client.get_client_stats()["async_clients_closed"], 1)
+
+    @patch('llm_client.AsyncAzureOpenAI', side_effect=make_async_clients)
+    def test_replaced_client_is_closed_on_config_change(self, mock_async_azure_openai):
+        async def change():
+            return await self.get(), await self.get("other-key")
+
+        first, second = asyncio.run(change())
+        first.close.assert_awaited_once()
+
+    @patch('llm_client.AsyncAzureOpenAI', side_effect=make_async_clients)
+    def test_inherited_client_is_not_closed(self, mock_async_azure_openai):
+        first = asyncio.run(self.get())
+        with patch('llm_client.os.getpid', return_value=-1):
+            asyncio.run(self.get())
+        first.close.assert_not_awaited()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -44,7 +44,8 @@ class TestAutomatedEvaluation(unittest.TestCase):
             print(f"ERROR: Failed to load golden dataset or RAG manager: {e}. Tests will be skipped.")
 
     @unittest.skipIf(not golden_dataset, "Skipping tests because golden dataset is empty or not found.")
-    @patch('main.AzureOpenAI')
+    @patch('llm_client.AzureOpenAI')
+    @patch('main.SUMMARY_EXECUTION_MODE', 'sequential') # The mocked responses below are returned in call order
     def test_all_queries_from_golden_dataset(self, mock_azure_openai):
         """
         Tests each query in the golden dataset, simulating the full application flow.
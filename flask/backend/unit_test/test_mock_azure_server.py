@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import httpx
+from openai import AsyncAzureOpenAI, RateLimitError
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+import mock_azure_server
+from mock_azure_server import application, configure, MOCK_SETTINGS
+
+
+def make_client(max_retries=0):
+    """An AsyncAzureOpenAI client wired to the mock server in-process."""
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=application))
+    return AsyncAzureOpenAI(
+        api_key="mock", azure_endpoint="http://mock-azure", api_version="2024-06-01",
+        http_client=http_client, max_retries=max_retries,
+    )
+
+
+class TestMockAzureServer(unittest.TestCase):
+    """Tests for the local Azure OpenAI stand-in."""
+
+    def setUp(self):
+        saved = dict(MOCK_SETTINGS)
+        self.addCleanup(configure, **saved)
+        configure(latency_distribution="fixed", latency_ms=0, tokens_per_second=0,
+                  error_rate=0, rate_limit_rate=0, malformed_json_rate=0, seed="0")
+
+    def test_step_reply_fits_json_format(self):
+        messages = main.build_step_messages(main.SYSTEM_PROMPTS["pedagogy"]["persona"], "", "Use VR")
+
+        async def run():
+            completion = await make_client().chat.completions.create(model="gpt-4o", messages=messages)
+            return completion.choices[0].message.content
+
+        reply = json.loads(asyncio.run(run()))
+        self.assertEqual(set(reply), {"explanation", "follow_up_question", "new_options"})
+        self.assertTrue(2 <= len(reply["new_options"]) <= 3)
+
+    def test_streaming(self):
+        messages = main.build_proposal_messages("**Objective**:\n1. VR\n\n", "Synthesize")
+
+        async def run():
+            stream = await make_client().chat.completions.create(model="gpt-4o", messages=messages, stream=True)
+            return "".join([chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices])
+
+        self.assertTrue(asyncio.run(run()).startswith("# Project Proposal"))
+
+    def test_rate_limit_and_malformed_json(self):
+        configure(rate_limit_rate=1)
+        messages = [{"role": "user", "content": "hi"}]
+        with self.assertRaises(RateLimitError):
+            asyncio.run(make_client().chat.completions.create(model="gpt-4o", messages=messages))
+
+        configure(rate_limit_rate=0, malformed_json_rate=1)
+        messages = main.build_step_messages(main.SYSTEM_PROMPTS["objective"]["persona"], "", "VR")
+
+        async def run():
+            completion = await make_client().chat.completions.create(model="gpt-4o", messages=messages)
+            return completion.choices[0].message.content
+
+        with self.assertRaises(json.JSONDecodeError):
+            json.loads(asyncio.run(run()))
+        self.assertGreaterEqual(mock_azure_server.get_mock_stats()["malformed"], 1)
+
+    def test_full_reply_against_mock(self):
+        with patch('main.get_async_azure_client', side_effect=lambda: make_client()), \
+                patch('main.AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4o'), \
+                patch('main.rag_manager', None), patch('llm_cache.LLM_CACHE.enabled', False):
+            response_str, summary_array = asyncio.run(main.get_openai_reply_async("I want VR", "objective", {"objective": ""}))
+
+        self.assertEqual(json.loads(response_str)["type"], "summary_and_options")
+        self.assertEqual(summary_array["objective"], "1. I want VR")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from rag_manifest import (
+    hash_file, make_chunk_id, new_manifest, load_manifest, save_manifest, plan_update, stale_chunk_ids
+)
+
+SETTINGS = {"model": "all-MiniLM-L6-v2", "chunk_size": 1000, "chunk_overlap": 200}
+
+
+class TestRagManifest(unittest.TestCase):
+    """Tests for the incremental rebuild planning of rag_builder.py."""
+
+    def make_manifest(self):
+        manifest = new_manifest(SETTINGS)
+        manifest["files"] = {
+            "faq.docx": {"sha256": "aaa", "chunk_ids": ["f1", "f2"]},
+            "guideline.docx": {"sha256": "bbb", "chunk_ids": ["g1"]},
+            "old form.docx": {"sha256": "ccc", "chunk_ids": ["o1", "o2", "o3"]},
+        }
+        return manifest
+
+    def test_incremental_plan(self):
+        manifest = self.make_manifest()
+        current = {"faq.docx": "aaa", "guideline.docx": "b22", "new form.docx": "ddd"}
+
+        plan = plan_update(current, manifest, SETTINGS)
+
+        self.assertFalse(plan["full_rebuild"])
+        self.assertEqual(plan["added"], ["new form.docx"])
+        self.assertEqual(plan["changed"], ["guideline.docx"])
+        self.assertEqual(plan["deleted"], ["old form.docx"])
+        self.assertEqual(plan["unchanged"], ["faq.docx"])
+        self.assertEqual(stale_chunk_ids(manifest, plan), ["g1", "o1", "o2", "o3"])
+
+    def test_full_rebuild_without_manifest_or_on_new_settings(self):
+        current = {"faq.docx": "aaa"}
+        for manifest, settings in ((None, SETTINGS), (self.make_manifest(), dict(SETTINGS, chunk_size=500))):
+            plan = plan_update(current, manifest, settings)
+            self.assertTrue(plan["full_rebuild"])
+            self.assertEqual(plan["added"], ["faq.docx"])
+            self.assertEqual(stale_chunk_ids(manifest, plan), [])
+
+    def test_chunk_ids_depend_on_content_and_position(self):
+        chunk_id = make_chunk_id("faq.docx", "aaa", 0)
+        self.assertEqual(chunk_id, make_chunk_id("faq.docx", "aaa", 0))
+        self.assertNotEqual(chunk_id, make_chunk_id("faq.docx", "aaa", 1))
+        self.assertNotEqual(chunk_id, make_chunk_id("faq.docx", "abc", 0))
+        self.assertNotEqual(chunk_id, make_chunk_id("guideline.docx", "aaa", 0))
+
+    def test_manifest_and_hash_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertIsNone(load_manifest(tmp_dir))
+            save_manifest(tmp_dir, self.make_manifest())
+            self.assertEqual(load_manifest(tmp_dir), self.make_manifest())
+            self.assertEqual(os.listdir(tmp_dir), ["manifest.json"])
+
+            path = os.path.join(tmp_dir, "a.docx")
+            with open(path, "wb") as f:
+                f.write(b"content")
+            first = hash_file(path, block_size=3)
+            with open(path, "wb") as f:
+                f.write(b"content changed")
+            self.assertNotEqual(first, hash_file(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
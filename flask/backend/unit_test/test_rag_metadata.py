@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from rag_metadata import (
+    tags_for, chunk_metadata, split_sections, iter_sections, retrieval_spec, build_chroma_where, matches_spec, tag_field, GENERAL_TAG
+)
+from prompts import SYSTEM_PROMPTS
+
+
+class TestChunkMetadata(unittest.TestCase):
+    """Tests for tagging chunks and splitting documents into sections."""
+
+    def test_tags_from_heading_path(self):
+        self.assertEqual(tags_for("Project Evaluation > Impact Measures", "guide.docx"), ["evaluation"])
+        self.assertEqual(tags_for("Intended Learning Outcomes", "guide.docx"), ["outcomes"])
+        self.assertEqual(tags_for("Application > Referees", "guide.docx"), [GENERAL_TAG])
+
+    def test_tags_match_whole_words(self):
+        # "ilo" is in "pilot", "aim" in "claim" and "need" in "needle": none of them is a keyword.
+        self.assertEqual(tags_for("Pilot Claims > Needle Exchange", "guide.docx"), [GENERAL_TAG])
+        self.assertEqual(tags_for("Intended ILOs", "guide.docx"), ["outcomes"])
+        self.assertEqual(tags_for("Pedagogical Approach", "guide.docx"), ["pedagogy"])
+
+    def test_tags_fall_back_to_source_name(self):
+        self.assertEqual(tags_for("", "evaluation_examples.docx"), ["evaluation"])
+
+    def test_chunk_metadata_has_scalar_tag_fields(self):
+        metadata = chunk_metadata("guide.docx", "Budget", 3, 1)
+        self.assertEqual(metadata["tags"], "development")
+        self.assertIs(metadata[tag_field("development")], True)
+        self.assertEqual((metadata["source"], metadata["position"], metadata["section"]), ("guide.docx", 3, 1))
+        self.assertTrue(all(isinstance(value, (str, int, bool)) for value in metadata.values()))
+
+    def test_split_sections_tracks_heading_path(self):
+        sections = split_sections([
+            ("Normal", "Preamble."),
+            ("Title", "Guide"),
+            ("Heading 1", "Evaluation"),
+            ("Normal", "Collect feedback."),
+            ("Heading 2", "Surveys"),
+            ("Normal", "Use pre/post surveys."),
+            ("Heading 1", "Budget"),
+            ("Heading 2", "   "),
+            ("Normal", "Helpers."),
+        ])
+        self.assertEqual([path for path, _ in sections], [
+            "", "Guide > Evaluation", "Guide > Evaluation > Surveys", "Guide > Budget",
+        ])
+        self.assertEqual(sections[1][1], "Collect feedback.\n")
+        self.assertEqual(sections[3][1], "Helpers.\n") # A blank heading does not open a level
+
+    def test_sections_stream_and_split_at_max_chars(self):
+        read = []
+
+        def paragraphs():
+            for i in range(10):
+                read.append(i)
+                yield "Normal", f"Paragraph {i} of a document without headings."
+
+        sections = iter_sections(paragraphs(), max_chars=100)
+        heading_path, text = next(sections)
+        self.assertEqual((heading_path, text.count("\n")), ("", 3))
+        self.assertEqual(read, [0, 1, 2]) # The rest of the document is not read yet
+        self.assertEqual([text.count("\n") for _, text in sections], [3, 3, 1])
+
+    def test_page_metadata(self):
+        self.assertEqual(chunk_metadata("template.pdf", "Budget", 0, 0, page=7)["page"], 7)
+        self.assertNotIn("page", chunk_metadata("guide.docx", "Budget", 0, 0))
+
+
+class TestRetrievalSpec(unittest.TestCase):
+    """Tests for the purpose "retrieval" declarations and the filters built from them."""
+
+    def test_every_step_purpose_declares_tags(self):
+        for purpose, config in SYSTEM_PROMPTS.items():
+            spec = retrieval_spec(config)
+            if purpose == "integrator":
+                self.assertIsNone(spec)
+            else:
+                self.assertIn(purpose, spec["tags"])
+
+    def test_empty_declaration_means_no_filter(self):
+        self.assertIsNone(retrieval_spec({}))
+        self.assertIsNone(retrieval_spec({"retrieval": {"tags": []}}))
+        self.assertIsNone(build_chroma_where(None))
+
+    def test_chroma_where(self):
+        self.assertEqual(build_chroma_where(retrieval_spec({"retrieval": {"tags": ["evaluation"]}})), {"tag_evaluation": True})
+        self.assertEqual(
+            build_chroma_where(retrieval_spec({"retrieval": {"tags": ["general", "evaluation"], "sources": ["a.docx"]}})),
+            {"$or": [{"tag_evaluation": True}, {"tag_general": True}, {"source": {"$in": ["a.docx"]}}]},
+        )
+
+    def test_matches_spec(self):
+        spec = retrieval_spec({"retrieval": {"tags": ["evaluation"], "sources": ["a.docx"]}})
+        self.assertTrue(matches_spec(chunk_metadata("b.docx", "Evaluation", 0, 0), spec))
+        self.assertTrue(matches_spec(chunk_metadata("a.docx", "Budget", 0, 0), spec))
+        self.assertFalse(matches_spec(chunk_metadata("b.docx", "Budget", 0, 0), spec))
+        self.assertFalse(matches_spec(None, spec))
+        self.assertTrue(matches_spec(None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
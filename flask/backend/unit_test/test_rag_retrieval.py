@@ -0,0 +1,366 @@
+import unittest
+import os
+import sys
+import re
+import zlib
+import tempfile
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+from embedding_cache import QueryEmbeddingCache
+from vector_index import NumpyVectorIndex, write_vector_index
+from keyword_index import KeywordIndex, write_keyword_index
+from rag_metadata import chunk_metadata, tag_field
+
+CHUNKS = [
+    "The proposal document has a maximum length of 15 pages, excluding the appendices.",
+    "Two reference letters are required, one from a direct supervisor.",
+    "Learning outcomes will be measured using a project rubric and pre/post-tests.",
+    "The budget may include student helpers and equipment.",
+    "Evaluation should collect student feedback through surveys and focus groups.",
+    "Projects must be completed within two years of approval.",
+]
+
+# Heading paths of CHUNKS, as rag_builder.py would record them.
+HEADINGS = [
+    "Application > Format",
+    "Application > Referees",
+    "Evaluation > Measuring Outcomes",
+    "Development > Budget",
+    "Evaluation > Student Feedback",
+    "Implementation > Timeline",
+]
+METADATAS = [chunk_metadata("guide.docx", heading, i, i) for i, heading in enumerate(HEADINGS)]
+
+QUERIES = [
+    "What is the maximum number of pages for the proposal?",
+    "How many reference letters are required?",
+    "How will the outcomes be measured?",
+    "What is the maximum number of pages for the proposal?",
+]
+
+
+class HashingEmbeddings:
+    """Deterministic bag-of-words embedding model standing in for MiniLM; counts its forward passes."""
+    dimensions = 64
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % self.dimensions] += 1.0
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.tolist()
+
+
+def matches_where(metadata, where):
+    """The subset of Chroma's `where` syntax that build_chroma_where produces."""
+    if where is None:
+        return True
+    if "$or" in where:
+        return any(matches_where(metadata, clause) for clause in where["$or"])
+    (field, condition), = where.items()
+    if isinstance(condition, dict):
+        return metadata.get(field) in condition["$in"]
+    return metadata.get(field) == condition
+
+
+class ExactCollection:
+    """Stands in for the Chroma collection: exact squared-L2 search over CHUNKS."""
+    def __init__(self, embeddings, chunks, metadatas=None):
+        self.chunks = chunks
+        self.metadatas = metadatas or [{} for _ in chunks]
+        self.matrix = np.array(embeddings.embed_documents(chunks), dtype=np.float32)
+        self.query_calls = 0
+        self.wheres = []
+
+    def query(self, query_embeddings, n_results, include, where=None):
+        self.query_calls += 1
+        self.wheres.append(where)
+        queries = np.array(query_embeddings, dtype=np.float32)
+        distances = ((queries[:, None, :] - self.matrix[None, :, :]) ** 2).sum(axis=2)
+        excluded = [not matches_where(metadata, where) for metadata in self.metadatas]
+        distances[:, excluded] = np.inf
+        order = np.argsort(distances, axis=1, kind="stable")[:, :n_results]
+        order = [[i for i in row if not excluded[i]] for row in order]
+        return {
+            "documents": [[self.chunks[i] for i in row] for row in order],
+            "distances": [[float(distances[q, i]) for i in row] for q, row in enumerate(order)],
+        }
+
+
+def make_manager(db_dir, chunks=CHUNKS, k=2, backend="chroma", metadatas=None):
+    """
+    Returns a loaded RAG_CONTEXT_MANAGER backed by HashingEmbeddings and either ExactCollection
+    ("chroma") or a NumpyVectorIndex written to db_dir ("numpy").
+    """
+    manager = main.RAG_CONTEXT_MANAGER(db_dir, k=k, backend=backend)
+    manager.embeddings_model = HashingEmbeddings()
+    if backend == "numpy":
+        write_vector_index(
+            manager.vector_index_path, [str(i) for i in range(len(chunks))], chunks,
+            HashingEmbeddings().embed_documents(chunks), manager.embedding_model_name, metadatas=metadatas
+        )
+        manager.vector_index = NumpyVectorIndex(manager.vector_index_path)
+    else:
+        manager.vector_store = type("FakeChroma", (), {})()
+        manager.vector_store._collection = ExactCollection(HashingEmbeddings(), chunks, metadatas)
+    manager._ready.set()
+    return manager
+
+
+class TestBatchedRetrieval(unittest.TestCase):
+    """Tests for RAG_CONTEXT_MANAGER.get_relevant_chunks_batch."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.db_dir.cleanup)
+        patcher = patch('main.QUERY_EMBEDDING_CACHE', QueryEmbeddingCache(max_entries=64))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_matches_single_queries(self):
+        batch_results = make_manager(self.db_dir.name).get_relevant_chunks_batch(QUERIES)
+
+        main.QUERY_EMBEDDING_CACHE.clear()
+        single = make_manager(self.db_dir.name)
+        single_results = [single.get_relevant_chunks(query) for query in QUERIES]
+
+        self.assertEqual(batch_results, single_results)
+        self.assertEqual(batch_results[0][0], CHUNKS[0])
+        self.assertEqual(single.get_relevant_context_batch(QUERIES[:1]), [single.get_relevant_context(QUERIES[0])])
+
+    def test_one_forward_pass_and_one_search(self):
+        manager = make_manager(self.db_dir.name)
+        manager.get_relevant_chunks_batch(QUERIES)
+
+        # The repeated query is embedded once, in the same pass as the others.
+        self.assertEqual(len(manager.embeddings_model.batches), 1)
+        self.assertEqual(len(manager.embeddings_model.batches[0]), 3)
+        self.assertEqual(manager.vector_store._collection.query_calls, 1)
+
+        manager.get_relevant_chunks_batch(QUERIES)
+        self.assertEqual(len(manager.embeddings_model.batches), 1) # All cached now
+
+    def test_batch_k_and_empty_input(self):
+        manager = make_manager(self.db_dir.name)
+        self.assertEqual(manager.get_relevant_chunks_batch([]), [])
+        self.assertEqual([len(chunks) for chunks in manager.get_relevant_chunks_batch(QUERIES, k=3)], [3, 3, 3, 3])
+
+
+class TestNumpyBackend(unittest.TestCase):
+    """Tests for the "numpy" retriever backend of RAG_CONTEXT_MANAGER."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.db_dir.cleanup)
+        patcher = patch('main.QUERY_EMBEDDING_CACHE', QueryEmbeddingCache(max_entries=64))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_results_as_exact_chroma_search(self):
+        numpy_results = make_manager(self.db_dir.name, k=3, backend="numpy").get_relevant_chunks_batch(QUERIES)
+        chroma_results = make_manager(self.db_dir.name, k=3).get_relevant_chunks_batch(QUERIES)
+        self.assertEqual(numpy_results, chroma_results)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            main.RAG_CONTEXT_MANAGER(self.db_dir.name, backend="faiss")
+
+    def test_index_built_with_another_model_is_rejected(self):
+        write_vector_index(os.path.join(self.db_dir.name, 'numpy_index'), ["0"], ["chunk"], [[1.0, 0.0]], "other-model")
+        manager = main.RAG_CONTEXT_MANAGER(self.db_dir.name, backend="numpy")
+        with patch.dict(sys.modules, {"langchain_huggingface": MagicMock(), "langchain_huggingface.embeddings": MagicMock()}):
+            with self.assertRaises(ValueError):
+                manager.load()
+        self.assertFalse(manager.ready)
+
+
+class TestPurposeFilteredRetrieval(unittest.TestCase):
+    """Tests for searching only the chunks a purpose declares under "retrieval"."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.db_dir.cleanup)
+        patcher = patch('main.QUERY_EMBEDDING_CACHE', QueryEmbeddingCache(max_entries=64))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_purpose_only_searches_its_tags(self):
+        query = "Can the budget include student helpers and equipment?"
+        for backend in ("chroma", "numpy"):
+            with self.subTest(backend=backend):
+                manager = make_manager(self.db_dir.name, k=3, backend=backend, metadatas=METADATAS)
+                self.assertEqual(manager.get_relevant_chunks(query)[0], CHUNKS[3])
+
+                # "evaluation" searches the evaluation and general chunks only, so the budget chunk is out.
+                chunks = manager.get_relevant_chunks(query, purpose="evaluation")
+                self.assertEqual(len(chunks), 3)
+                self.assertTrue(set(chunks) <= {CHUNKS[0], CHUNKS[1], CHUNKS[2], CHUNKS[4]})
+                self.assertEqual(manager.get_relevant_chunks(query, purpose="development")[0], CHUNKS[3])
+                self.assertEqual(manager.stats()["filtered_searches"], 2)
+                self.assertEqual(manager.stats()["filter_fallbacks"], 0)
+
+    def test_filtered_results_match_between_backends(self):
+        numpy_results = make_manager(self.db_dir.name, k=2, backend="numpy", metadatas=METADATAS).get_relevant_chunks_batch(QUERIES, purpose="evaluation")
+        chroma_results = make_manager(self.db_dir.name, k=2, metadatas=METADATAS).get_relevant_chunks_batch(QUERIES, purpose="evaluation")
+        self.assertEqual(numpy_results, chroma_results)
+
+    def test_store_without_metadata_falls_back_to_everything(self):
+        for backend in ("chroma", "numpy"):
+            with self.subTest(backend=backend):
+                manager = make_manager(self.db_dir.name, k=2, backend=backend)
+                chunks = manager.get_relevant_chunks(QUERIES[0], purpose="evaluation")
+                self.assertEqual(chunks[0], CHUNKS[0])
+                self.assertEqual(manager.stats()["filter_fallbacks"], 1)
+
+    def test_no_purpose_or_filters_disabled_searches_everything(self):
+        manager = make_manager(self.db_dir.name, metadatas=METADATAS)
+        self.assertEqual(manager.get_relevant_chunks(QUERIES[0])[0], CHUNKS[0])
+        self.assertEqual(manager.get_relevant_chunks(QUERIES[0], purpose="integrator")[0], CHUNKS[0])
+        with patch('main.RAG_PURPOSE_FILTERS', False):
+            self.assertEqual(manager.get_relevant_chunks(QUERIES[0], purpose="evaluation")[0], CHUNKS[0])
+        self.assertEqual(manager.vector_store._collection.wheres, [None, None, None])
+        self.assertEqual(manager.stats()["filtered_searches"], 0)
+
+
+class TestHybridRetrieval(unittest.TestCase):
+    """Tests for fusing the vector hits with BM25 keyword hits."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.db_dir.cleanup)
+        patcher = patch('main.QUERY_EMBEDDING_CACHE', QueryEmbeddingCache(max_entries=64))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_hybrid_manager(self, backend="chroma", k=2, metadatas=None):
+        manager = make_manager(self.db_dir.name, k=k, backend=backend, metadatas=metadatas)
+        write_keyword_index(manager.keyword_index_path, [str(i) for i in range(len(CHUNKS))], CHUNKS, metadatas)
+        manager.keyword_index = KeywordIndex(manager.keyword_index_path)
+        return manager
+
+    def test_fuses_vector_and_keyword_rankings(self):
+        query = "What is the limit on pages?"
+        manager = self.make_hybrid_manager()
+        vector_hits = manager.search_by_vectors(manager.embed_queries([query]), main.RAG_HYBRID_CANDIDATES)[0]
+        keyword_hits = manager.keyword_index.search_texts([query], main.RAG_HYBRID_CANDIDATES)[0]
+
+        chunks = manager.get_relevant_chunks(query)
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks, main.reciprocal_rank_fusion([vector_hits, keyword_hits], 2, main.RAG_RRF_K))
+        self.assertEqual(keyword_hits, [CHUNKS[0]])
+        self.assertEqual(chunks[0], CHUNKS[0])
+        self.assertTrue(manager.stats()["hybrid"])
+
+    def test_strong_keyword_match_survives_min_score(self):
+        query = "What is the limit on pages?"
+        # The vector match alone is too weak for this min_score...
+        self.assertEqual(make_manager(self.db_dir.name).get_relevant_chunks(query, min_score=0.99), [])
+        # ...but the keyword search's best hit is in the fused results, so they are kept.
+        manager = self.make_hybrid_manager()
+        self.assertEqual(manager.get_relevant_chunks(query, min_score=0.99)[0], CHUNKS[0])
+        self.assertEqual(manager.get_relevant_chunks("zebra quantum harmonica", min_score=0.99), [])
+        stats = manager.stats()
+        self.assertEqual((stats["kept_by_keywords"], stats["below_min_score"]), (1, 1))
+
+    def test_both_backends_agree(self):
+        results = {
+            backend: self.make_hybrid_manager(backend, k=3).get_relevant_chunks_batch(QUERIES)
+            for backend in ("chroma", "numpy")
+        }
+        self.assertEqual(results["chroma"], results["numpy"])
+
+    def test_keyword_search_respects_purpose_filter(self):
+        manager = self.make_hybrid_manager(k=3, metadatas=METADATAS)
+        chunks = manager.get_relevant_chunks("budget student helpers equipment", purpose="evaluation")
+        self.assertNotIn(CHUNKS[3], chunks)
+        self.assertEqual(manager.stats()["filter_fallbacks"], 0)
+
+    def test_missing_keyword_index_stays_vector_only(self):
+        manager = main.RAG_CONTEXT_MANAGER(self.db_dir.name, backend="numpy")
+        write_vector_index(manager.vector_index_path, ["0"], ["chunk"], [[1.0, 0.0]], manager.embedding_model_name)
+        with patch.dict(sys.modules, {"langchain_huggingface": MagicMock(), "langchain_huggingface.embeddings": MagicMock()}), \
+                patch('main.load_warm_set'):
+            manager.load()
+        self.assertIsNone(manager.keyword_index)
+        self.assertFalse(manager.stats()["hybrid"])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class PagedCollection:
+    """Stands in for the Chroma collection read by the rag_builder.py exports; records each page."""
+    def __init__(self, ids, chunks, embeddings, metadatas):
+        self.rows = list(zip(ids, chunks, embeddings, metadatas))
+        self.limits = []
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include, limit, offset):
+        self.limits.append(limit)
+        page = self.rows[offset:offset + limit]
+        result = {"ids": [row[0] for row in page]}
+        for position, field in enumerate(["documents", "embeddings", "metadatas"], start=1):
+            if field in include:
+                result[field] = [row[position] for row in page]
+        return result
+
+
+class TestPagedExport(unittest.TestCase):
+    """The rag_builder.py exports read the store a page at a time and match a single write."""
+
+    def setUp(self):
+        # rag_builder.py imports the build-only langchain packages at module level.
+        stubs = {name: MagicMock() for name in (
+            "langchain", "langchain.text_splitter", "langchain_community", "langchain_community.vectorstores"
+        )}
+        with patch.dict(sys.modules, stubs):
+            sys.modules.pop("rag_builder", None)
+            import rag_builder
+        self.rag_builder = rag_builder
+        self.ids = [str(i) for i in range(len(CHUNKS))]
+        self.embeddings = HashingEmbeddings().embed_documents(CHUNKS)
+        self.store = type("FakeChroma", (), {})()
+        self.store._collection = PagedCollection(self.ids, CHUNKS, self.embeddings, METADATAS)
+
+    def read_files(self, index_dir):
+        return {
+            name: open(os.path.join(index_dir, name), "rb").read() for name in sorted(os.listdir(index_dir))
+        }
+
+    def test_vector_export_pages_through_the_store(self):
+        with tempfile.TemporaryDirectory() as tmp, patch("builtins.print"):
+            written = self.rag_builder.export_vector_index(self.store, os.path.join(tmp, "paged"), "int8", page_size=4)
+            write_vector_index(os.path.join(tmp, "single", "numpy_index"), self.ids, CHUNKS, self.embeddings,
+                               self.rag_builder.EMBEDDING_MODEL_NAME, dtype="int8", metadatas=METADATAS)
+            self.assertEqual(written, len(CHUNKS))
+            self.assertEqual(self.store._collection.limits, [4, 4])
+            self.assertEqual(self.read_files(os.path.join(tmp, "paged", "numpy_index")),
+                             self.read_files(os.path.join(tmp, "single", "numpy_index")))
+
+    def test_keyword_export_pages_through_the_store(self):
+        with tempfile.TemporaryDirectory() as tmp, patch("builtins.print"):
+            written = self.rag_builder.export_keyword_index(self.store, os.path.join(tmp, "paged"), page_size=4)
+            write_keyword_index(os.path.join(tmp, "single", "keyword_index"), self.ids, CHUNKS, metadatas=METADATAS)
+            self.assertEqual(written, len(CHUNKS))
+            self.assertEqual(self.store._collection.limits, [4, 4])
+            self.assertEqual(self.read_files(os.path.join(tmp, "paged", "keyword_index")),
+                             self.read_files(os.path.join(tmp, "single", "keyword_index")))
+            index = KeywordIndex(os.path.join(tmp, "paged", "keyword_index"))
+            self.assertEqual(index.search(["reference letters"], 1)[0][0][0], 1)
@@ -0,0 +1,134 @@
+import unittest
+import json
+import os
+import sys
+import time
+import types
+import tempfile
+import threading
+from unittest.mock import patch, MagicMock
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+from app import app
+from embedding_cache import QueryEmbeddingCache
+
+
+def make_fake_langchain(load_delay=0.0):
+    """
+    Returns (modules, constructed): stand-ins for the langchain modules RAG_CONTEXT_MANAGER
+    imports on load, and a list recording every embedding model created.
+    """
+    constructed = []
+
+    class FakeEmbeddings:
+        def __init__(self, model_name):
+            time.sleep(load_delay)
+            constructed.append(model_name)
+
+        def embed_documents(self, texts):
+            return [[float(len(text)), 1.0] for text in texts]
+
+    class FakeCollection:
+        def query(self, query_embeddings, n_results, include, where=None):
+            return {
+                "documents": [[f"chunk for a {int(vector[0])}-character query"] for vector in query_embeddings],
+                "distances": [[0.0] for _ in query_embeddings],
+            }
+
+    class FakeChroma:
+        def __init__(self, persist_directory, embedding_function):
+            self._collection = FakeCollection()
+
+    modules = {
+        "langchain_huggingface": types.ModuleType("langchain_huggingface"),
+        "langchain_huggingface.embeddings": types.SimpleNamespace(HuggingFaceEmbeddings=FakeEmbeddings),
+        "langchain_chroma": types.SimpleNamespace(Chroma=FakeChroma),
+    }
+    return modules, constructed
+
+
+class TestLazyRagLoading(unittest.TestCase):
+    """Tests for the deferred loading of the embedding model and vector store."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.db_dir.cleanup)
+        patchers = [
+            patch('main.load_warm_set'),
+            patch('main.QUERY_EMBEDDING_CACHE', QueryEmbeddingCache(max_entries=16)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_creating_the_manager_loads_nothing(self):
+        modules, constructed = make_fake_langchain()
+        with patch.dict(sys.modules, modules):
+            manager = main.RAG_CONTEXT_MANAGER(self.db_dir.name)
+            self.assertFalse(manager.ready)
+            self.assertEqual(constructed, [])
+
+            self.assertEqual(manager.get_relevant_context("pages"), "chunk for a 5-character query")
+            self.assertTrue(manager.ready)
+            self.assertEqual(constructed, ["all-MiniLM-L6-v2"])
+
+    def test_concurrent_first_use_loads_once(self):
+        modules, constructed = make_fake_langchain(load_delay=0.2)
+        with patch.dict(sys.modules, modules):
+            manager = main.RAG_CONTEXT_MANAGER(self.db_dir.name)
+            threads = [threading.Thread(target=manager.get_relevant_chunks, args=("pages",)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(constructed, ["all-MiniLM-L6-v2"])
+
+    def test_background_warmup_sets_ready(self):
+        modules, constructed = make_fake_langchain(load_delay=0.2)
+        with patch.dict(sys.modules, modules):
+            manager = main.RAG_CONTEXT_MANAGER(self.db_dir.name)
+            thread = manager.start_warmup()
+            self.assertIs(manager.start_warmup(), thread) # Only one warm-up per process
+            self.assertFalse(manager.ready)
+            thread.join()
+        self.assertTrue(manager.ready)
+        self.assertIsNotNone(manager.stats()["load_seconds"])
+
+    def test_failed_load_is_retried_on_next_use(self):
+        manager = main.RAG_CONTEXT_MANAGER(self.db_dir.name)
+        with patch.dict(sys.modules, {"langchain_huggingface": None, "langchain_huggingface.embeddings": None}):
+            with self.assertRaises(ImportError):
+                manager.load()
+        self.assertFalse(manager.ready)
+        self.assertIsNotNone(manager.stats()["load_error"])
+
+        modules, _ = make_fake_langchain()
+        with patch.dict(sys.modules, modules):
+            manager.load()
+        self.assertTrue(manager.ready)
+        self.assertIsNone(manager.stats()["load_error"])
+
+    def test_initial_question_does_not_wait_for_the_model(self):
+        manager = MagicMock()
+        manager.get_relevant_chunks.side_effect = AssertionError("retrieval is not needed")
+        with patch('main.rag_manager', manager):
+            response_str, _ = main.get_openai_reply("", "objective", {"objective": ""})
+        self.assertEqual(json.loads(response_str)["type"], "question")
+        manager.load.assert_not_called()
+
+    def test_ready_endpoint(self):
+        manager = MagicMock()
+        manager.stats.return_value = {"ready": False}
+        with patch('main.rag_manager', manager):
+            self.assertEqual(app.test_client().get('/api/ready').status_code, 503)
+            manager.stats.return_value = {"ready": True}
+            self.assertEqual(app.test_client().get('/api/ready').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import unittest
+import os
+import sys
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, script_dir)
+
+import main
+from prompts import SYSTEM_PROMPTS
+from embedding_cache import QueryEmbeddingCache
+from retrieval_planner import RetrievalPlanner, retrieves, min_score, query_similarity, RAG_MIN_SCORE
+from test_rag_retrieval import CHUNKS, make_manager
+
+QUESTION = "How many reference letters are required?"
+
+
+class TestRetrievalPlanner(unittest.TestCase):
+    """Tests for the skip/reuse decisions of RetrievalPlanner."""
+
+    def setUp(self):
+        self.planner = RetrievalPlanner(reuse_window_seconds=60, reuse_similarity=0.8, max_sessions=2)
+        self.config = SYSTEM_PROMPTS["outcomes"]
+
+    def test_purpose_settings(self):
+        self.assertFalse(retrieves(SYSTEM_PROMPTS["integrator"]))
+        self.assertTrue(retrieves(self.config))
+        self.assertEqual(min_score(self.config), RAG_MIN_SCORE)
+        self.assertEqual(min_score({"retrieval": {"tags": ["general"], "min_score": 0.5}}), 0.5)
+        self.assertEqual(query_similarity("Reference letters?", "reference letter"), 1.0)
+        self.assertEqual(query_similarity("budget", "timeline"), 0.0)
+
+    def test_integrator_skips_retrieval(self):
+        self.assertEqual(self.planner.plan("integrator", SYSTEM_PROMPTS["integrator"], "s1", QUESTION), ("skip", []))
+        self.assertEqual(self.planner.stats()["skipped_purpose"], 1)
+
+    def test_reuses_near_identical_follow_up_in_session(self):
+        self.assertEqual(self.planner.plan("outcomes", self.config, "s1", QUESTION), ("retrieve", None))
+        self.planner.remember("outcomes", "s1", QUESTION, ["chunk"])
+
+        self.assertEqual(self.planner.plan("outcomes", self.config, "s1", "How many reference letters are required"), ("reuse", ["chunk"]))
+        # Another session, another purpose or another question searches again.
+        self.assertEqual(self.planner.plan("outcomes", self.config, "s2", QUESTION)[0], "retrieve")
+        self.assertEqual(self.planner.plan("objective", self.config, "s1", QUESTION)[0], "retrieve")
+        self.assertEqual(self.planner.plan("outcomes", self.config, "s1", "What may the budget include?")[0], "retrieve")
+        # Without a session there is nothing to reuse.
+        self.planner.remember("outcomes", None, QUESTION, ["chunk"])
+        self.assertEqual(self.planner.plan("outcomes", self.config, None, QUESTION)[0], "retrieve")
+
+        stats = self.planner.stats()
+        self.assertEqual(stats["reused"], 1)
+        self.assertEqual(stats["retrieved"], 5)
+        self.assertEqual(stats["retrievals_skipped"], 1)
+
+    def test_reuse_expires_after_window(self):
+        with patch('retrieval_planner.time.monotonic', return_value=100.0):
+            self.planner.remember("outcomes", "s1", QUESTION, ["chunk"])
+        with patch('retrieval_planner.time.monotonic', return_value=161.0):
+            self.assertEqual(self.planner.plan("outcomes", self.config, "s1", QUESTION)[0], "retrieve")
+
+    def test_remembers_a_bounded_number_of_sessions(self):
+        for session_id in ("s1", "s2", "s3"):
+            self.planner.remember("outcomes", session_id, QUESTION, [session_id])
+        self.assertEqual(self.planner.stats()["remembered"], 2)
+        self.assertEqual(self.planner.plan("outcomes", self.config, "s1", QUESTION)[0], "retrieve")
+        self.assertEqual(self.planner.plan("outcomes", self.config, "s3", QUESTION), ("reuse", ["s3"]))
+
+
+class TestMinScore(unittest.TestCase):
+    """Tests for dropping weak matches in RAG_CONTEXT_MANAGER."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.db_dir.cleanup)
+        patcher = patch('main.QUERY_EMBEDDING_CACHE', QueryEmbeddingCache(max_entries=64))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_weak_matches_are_dropped_on_both_backends(self):
+        for backend in ("chroma", "numpy"):
+            with self.subTest(backend=backend):
+                manager = make_manager(self.db_dir.name, backend=backend)
+                self.assertEqual(manager.get_relevant_chunks(CHUNKS[1], min_score=0.9)[0], CHUNKS[1])
+                self.assertEqual(manager.get_relevant_chunks("zebra quantum harmonica", min_score=0.9), [])
+                self.assertEqual(len(manager.get_relevant_chunks("zebra quantum harmonica")), 2)
+                self.assertEqual(manager._stats["below_min_score"], 1)
+
+    def test_backends_report_the_same_similarity(self):
+        chroma = make_manager(self.db_dir.name)
+        numpy_manager = make_manager(self.db_dir.name, backend="numpy")
+        vectors = chroma.embed_queries([QUESTION, CHUNKS[4]])
+        chroma_texts, chroma_scores = chroma.search_vectors(vectors, 3)
+        numpy_texts, numpy_scores = numpy_manager.search_vectors(vectors, 3)
+
+        self.assertEqual(chroma_texts, numpy_texts)
+        for chroma_row, numpy_row in zip(chroma_scores, numpy_scores):
+            for chroma_score, numpy_score in zip(chroma_row, numpy_row):
+                self.assertAlmostEqual(chroma_score, numpy_score, places=5)
+        self.assertAlmostEqual(chroma_scores[1][0], 1.0, places=5)
+
+
+class TestPlannedRetrieval(unittest.TestCase):
+    """Tests for retrieve_reference_chunks, the retrieval step of the reply functions."""
+
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.db_dir.cleanup)
+        self.manager = make_manager(self.db_dir.name)
+        self.collection = self.manager.vector_store._collection
+        for target, value in (('main.QUERY_EMBEDDING_CACHE', QueryEmbeddingCache(max_entries=64)),
+                              ('main.rag_manager', self.manager),
+                              ('main.RETRIEVAL_PLANNER', RetrievalPlanner(reuse_window_seconds=60))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_integrator_does_not_search(self):
+        self.assertEqual(main.retrieve_reference_chunks("Synthesize the proposal.", "integrator", "s1"), [])
+        self.assertEqual(self.collection.query_calls, 0)
+
+    def test_follow_up_reuses_the_session_retrieval(self):
+        first = main.retrieve_reference_chunks(QUESTION, "objective", "s1")
+        searches = self.collection.query_calls
+        again = main.retrieve_reference_chunks(QUESTION + " ", "objective", "s1")
+        self.assertEqual(self.collection.query_calls, searches)
+        other_session = main.retrieve_reference_chunks(QUESTION, "objective", "s2")
+        self.assertEqual(self.collection.query_calls, 2 * searches)
+
+        self.assertEqual(first, again)
+        self.assertEqual(first, other_session)
+        self.assertEqual(main.RETRIEVAL_PLANNER.stats()["reused"], 1)
+
+    def test_async_matches_sync(self):
+        expected = self.manager.get_relevant_chunks(QUESTION, purpose="objective", min_score=RAG_MIN_SCORE)
+        self.assertEqual(asyncio.run(main.aretrieve_reference_chunks(QUESTION, "objective", "s1")), expected)
+        self.assertEqual(asyncio.run(main.aretrieve_reference_chunks("", "integrator", "s1")), [])
+
+    def test_no_knowledge_base(self):
+        with patch('main.rag_manager', None):
+            self.assertEqual(main.retrieve_reference_chunks(QUESTION, "objective", "s1"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import random
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, script_dir)
+
+import main
+from semantic_cache import SemanticResponseCache, summary_hash
+from bench_semantic_cache import pair_similarities, threshold_rates, suggest_threshold
+
+# Two phrasings of one question share a direction; the third question is orthogonal to them.
+VECTORS = {
+    "how long can the proposal be": [1.0, 0.0, 0.0],
+    "max pages for proposal": [0.96, 0.28, 0.0],
+    "who can apply": [0.0, 0.0, 1.0],
+}
+STEP_REPLY = json.dumps({
+    "explanation": "The proposal is limited to 5 pages.",
+    "follow_up_question": "Which section first?",
+    "new_options": ["Objectives"]
+})
+
+
+def make_completion(content):
+    """Builds a MagicMock shaped like a chat completion response."""
+    completion = MagicMock()
+    completion.choices[0].message.content = content
+    return completion
+
+
+def make_step_create(calls):
+    """A chat completions create() that answers the step reply and the summary agent."""
+    def create(**kwargs):
+        calls.append(kwargs)
+        if kwargs.get("stream"):
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = STEP_REPLY
+            return iter([chunk])
+        return make_completion("1. Proposal length" if kwargs["temperature"] == 0 else STEP_REPLY)
+    return create
+
+
+class TestSemanticResponseCache(unittest.TestCase):
+    """Tests for lookups, eviction and false-hit sampling of SemanticResponseCache."""
+
+    def setUp(self):
+        self.cache = SemanticResponseCache(threshold=0.9, max_entries=2, ttl_seconds=60, verify_rate=0)
+        self.partition = ("objective", summary_hash(""), "model")
+
+    def store(self, query, reply, partition=None):
+        lookup = self.cache.lookup(partition or self.partition, query, VECTORS[query])
+        self.cache.store(lookup, reply, reply)
+        return lookup
+
+    def test_similar_question_hits_in_the_same_partition(self):
+        self.store("how long can the proposal be", "5 pages")
+
+        hit = self.cache.lookup(self.partition, "max pages for proposal", VECTORS["max pages for proposal"])
+        self.assertEqual(hit.hit, "5 pages")
+        self.assertAlmostEqual(hit.similarity, 0.96, places=5)
+        self.assertIsNone(self.cache.lookup(self.partition, "who can apply", VECTORS["who can apply"]).hit)
+        # Another purpose or another summary state never shares the reply.
+        for partition in (("outcomes", summary_hash(""), "model"), ("objective", summary_hash("1. VR"), "model")):
+            self.assertIsNone(self.cache.lookup(partition, "max pages for proposal", VECTORS["max pages for proposal"]).hit)
+
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 4))
+        self.assertAlmostEqual(stats["hit_rate"], 0.2)
+
+    def test_summary_hash_ignores_whitespace(self):
+        self.assertEqual(summary_hash("1. VR\n2. Math "), summary_hash("1. VR 2. Math"))
+        self.assertNotEqual(summary_hash("1. VR"), summary_hash(""))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.store("how long can the proposal be", "5 pages")
+        self.store("who can apply", "Faculty")
+        self.cache.lookup(self.partition, "how long can the proposal be", VECTORS["how long can the proposal be"])
+        self.store("who can apply", "Faculty members", partition=("outcomes", summary_hash(""), "model"))
+
+        self.assertIsNone(self.cache.lookup(self.partition, "who can apply", VECTORS["who can apply"]).hit)
+        self.assertEqual(self.cache.lookup(self.partition, "max pages for proposal", VECTORS["max pages for proposal"]).hit, "5 pages")
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        with patch('semantic_cache.time.monotonic', return_value=100.0):
+            self.store("how long can the proposal be", "5 pages")
+        with patch('semantic_cache.time.monotonic', return_value=161.0):
+            self.assertIsNone(self.cache.lookup(self.partition, "max pages for proposal", VECTORS["max pages for proposal"]).hit)
+        self.assertEqual(self.cache.stats()["expired"], 1)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_sampled_hits_measure_false_hits(self):
+        cache = SemanticResponseCache(threshold=0.9, verify_rate=1.0, agreement=0.3, rng=random.Random(0))
+        lookup = cache.lookup(self.partition, "how long can the proposal be", VECTORS["how long can the proposal be"])
+        cache.store(lookup, "5 pages", "the proposal is limited to five pages")
+
+        agreeing = cache.lookup(self.partition, "max pages for proposal", VECTORS["max pages for proposal"])
+        self.assertIsNone(agreeing.hit)
+        cache.store(agreeing, "5 pages", "the proposal is limited to five pages in total")
+        disagreeing = cache.lookup(self.partition, "max pages for proposal", VECTORS["max pages for proposal"])
+        cache.store(disagreeing, "Faculty", "any full-time faculty member can apply")
+
+        stats = cache.stats()
+        self.assertEqual((stats["sampled_hits"], stats["verified"], stats["false_hits"]), (2, 2, 1))
+        self.assertEqual(stats["false_hit_rate"], 0.5)
+        self.assertEqual([sample["false_hit"] for sample in stats["recent_samples"]], [False, True])
+        self.assertEqual(stats["recent_samples"][0]["cached_query"], "how long can the proposal be")
+        # The entry that answered wrongly was replaced by the fresh reply.
+        cache.verify_rate = 0
+        self.assertEqual(cache.lookup(self.partition, "max pages for proposal", VECTORS["max pages for proposal"]).hit, "Faculty")
+        self.assertEqual(stats["entries"], 1)
+
+
+class TestThresholdCalibration(unittest.TestCase):
+    """Tests for the SEMANTIC_CACHE_THRESHOLD calibration of bench_semantic_cache.py."""
+
+    def test_pair_similarities(self):
+        model = MagicMock()
+        model.embed_documents.side_effect = lambda texts: [VECTORS[text] for text in texts]
+        scores = pair_similarities(model, [
+            ("how long can the proposal be", "max pages for proposal"),
+            ("how long can the proposal be", "who can apply"),
+        ])
+        self.assertAlmostEqual(scores[0], 0.96, places=5)
+        self.assertAlmostEqual(scores[1], 0.0, places=5)
+
+    def test_rates_and_suggested_threshold(self):
+        same, different = [0.97, 0.93, 0.81], [0.86, 0.62]
+        self.assertEqual(threshold_rates(same, different, 0.92), (2 / 3, 0.0))
+        self.assertEqual(threshold_rates(same, different, 0.80), (1.0, 0.5))
+        self.assertAlmostEqual(suggest_threshold(different), 0.87)
+        self.assertEqual(threshold_rates(same, different, suggest_threshold(different))[1], 0.0)
+
+
+class TestSemanticCacheInReplies(unittest.TestCase):
+    """Tests for serving rephrased step questions from SEMANTIC_CACHE in the reply functions."""
+
+    def setUp(self):
+        self.calls = []
+        self.client = MagicMock()
+        self.client.chat.completions.create.side_effect = make_step_create(self.calls)
+        self.manager = MagicMock(embedding_model_name="model")
+        self.manager.embed_query.side_effect = lambda query: np.array(VECTORS[query], dtype=np.float32)
+        self.cache = SemanticResponseCache(threshold=0.9, verify_rate=0)
+        patchers = [
+            patch('main.get_azure_client', return_value=self.client),
+            patch('main.rag_manager', self.manager),
+            patch('main.retrieve_reference_chunks', return_value=[]),
+            patch('main.SEMANTIC_CACHE', self.cache),
+            patch('main.SUMMARY_EXECUTION_MODE', 'sequential'),
+            patch('llm_cache.LLM_CACHE.enabled', False),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rephrased_question_skips_the_model(self):
+        first, first_summary = main.get_openai_reply("how long can the proposal be", "objective", {"objective": ""})
+        calls = len(self.calls)
+        second, second_summary = main.get_openai_reply("max pages for proposal", "objective", {"objective": ""})
+
+        self.assertEqual(len(self.calls), calls)
+        self.assertEqual(json.loads(second), json.loads(first))
+        self.assertEqual(second_summary, first_summary)
+        self.assertEqual(main.retrieve_reference_chunks.call_count, 1)
+        # With another summary, or with the caches bypassed, the model is asked again.
+        main.get_openai_reply("max pages for proposal", "objective", {"objective": "1. VR"})
+        main.get_openai_reply("max pages for proposal", "objective", {"objective": ""}, use_cache=False)
+        self.assertEqual(len(self.calls), 3 * calls)
+
+    def test_stream_and_async_hits(self):
+        main.get_openai_reply("how long can the proposal be", "objective", {"objective": ""})
+        calls = len(self.calls)
+
+        events = list(main.stream_openai_reply("max pages for proposal", "objective", {"objective": ""}))
+        self.assertEqual(events[0], ("token", {"text": "The proposal is limited to 5 pages."}))
+        self.assertEqual(events[-1][1]["options"], ["Objectives"])
+        with patch('main.get_async_azure_client', side_effect=AssertionError("the model is not needed")):
+            response_str, summary_array = asyncio.run(
+                main.get_openai_reply_async("max pages for proposal", "objective", {"objective": ""})
+            )
+        self.assertEqual(json.loads(response_str)["options"], ["Objectives"])
+        self.assertEqual(summary_array["objective"], "1. Proposal length")
+        self.assertEqual(len(self.calls), calls)
+        self.assertEqual(self.cache.stats()["hits"], 2)
+
+    def test_integrator_and_failed_embedding_are_not_cached(self):
+        self.assertIsNone(main.lookup_semantic_cache("Synthesize", "integrator", ""))
+        self.manager.embed_query.side_effect = RuntimeError("model not loaded")
+        response_str, _ = main.get_openai_reply("max pages for proposal", "objective", {"objective": ""})
+        self.assertEqual(json.loads(response_str)["type"], "summary_and_options")
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_lookup_does_not_load_the_model(self):
+        self.manager.ready = False
+        for action in ("skip", "reuse"):
+            self.assertIsNone(main.lookup_semantic_cache("max pages for proposal", "objective", "", action=action))
+        with patch('main.plan_retrieval', return_value=("reuse", [])):
+            main.get_openai_reply("max pages for proposal", "objective", {"objective": ""})
+        self.manager.embed_query.assert_not_called()
+        # A turn that searches loads the model anyway, so it may as well check the cache first.
+        self.assertIsNotNone(main.lookup_semantic_cache("max pages for proposal", "objective", "", action="retrieve"))
+        self.manager.ready = True
+        self.assertIsNotNone(main.lookup_semantic_cache("max pages for proposal", "objective", "", action="reuse"))
+
+
+if __name__ == '__main__':
+    unittest.main()
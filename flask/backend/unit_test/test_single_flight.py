@@ -0,0 +1,243 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import llm_cache
+from app import app
+from llm_cache import LLMResponseCache, cached_chat_completion, async_cached_chat_completion
+from single_flight import SingleFlight
+
+STEP_RESPONSE = json.dumps({"type": "summary_and_options", "summary": "VR can help.", "options": []})
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests for coalescing concurrent identical calls."""
+
+    def test_concurrent_calls_share_one_result(self):
+        flights = SingleFlight("test")
+        calls = []
+
+        def slow(value):
+            calls.append(value)
+            time.sleep(0.2)
+            return value * 2
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: flights.do("k", slow, 21), range(5)))
+
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats()["coalesced"], 4)
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    def test_error_is_shared_and_not_remembered(self):
+        flights = SingleFlight("test")
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("upstream down")
+
+        def follower():
+            started.wait()
+            return flights.do("k", failing)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader_future = executor.submit(flights.do, "k", failing)
+            follower_future = executor.submit(follower)
+            for future in (leader_future, follower_future):
+                with self.assertRaises(RuntimeError):
+                    future.result()
+
+        # The next call runs again instead of replaying the failure.
+        self.assertEqual(flights.do("k", lambda: "ok"), "ok")
+
+    def test_async_calls_share_one_result(self):
+        flights = SingleFlight("test")
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "reply"
+
+        async def run():
+            return await asyncio.gather(*(flights.ado("k", slow) for _ in range(10)))
+
+        self.assertEqual(asyncio.run(run()), ["reply"] * 10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats()["coalesced"], 9)
+
+    def test_follower_takes_over_when_the_leader_is_cancelled(self):
+        flights = SingleFlight("test")
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "reply"
+
+        async def run():
+            leader = asyncio.create_task(flights.ado("k", slow))
+            await asyncio.sleep(0.01)
+            followers = [asyncio.create_task(flights.ado("k", slow)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel() # e.g. the leader's client disconnected
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*followers)
+
+        self.assertEqual(asyncio.run(run()), ["reply"] * 3)
+        # One follower re-ran the call for the others.
+        self.assertEqual(len(calls), 2)
+        stats = flights.stats()
+        self.assertEqual((stats["abandoned"], stats["leaders"], stats["in_flight"]), (1, 2, 0))
+
+    def test_follower_runs_the_call_when_the_leader_hangs(self):
+        flights = SingleFlight("test", wait_timeout=0.05)
+        release = threading.Event()
+
+        def hung():
+            release.wait()
+            return "late"
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            leader = executor.submit(flights.do, "k", hung)
+            time.sleep(0.01)
+            self.assertEqual(flights.do("k", lambda: "fresh"), "fresh")
+            release.set()
+            self.assertEqual(leader.result(), "late")
+
+        async def hung_async():
+            await asyncio.sleep(1)
+            return "late"
+
+        async def fresh_async():
+            return "fresh"
+
+        async def run():
+            leader = asyncio.create_task(flights.ado("k", hung_async))
+            await asyncio.sleep(0.01)
+            result = await flights.ado("k", fresh_async)
+            leader.cancel()
+            return result
+
+        self.assertEqual(asyncio.run(run()), "fresh")
+        self.assertEqual(flights.stats()["wait_timeouts"], 2)
+
+
+class TestCoalescedRequests(unittest.TestCase):
+    """Tests for the per-session and global coalescing around get_openai_reply."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        cache = LLMResponseCache(os.path.join(self.tmp_dir.name, 'llm_cache.sqlite3'), 60, 10, 10)
+        patcher = patch('llm_cache.LLM_CACHE', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_identical_cacheable_prompts_make_one_upstream_call(self):
+        def create(**kwargs):
+            time.sleep(0.2)
+            completion = MagicMock()
+            completion.choices[0].message.content = "reply"
+            return completion
+
+        client = MagicMock()
+        client.chat.completions.create.side_effect = create
+        request = {"model": "gpt", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.5, "max_tokens": 10}
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: cached_chat_completion(client, **request), range(4)))
+
+        self.assertEqual(results, ["reply"] * 4)
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+
+    def test_async_identical_cacheable_prompts_make_one_upstream_call(self):
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            await asyncio.sleep(0.1)
+            completion = MagicMock()
+            completion.choices[0].message.content = "reply"
+            return completion
+
+        client = MagicMock()
+        client.chat.completions.create = create
+        request = {"model": "gpt", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.5, "max_tokens": 10}
+
+        async def run():
+            return await asyncio.gather(*(async_cached_chat_completion(client, **request) for _ in range(4)))
+
+        self.assertEqual(asyncio.run(run()), ["reply"] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_double_submit_in_one_session_is_coalesced(self):
+        def slow_reply(user_input, purpose, current_summary_array, use_cache=True, session_id=None):
+            time.sleep(0.2)
+            return STEP_RESPONSE, current_summary_array
+
+        with app.test_client() as first_client:
+            first_client.post('/api/chat', json={"userInput": "", "purpose": "objective"}) # Creates the session
+            cookie = first_client.get_cookie(app.config["SESSION_COOKIE_NAME"]).value
+
+            def submit(_):
+                with app.test_client() as http_client:
+                    http_client.set_cookie(app.config["SESSION_COOKIE_NAME"], cookie)
+                    return http_client.post('/api/chat', json={"userInput": "I want VR", "purpose": "objective"})
+
+            with patch('app.get_openai_reply', side_effect=slow_reply) as mock_reply:
+                with ThreadPoolExecutor(max_workers=3) as executor:
+                    responses = list(executor.map(submit, range(3)))
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(mock_reply.call_count, 1)
+
+    def test_chat_and_stream_requests_are_not_coalesced(self):
+        def slow_reply(user_input, purpose, current_summary_array, use_cache=True, session_id=None):
+            time.sleep(0.2)
+            return STEP_RESPONSE, current_summary_array
+
+        def slow_stream(user_input, purpose, current_summary_array, use_cache=True, session_id=None):
+            time.sleep(0.2)
+            yield "final", json.loads(STEP_RESPONSE)
+
+        with app.test_client() as first_client:
+            first_client.post('/api/chat', json={"userInput": "", "purpose": "objective"}) # Creates the session
+            cookie = first_client.get_cookie(app.config["SESSION_COOKIE_NAME"]).value
+
+            def submit(path):
+                with app.test_client() as http_client:
+                    http_client.set_cookie(app.config["SESSION_COOKIE_NAME"], cookie)
+                    response = http_client.post(path, json={"userInput": "I want VR", "purpose": "objective"})
+                    return response.status_code, response.get_data(as_text=True)
+
+            # The same turn sent to both endpoints at once, each started both ways round.
+            with patch('app.get_openai_reply', side_effect=slow_reply) as mock_reply, \
+                    patch('app.stream_openai_reply', side_effect=slow_stream) as mock_stream:
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    responses = list(executor.map(submit, ['/api/chat', '/api/chat/stream', '/api/chat/stream', '/api/chat']))
+
+        self.assertEqual([status for status, _ in responses], [200] * 4)
+        self.assertEqual(json.loads(responses[0][1])["summary"], "VR can help.")
+        self.assertIn('"summary": "VR can help."', responses[1][1])
+        self.assertEqual((mock_reply.call_count, mock_stream.call_count), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+import json
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+from app import app
+from json_stream import JsonStringFieldExtractor
+from prompts import SUGGESTIONS_AGENT_SYSTEM_MESSAGE
+
+
+def make_stream(text, size=5):
+    """Builds an iterable of MagicMock chunks shaped like a streamed chat completion."""
+    chunks = [MagicMock(choices=[])] # Azure's leading content-filter chunk
+    for i in range(0, len(text), size):
+        chunk = MagicMock()
+        chunk.choices[0].delta.content = text[i:i + size]
+        chunks.append(chunk)
+    return iter(chunks)
+
+
+def make_completion(content):
+    """Builds a MagicMock shaped like a chat completion response."""
+    completion = MagicMock()
+    completion.choices[0].message.content = content
+    return completion
+
+
+def parse_sse(body):
+    """Splits a Server-Sent Events body into (event, payload) tuples."""
+    events = []
+    for raw_event in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in raw_event.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestJsonStringFieldExtractor(unittest.TestCase):
+    """Tests for the incremental JSON field extractor."""
+
+    def feed_all(self, text, size):
+        extractor = JsonStringFieldExtractor("explanation")
+        streamed = "".join(extractor.feed(text[i:i + size]) for i in range(0, len(text), size))
+        return extractor, streamed
+
+    def test_extracts_field_across_chunk_boundaries(self):
+        value = 'Line one\nA "quoted" word, café and a \\ backslash.'
+        text = json.dumps({"explanation": value, "follow_up_question": "Next?"})
+        for size in (1, 3, 7, len(text)):
+            with self.subTest(size=size):
+                extractor, streamed = self.feed_all(text, size)
+                self.assertEqual(streamed, value)
+                self.assertTrue(extractor.done)
+
+    def test_single_quoted_keys(self):
+        _, streamed = self.feed_all("{'explanation': 'VR helps.', 'new_options': []}", 4)
+        self.assertEqual(streamed, "VR helps.")
+
+
+class TestStreamingEndpoint(unittest.TestCase):
+    """Tests for stream_openai_reply and the /api/chat/stream endpoint."""
+
+    def setUp(self):
+        self.client = MagicMock()
+        patchers = [
+            patch('main.get_azure_client', return_value=self.client),
+            patch('main.rag_manager', None),
+            patch('llm_cache.LLM_CACHE.enabled', False),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.app_client = app.test_client()
+
+    def test_step_reply_streams_explanation(self):
+        reply = json.dumps({
+            "explanation": "VR can make abstract concepts concrete.",
+            "follow_up_question": "Which course?",
+            "new_options": ["MATH 1013"]
+        })
+
+        def create(**kwargs):
+            if kwargs.get("stream"):
+                return make_stream(reply)
+            return make_completion("1. Adopt VR in math") # The summary agent
+
+        self.client.chat.completions.create.side_effect = create
+
+        response = self.app_client.post('/api/chat/stream', json={"userInput": "I want VR", "purpose": "objective"})
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = parse_sse(response.get_data(as_text=True))
+
+        tokens = "".join(payload["text"] for event, payload in events if event == "token")
+        self.assertEqual(tokens, "VR can make abstract concepts concrete.")
+        event, final = events[-1]
+        self.assertEqual(event, "final")
+        self.assertEqual(final["type"], "summary_and_options")
+        self.assertEqual(final["options"], ["MATH 1013"])
+        self.assertEqual(final["full_summary_state"]["objective"], "1. Adopt VR in math")
+
+    def test_integrator_streams_proposal_then_suggestions(self):
+        def create(**kwargs):
+            if kwargs["messages"][0]["content"] == SUGGESTIONS_AGENT_SYSTEM_MESSAGE:
+                return make_completion("Consider a pilot.")
+            return make_stream("# Proposal\nBody")
+
+        self.client.chat.completions.create.side_effect = create
+
+        events = list(main.stream_openai_reply("Synthesize", "integrator", {"objective": "1. VR"}))
+        tokens = "".join(payload["text"] for event, payload in events if event == "token")
+        self.assertEqual(events[-1], ("final", {
+            "type": "summary_only",
+            "summary": "# Proposal\nBody\n\n# Suggestions\nConsider a pilot."
+        }))
+        self.assertEqual(tokens, events[-1][1]["summary"])
+
+    def test_initial_question_is_single_final_event(self):
+        events = list(main.stream_openai_reply("", "objective", {}))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][1]["type"], "question")
+        self.client.chat.completions.create.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
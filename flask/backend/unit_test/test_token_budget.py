@@ -0,0 +1,149 @@
+import unittest
+import io
+import json
+import os
+import sys
+import tempfile
+from unittest.mock import patch, MagicMock
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+import main
+import token_budget
+from token_budget import count_tokens, truncate_to_tokens, fit_chunks, compact_summary, share_budget, parse_client_summaries
+from prompts import SYSTEM_PROMPTS, INTEGRATOR_SYNTHESIS_INSTRUCTION
+
+
+class TestTokenBudgetHelpers(unittest.TestCase):
+    """Tests for the budgeting primitives in token_budget.py."""
+
+    def test_truncate_keeps_text_that_fits(self):
+        self.assertEqual(truncate_to_tokens("Short text.", 50), "Short text.")
+
+    def test_truncate_stays_within_budget(self):
+        text = "One sentence about VR in math. " * 200
+        cut = truncate_to_tokens(text, 100)
+        self.assertLessEqual(count_tokens(cut), 100)
+        self.assertTrue(cut.endswith("."))
+
+    def test_fit_chunks_drops_low_ranked_chunks(self):
+        chunks = ["alpha " * 300, "beta " * 300, "gamma " * 300]
+        budget = count_tokens(chunks[0]) + 100
+        kept, dropped, trimmed = fit_chunks(chunks, budget)
+        self.assertEqual(kept[0], chunks[0])
+        self.assertEqual(len(kept), 2)
+        self.assertEqual((dropped, trimmed), (1, 1))
+        self.assertLessEqual(sum(count_tokens(chunk) for chunk in kept), budget)
+
+    def test_fit_chunks_does_not_send_tiny_fragments(self):
+        chunks = ["alpha " * 300, "beta " * 300]
+        kept, dropped, trimmed = fit_chunks(chunks, count_tokens(chunks[0]) + 10)
+        self.assertEqual(kept, [chunks[0]])
+        self.assertEqual((dropped, trimmed), (1, 0))
+
+    def test_compact_summary(self):
+        summary = "\n".join(f"{i}. Point number {i} about the project." for i in range(1, 200))
+        compacted = compact_summary(summary, 80)
+        self.assertLessEqual(count_tokens(compacted), 80)
+        self.assertTrue(compacted.startswith("1. Point number 1"))
+
+    def test_share_budget_gives_unused_share_to_long_texts(self):
+        texts = {"short": "a b c", "long": "word " * 2000, "empty": ""}
+        allowances = share_budget(texts, 500)
+        self.assertEqual(allowances["short"], count_tokens("a b c"))
+        self.assertEqual(allowances["long"], 500 - allowances["short"])
+        self.assertNotIn("empty", allowances)
+
+    def test_parse_client_summaries(self):
+        self.assertEqual(parse_client_summaries(json.dumps({"objective": "1. VR"})), {"objective": "1. VR"})
+        self.assertIsNone(parse_client_summaries("Synthesize my proposal"))
+        self.assertIsNone(parse_client_summaries("[1, 2]"))
+
+
+class TestPromptBudgets(unittest.TestCase):
+    """Tests for the budgeted prompt builders in main.py."""
+
+    def test_step_prompt_stays_under_ceiling(self):
+        chunks = [f"Reference passage {i}. " + "Detail about VR teaching. " * 150 for i in range(6)]
+        summary = "\n".join(f"{i}. A long summary point." for i in range(1, 400))
+        user_input = "My idea. " * 500
+
+        messages = main.prepare_step_messages("objective", SYSTEM_PROMPTS["objective"]["persona"], chunks, summary, user_input)
+
+        total = sum(count_tokens(message["content"]) for message in messages)
+        self.assertLessEqual(total, token_budget.PROMPT_TOKEN_CEILING)
+        # The best-ranked chunk is kept in full.
+        self.assertIn(chunks[0], messages[0]["content"])
+        self.assertNotIn("Reference passage 5.", messages[0]["content"])
+
+    def test_step_prompt_unchanged_when_within_budget(self):
+        persona = SYSTEM_PROMPTS["objective"]["persona"]
+        with patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            messages = main.prepare_step_messages("objective", persona, ["chunk one", "chunk two"], "1. VR", "Hello")
+        # The per-section counts are printed to stderr, which gunicorn and uvicorn keep.
+        self.assertRegex(stderr.getvalue(), r"prompt tokens purpose=objective total=\d+ .*summary=\d+")
+        expected = main.build_step_messages(main.build_system_prompt_with_rag(persona, "chunk one chunk two"), "1. VR", "Hello")
+        self.assertEqual(messages, expected)
+
+    def test_integrator_summaries_are_sent_once(self):
+        summaries = {"objective": "1. Adopt VR in math", "outcomes": "", "pedagogy": ""}
+        client_copy = json.dumps({"objective": "1. Adopt VR in math", "outcomes": "1. Better grades", "pedagogy": ""})
+
+        full_summary_text, proposal_input = main.prepare_integrator_context(summaries, client_copy)
+
+        self.assertIn("1. Adopt VR in math", full_summary_text)
+        # The client copy only fills steps the session has lost.
+        self.assertIn("1. Better grades", full_summary_text)
+        self.assertTrue(proposal_input.startswith(INTEGRATOR_SYNTHESIS_INSTRUCTION))
+        self.assertIn("pedagogy", proposal_input)
+        self.assertNotIn("Adopt VR", proposal_input)
+
+    def test_integrator_summaries_are_compacted(self):
+        summaries = {key: "\n".join(f"{i}. Point for {key}." for i in range(1, 500)) for key in ("objective", "outcomes")}
+        with patch.dict(token_budget.PURPOSE_TOKEN_BUDGETS["integrator"], {"summaries": 1000}):
+            full_summary_text, _ = main.prepare_integrator_context(summaries, "Synthesize")
+        self.assertLessEqual(count_tokens(full_summary_text), 1100)
+        self.assertIn("1. Point for outcomes.", full_summary_text)
+
+
+
+class TestTokenizerLoading(unittest.TestCase):
+    """Tests for loading the tiktoken encoding from the local cache only."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        patchers = [
+            patch('token_budget.TIKTOKEN_CACHE_DIR', self.cache_dir.name),
+            patch('token_budget._encoding', None),
+            patch('token_budget._encoding_loaded', False),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_missing_encoding_is_estimated_without_downloading(self):
+        with patch('tiktoken.get_encoding', side_effect=AssertionError("downloads the encoding")), \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertEqual(count_tokens("abcdefgh"), 2)
+            self.assertEqual(count_tokens("abcd"), 1)
+        self.assertEqual(stderr.getvalue().count("tokenizer unavailable"), 1)
+        self.assertIn("token_budget.py --download", stderr.getvalue())
+        self.assertEqual(token_budget.get_token_budget_stats()["tokenizer"], "estimate")
+
+    def test_cached_encoding_is_loaded(self):
+        with open(token_budget.encoding_file(), "w") as f:
+            f.write("")
+        encoding = MagicMock()
+        encoding.encode.return_value = [1, 2, 3]
+        with patch('tiktoken.get_encoding', return_value=encoding) as get_encoding:
+            self.assertIs(token_budget.load_encoding(), encoding)
+            self.assertEqual(count_tokens("three tokens here"), 3)
+        get_encoding.assert_called_once_with(token_budget.TOKENIZER_ENCODING)
+
+
+if __name__ == '__main__':
+    unittest.main()
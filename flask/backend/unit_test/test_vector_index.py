@@ -0,0 +1,162 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+from unittest.mock import patch
+
+# Dynamically add the 'backend' directory to sys.path
+script_dir = os.path.dirname(__file__)
+backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
+sys.path.insert(0, backend_dir)
+
+from vector_index import NumpyVectorIndex, VectorIndexWriter, write_vector_index, read_index_dtype
+
+
+class TestNumpyVectorIndex(unittest.TestCase):
+    """Tests for the memory-mapped exact vector index."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.index_dir = os.path.join(self.tmp_dir.name, "numpy_index")
+
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(200, 16)).astype(np.float32) * rng.uniform(0.5, 3.0, size=(200, 1))
+        self.texts = [f"chunk {i} – café" for i in range(200)]
+        self.ids = [f"id-{i}" for i in range(200)]
+        write_vector_index(self.index_dir, self.ids, self.texts, self.embeddings, "test-model")
+
+    def test_round_trip_is_memory_mapped(self):
+        index = NumpyVectorIndex(self.index_dir)
+        self.assertEqual(len(index), 200)
+        self.assertEqual(index.model_name, "test-model")
+        self.assertIsInstance(index.vectors, np.memmap)
+        self.assertTrue(index.vectors.flags.c_contiguous)
+        np.testing.assert_allclose(np.linalg.norm(index.vectors, axis=1), 1.0, rtol=1e-5)
+        self.assertEqual(index.text(7), "chunk 7 – café")
+
+    def test_exact_top_k_matches_brute_force(self):
+        index = NumpyVectorIndex(self.index_dir)
+        queries = np.random.default_rng(1).normal(size=(5, 16))
+
+        positions, scores = index.search(queries, k=10)
+
+        normalized = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        expected = np.argsort(-(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T, axis=1)[:, :10]
+        np.testing.assert_array_equal(positions, expected)
+        self.assertTrue(np.all(np.diff(scores, axis=1) <= 0))
+        self.assertEqual(index.search_texts(queries[0], k=2), [[self.texts[p] for p in expected[0, :2]]])
+
+    def test_k_larger_than_index(self):
+        write_vector_index(self.index_dir, ["a", "b"], ["first", "second"], [[1.0, 0.0], [0.0, 1.0]], "test-model")
+        index = NumpyVectorIndex(self.index_dir)
+        self.assertEqual(index.search_texts([[0.2, 1.0]], k=4), [["second", "first"]])
+
+    def test_rewrite_replaces_the_index(self):
+        old = NumpyVectorIndex(self.index_dir)
+        write_vector_index(self.index_dir, ["a"], ["only"], [[1.0] * 16], "test-model")
+        self.assertEqual(len(NumpyVectorIndex(self.index_dir)), 1)
+        # A process that mapped the old files can still read them.
+        self.assertEqual(old.text(0), "chunk 0 – café")
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["numpy_index"])
+
+    def test_filtered_search_only_ranks_matching_chunks(self):
+        metadatas = [{"source": "a.docx", "tag_evaluation": True} if i % 3 == 0 else {"source": "b.docx"} for i in range(200)]
+        write_vector_index(self.index_dir, self.ids, self.texts, self.embeddings, "test-model", metadatas=metadatas)
+        index = NumpyVectorIndex(self.index_dir)
+        queries = np.random.default_rng(2).normal(size=(3, 16))
+        spec = {"tags": ["evaluation"], "sources": []}
+
+        positions, _ = index.search(queries, k=5, spec=spec)
+
+        allowed = np.arange(0, 200, 3)
+        normalized = self.embeddings / np.linalg.norm(self.embeddings, axis=1, keepdims=True)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized[allowed].T
+        np.testing.assert_array_equal(positions, allowed[np.argsort(-scores, axis=1)[:, :5]])
+        self.assertIs(index.candidates(spec), index.candidates(dict(spec))) # Built once per spec
+        np.testing.assert_array_equal(index.candidates(spec), allowed)
+        self.assertEqual(index.search(queries, k=5, spec={"tags": ["budget"], "sources": []})[0].shape, (3, 0))
+
+    def test_quantized_indexes_rescore_to_exact_results(self):
+        queries = np.random.default_rng(3).normal(size=(8, 16))
+        exact_positions, exact_scores = NumpyVectorIndex(self.index_dir).search(queries, k=10)
+
+        for dtype, bytes_per_value in (("float16", 2), ("int8", 1)):
+            with self.subTest(dtype=dtype):
+                write_vector_index(self.index_dir, self.ids, self.texts, self.embeddings, "test-model", dtype=dtype)
+                index = NumpyVectorIndex(self.index_dir)
+                self.assertEqual(index.dtype, dtype)
+                self.assertEqual(read_index_dtype(self.index_dir), dtype)
+                self.assertEqual(index.vectors.dtype, np.dtype(dtype))
+                self.assertEqual(index.vectors.nbytes, 200 * 16 * bytes_per_value)
+
+                positions, scores = index.search(queries, k=10)
+                np.testing.assert_array_equal(positions, exact_positions)
+                np.testing.assert_allclose(scores, exact_scores, rtol=1e-5, atol=1e-6)
+                # A filtered search reads the same mapped rows (and scales) as an unfiltered one.
+                every_row = {"sources": ["source.docx"], "tags": []}
+                with patch('vector_index.SCORE_BLOCK_ROWS', 7), patch('vector_index.matches_spec', return_value=True):
+                    filtered_positions, filtered_scores = index.search(queries, k=10, spec=every_row)
+                np.testing.assert_array_equal(filtered_positions, exact_positions)
+                np.testing.assert_allclose(filtered_scores, exact_scores, rtol=1e-5, atol=1e-6)
+
+                # Without re-scoring the approximate scores are close, and the top hit still agrees.
+                index.rescore_factor = 0
+                approx_positions, approx_scores = index.search(queries, k=10)
+                np.testing.assert_allclose(approx_scores, np.sort(approx_scores, axis=1)[:, ::-1])
+                np.testing.assert_array_equal(approx_positions[:, 0], exact_positions[:, 0])
+                self.assertLess(np.abs(approx_scores[:, 0] - exact_scores[:, 0]).max(), 0.02)
+
+    def test_quantized_filtered_search(self):
+        metadatas = [{"source": "a.docx"} if i % 2 else {"source": "b.docx"} for i in range(200)]
+        spec = {"tags": [], "sources": ["a.docx"]}
+        queries = np.random.default_rng(4).normal(size=(2, 16))
+        write_vector_index(self.index_dir, self.ids, self.texts, self.embeddings, "test-model", metadatas=metadatas)
+        expected, _ = NumpyVectorIndex(self.index_dir).search(queries, k=5, spec=spec)
+        write_vector_index(self.index_dir, self.ids, self.texts, self.embeddings, "test-model", metadatas=metadatas, dtype="int8")
+        positions, _ = NumpyVectorIndex(self.index_dir).search(queries, k=5, spec=spec)
+        np.testing.assert_array_equal(positions, expected)
+        self.assertTrue(np.all(positions % 2 == 1))
+
+    def test_unknown_dtype(self):
+        with self.assertRaises(ValueError):
+            write_vector_index(self.index_dir, ["a"], ["one"], [[1.0]], "test-model", dtype="int4")
+
+    def test_missing_index(self):
+        with self.assertRaises(FileNotFoundError):
+            NumpyVectorIndex(os.path.join(self.tmp_dir.name, "missing"))
+        self.assertIsNone(read_index_dtype(os.path.join(self.tmp_dir.name, "missing")))
+
+    def test_block_writes_match_a_single_write(self):
+        metadatas = [{"source": f"doc{i % 3}.docx"} for i in range(200)]
+        for dtype in ("float32", "int8"):
+            with self.subTest(dtype=dtype):
+                write_vector_index(self.index_dir, self.ids, self.texts, self.embeddings, "test-model", metadatas=metadatas, dtype=dtype)
+                blocks_dir = os.path.join(self.tmp_dir.name, f"blocks_{dtype}")
+                with VectorIndexWriter(blocks_dir, 200, "test-model", dtype=dtype) as writer:
+                    for start in range(0, 200, 64):
+                        writer.add(self.ids[start:start + 64], self.texts[start:start + 64],
+                                   self.embeddings[start:start + 64], metadatas[start:start + 64])
+                for name in sorted(os.listdir(self.index_dir)):
+                    with open(os.path.join(self.index_dir, name), "rb") as single, open(os.path.join(blocks_dir, name), "rb") as blocks:
+                        self.assertEqual(single.read(), blocks.read(), name)
+                index = NumpyVectorIndex(blocks_dir)
+                self.assertEqual((index.text(199), index.metadatas[65]), (self.texts[199], metadatas[65]))
+
+    def test_short_block_write_leaves_no_index(self):
+        with self.assertRaises(ValueError):
+            with VectorIndexWriter(self.index_dir, 3, "test-model") as writer:
+                writer.add(["a"], ["only"], [[1.0, 0.0]])
+        # The previous index is untouched and no temporary directory is left behind.
+        self.assertEqual(len(NumpyVectorIndex(self.index_dir)), 200)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["numpy_index"])
+
+    def test_mismatched_lengths(self):
+        with self.assertRaises(ValueError):
+            write_vector_index(self.index_dir, ["a"], ["one", "two"], [[1.0], [0.0]], "test-model")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,386 @@
+import os
+import json
+import shutil
+import threading
+
+import numpy as np
+from rag_metadata import matches_spec, spec_key
+
+
+# --- In-process Vector Index ---
+# An exact alternative to Chroma for a knowledge base of a few thousand chunks. rag_builder.py
+# exports the vectors (L2-normalized float32, one contiguous row per chunk) and the chunk texts
+# into memory-mappable files; a query is one matrix-vector product over the mapped matrix.
+# Every worker process maps the same files read-only, so the OS keeps one copy of the pages.
+#
+#
+# The vectors can be stored quantized to float16 or int8 (one scale per row) to cut the memory
+# every search scans by 2x or 4x. The float32 rows are then kept in a second file that is only
+# read to re-score the top candidates exactly, so just the pages of those rows become resident.
+#
+# Files in the index directory:
+#   vectors.npy       [count, dimensions] in the index dtype, rows L2-normalized
+#   scales.npy        float32 [count], per-row scale of int8 vectors
+#   vectors_f32.npy   float32 [count, dimensions], exact rows for re-scoring (quantized indexes)
+#   texts.bin         the UTF-8 chunk texts back to back
+#   offsets.npy       int64 [count + 1], byte offsets of each text in texts.bin
+#   index.json        model name, dtype, dimensions, count, chunk ids and chunk metadata
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"
+FULL_VECTORS_FILE = "vectors_f32.npy"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+MANIFEST_FILE = "index.json"
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+# A quantized search re-scores this many candidates per result with the exact float32 rows.
+VECTOR_INDEX_RESCORE_FACTOR = int(os.getenv("VECTOR_INDEX_RESCORE_FACTOR", "4"))
+
+# Quantized (and filtered) rows are read and converted to float32 in blocks of this many rows
+# per matrix product, which keeps BLAS speed without a full-size float32 copy.
+SCORE_BLOCK_ROWS = 8192
+
+
+def normalize_rows(matrix):
+    """Returns matrix as float32 with each row scaled to unit length (zero rows stay zero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, dtype):
+    """
+    Converts normalized float32 rows to the storage dtype.
+
+    Returns:
+        tuple: (matrix, scales); scales is None except for int8, where row i is matrix[i] * scales[i].
+    """
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.maximum(np.abs(vectors).max(axis=1, initial=0.0), 1e-12) / 127.0
+        matrix = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return matrix, scales.astype(np.float32)
+    raise ValueError(f"Unknown vector dtype: {dtype}. Use one of {', '.join(VECTOR_DTYPES)}.")
+
+
+def replace_directory(tmp_dir, index_dir):
+    """Swaps a freshly written index directory in for index_dir (which may not exist yet)."""
+    # Processes that still map the old files keep reading them until they reload.
+    old_dir = f"{index_dir}.old-{os.getpid()}"
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class JsonListFile:
+    """Writes a JSON list to a file one item at a time, so a manifest list never sits in memory."""
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+    def extend(self, items):
+        for item in items:
+            self._file.write(("," if self.count else "") + json.dumps(item))
+            self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def write_manifest(path, fields, lists):
+    """
+    Writes a JSON object of the given fields plus one list per JsonListFile in lists
+    ({name: list_file}, or None for a null value), copying the lists from disk.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        separator = ""
+        for name, value in fields.items():
+            f.write(f"{separator}{json.dumps(name)}: {json.dumps(value)}")
+            separator = ", "
+        for name, list_file in lists.items():
+            f.write(f"{separator}{json.dumps(name)}: ")
+            separator = ", "
+            if list_file is None:
+                f.write("null")
+                continue
+            list_file.close()
+            f.write("[")
+            with open(list_file.path, "r", encoding="utf-8") as items:
+                shutil.copyfileobj(items, f)
+            f.write("]")
+            os.remove(list_file.path)
+        f.write("}")
+
+
+class VectorIndexWriter:
+    """
+    Writes an index of `count` chunks block by block (see add), so an export pages through the
+    vector store instead of loading it: the vector files are preallocated memory maps, the texts
+    are appended to texts.bin and the manifest lists are streamed to disk.
+    Use as a context manager; the finished index is swapped in when the block exits cleanly.
+    """
+    def __init__(self, index_dir, count, model_name, dtype="float32"):
+        quantize(np.zeros((0, 1), dtype=np.float32), dtype) # Rejects an unknown dtype up front
+        self.index_dir = os.path.abspath(index_dir)
+        self.count = count
+        self.model_name = model_name
+        self.dtype = dtype
+        self.written = 0
+        self.tmp_dir = f"{self.index_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._arrays = None # Created with the first block, once the dimensions are known
+        self._offsets = np.lib.format.open_memmap(os.path.join(self.tmp_dir, OFFSETS_FILE), mode="w+", dtype=np.int64, shape=(count + 1,))
+        self._offsets[0] = 0
+        self._texts = open(os.path.join(self.tmp_dir, TEXTS_FILE), "wb")
+        self._ids = JsonListFile(os.path.join(self.tmp_dir, "ids.part"))
+        self._metadatas = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self._discard()
+            return False
+        try:
+            self.close()
+        except BaseException:
+            self._discard()
+            raise
+        return False
+
+    def _discard(self):
+        """Drops the partly written index; the previous one stays in place."""
+        self._texts.close()
+        self._ids.close()
+        if self._metadatas is not None:
+            self._metadatas.close()
+        self._arrays = self._offsets = None
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _open_arrays(self, dimensions):
+        def open_array(name, dtype, shape):
+            return np.lib.format.open_memmap(os.path.join(self.tmp_dir, name), mode="w+", dtype=dtype, shape=shape)
+
+        matrix_dtype = quantize(np.zeros((1, dimensions), dtype=np.float32), self.dtype)[0].dtype
+        self._arrays = {VECTORS_FILE: open_array(VECTORS_FILE, matrix_dtype, (self.count, dimensions))}
+        if self.dtype == "int8":
+            self._arrays[SCALES_FILE] = open_array(SCALES_FILE, np.float32, (self.count,))
+        if self.dtype != "float32":
+            self._arrays[FULL_VECTORS_FILE] = open_array(FULL_VECTORS_FILE, np.float32, (self.count, dimensions))
+
+    def add(self, ids, texts, embeddings, metadatas=None):
+        """Appends a block of chunks (with their metadata, if given) after the ones already written."""
+        if len(embeddings) != len(texts) or len(ids) != len(texts):
+            raise ValueError("ids, texts and embeddings must have the same length.")
+        if not len(texts):
+            return
+        if self.written + len(texts) > self.count:
+            raise ValueError(f"More than the {self.count} chunks announced were written.")
+        vectors = np.ascontiguousarray(normalize_rows(embeddings))
+        if self._arrays is None:
+            self._open_arrays(vectors.shape[1])
+            if metadatas is not None:
+                self._metadatas = JsonListFile(os.path.join(self.tmp_dir, "metadatas.part"))
+        matrix, scales = quantize(vectors, self.dtype)
+        rows = slice(self.written, self.written + len(texts))
+        self._arrays[VECTORS_FILE][rows] = matrix
+        if scales is not None:
+            self._arrays[SCALES_FILE][rows] = scales
+        if FULL_VECTORS_FILE in self._arrays:
+            self._arrays[FULL_VECTORS_FILE][rows] = vectors
+
+        encoded = [text.encode("utf-8") for text in texts]
+        self._offsets[rows.start + 1:rows.stop + 1] = self._offsets[rows.start] + np.cumsum([len(blob) for blob in encoded])
+        self._texts.write(b"".join(encoded))
+        self._ids.extend(ids)
+        if self._metadatas is not None:
+            self._metadatas.extend(metadatas if metadatas is not None else [None] * len(texts))
+        self.written += len(texts)
+
+    def close(self):
+        """Flushes the files, writes the manifest and swaps the index in."""
+        if self.written != self.count:
+            raise ValueError(f"{self.written} of the {self.count} chunks announced were written.")
+        self._texts.close()
+        dimensions = 0
+        if self._arrays is None:
+            # Nothing was written: an empty index, as an empty export always produced.
+            np.save(os.path.join(self.tmp_dir, VECTORS_FILE), np.zeros(0, dtype=np.float32))
+        else:
+            dimensions = int(self._arrays[VECTORS_FILE].shape[1])
+            for array in self._arrays.values():
+                array.flush()
+        self._offsets.flush()
+        self._arrays = self._offsets = None
+        write_manifest(os.path.join(self.tmp_dir, MANIFEST_FILE), {
+            "model": self.model_name,
+            "dtype": self.dtype,
+            "dimensions": dimensions,
+            "count": self.count,
+        }, {"ids": self._ids, "metadatas": self._metadatas})
+        replace_directory(self.tmp_dir, self.index_dir)
+
+
+def write_vector_index(index_dir, ids, texts, embeddings, model_name, metadatas=None, dtype="float32"):
+    """
+    Writes the index files for the given chunks (with their metadata, if given), with the
+    vectors stored as `dtype` (see VECTOR_DTYPES). The files are written to a sibling directory
+    and swapped in, so a worker never maps a half-written index. Large exports write the same
+    files block by block with VectorIndexWriter.
+
+    Returns:
+        int: The number of chunks written.
+    """
+    if len(embeddings) != len(texts) or len(ids) != len(texts):
+        raise ValueError("ids, texts and embeddings must have the same length.")
+    with VectorIndexWriter(index_dir, len(texts), model_name, dtype=dtype) as writer:
+        writer.add(ids, texts, embeddings, metadatas=metadatas)
+    return len(texts)
+
+
+def read_index_dtype(index_dir):
+    """The storage dtype of the index written to index_dir, or None if there is no index."""
+    manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("dtype", "float32")
+
+
+class NumpyVectorIndex:
+    """
+    Top-k cosine search over a memory-mapped index written by write_vector_index; exact for
+    float32 indexes, and for quantized ones after re-scoring the top candidates.
+    """
+    def __init__(self, index_dir, rescore_factor=VECTOR_INDEX_RESCORE_FACTOR):
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Vector index not found at {index_dir}. Please run rag_builder.py first.")
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.index_dir = index_dir
+        self.model_name = manifest["model"]
+        self.dtype = manifest.get("dtype", "float32")
+        self.ids = manifest["ids"]
+        self.metadatas = manifest.get("metadatas") or [None] * len(self.ids)
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+        scales_path = os.path.join(index_dir, SCALES_FILE)
+        self.scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        full_path = os.path.join(index_dir, FULL_VECTORS_FILE)
+        self.full_vectors = np.load(full_path, mmap_mode="r") if os.path.exists(full_path) else None
+        self.rescore_factor = rescore_factor
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        texts_path = os.path.join(index_dir, TEXTS_FILE)
+        # np.memmap cannot map an empty file.
+        self._texts = np.memmap(texts_path, dtype=np.uint8, mode="r") if os.path.getsize(texts_path) else np.zeros(0, dtype=np.uint8)
+
+        # Row positions of the filtered candidate sets, one array per retrieval spec.
+        self._subsets = {}
+        self._subsets_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        """Bytes scanned by every search (the stored vectors and their scales)."""
+        return int(self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def text(self, position):
+        """Returns the chunk text at a row position."""
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return self._texts[start:end].tobytes().decode("utf-8")
+
+    def candidates(self, spec):
+        """
+        Returns the (ascending) row positions whose metadata matches a retrieval spec, or None
+        for no filter. Only the positions are kept per spec; the vectors are always read from
+        the shared mapped matrix.
+        """
+        key = spec_key(spec)
+        if key is None:
+            return None
+        with self._subsets_lock:
+            rows = self._subsets.get(key)
+            if rows is None:
+                rows = np.array([i for i, metadata in enumerate(self.metadatas) if matches_spec(metadata, spec)], dtype=np.int64)
+                self._subsets[key] = rows
+            return rows
+
+    def _scores(self, queries, rows):
+        """
+        queries @ vectors.T in float32 over the given rows (all rows for None). Quantized or
+        filtered rows are gathered from the mapped matrix and converted a block at a time.
+        """
+        if rows is None and self.vectors.dtype == np.float32:
+            return queries @ self.vectors.T
+        count = len(self.vectors) if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            selection = slice(start, start + SCORE_BLOCK_ROWS) if rows is None else rows[start:start + SCORE_BLOCK_ROWS]
+            block = np.asarray(self.vectors[selection], dtype=np.float32)
+            end = start + len(block)
+            scores[:, start:end] = queries @ block.T
+            if self.scales is not None:
+                scores[:, start:end] *= self.scales[selection]
+        return scores
+
+    @staticmethod
+    def _top_k(scores, candidates, k):
+        """The k best of each row of scores (for the given candidate columns), best first."""
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, top, axis=1)
+            candidates = np.take_along_axis(candidates, top, axis=1)
+        # Best first; ties go to the earlier chunk so results are deterministic.
+        order = np.lexsort((candidates, -scores), axis=1)
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def search(self, query_vectors, k, spec=None):
+        """
+        Top-k search for a batch of query vectors.
+
+        Args:
+            query_vectors (array-like): [queries, dimensions] (or one [dimensions] vector).
+            k (int): Results per query.
+            spec (dict, optional): A retrieval spec (see rag_metadata.py); only matching chunks are ranked.
+
+        Returns:
+            tuple: (positions, scores), each [queries, min(k, candidates)], best match first;
+                   scores are cosine similarities (exact once re-scored).
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        rows = self.candidates(spec)
+        count = len(self.vectors) if rows is None else len(rows)
+        k = min(k, count)
+        if k <= 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        rescore = self.full_vectors is not None and self.rescore_factor > 0
+        shortlist = min(k * self.rescore_factor, count) if rescore else k
+        scores = self._scores(queries, rows)
+        columns = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        positions, scores = self._top_k(scores, columns, shortlist)
+        if rows is not None:
+            positions = rows[positions]
+        if rescore:
+            exact = np.einsum("qd,qkd->qk", queries, np.asarray(self.full_vectors[positions.ravel()]).reshape(*positions.shape, -1))
+            positions, scores = self._top_k(exact, positions, k)
+        return positions, scores
+
+    def search_texts(self, query_vectors, k, spec=None):
+        """Like search, but returns the chunk texts per query."""
+        positions, _ = self.search(query_vectors, k, spec)
+        return [[self.text(position) for position in row] for row in positions]
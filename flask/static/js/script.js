@@ -166,6 +166,63 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Post a chat request to the streaming endpoint.
+    // onToken is called with the accumulated text each time a 'token' event arrives;
+    // the structured payload of the 'final' event is returned.
+    async function postChatStream(body, onToken) {
+        const response = await fetch(`${BASE_PATH}/api/chat/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(body),
+        });
+
+        if (!response.ok || !response.body) {
+            return await response.json(); // Validation errors come back as plain JSON
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let streamedText = '';
+        let finalData = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Server-Sent Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventName = 'message';
+                let dataText = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataText += line.slice(5).trim();
+                });
+                if (!dataText) continue;
+
+                const payload = JSON.parse(dataText);
+                if (eventName === 'token') {
+                    streamedText += payload.text;
+                    if (onToken) onToken(streamedText);
+                } else if (eventName === 'final') {
+                    finalData = payload;
+                }
+            }
+        }
+
+        if (!finalData) {
+            throw new Error('The response stream ended before the final result was received.');
+        }
+        return finalData;
+    }
+
     // Function to handle form submission
     async function handleSubmit(event) {
         event.preventDefault();
@@ -179,20 +236,15 @@ document.addEventListener('DOMContentLoaded', function() {
         submitBtn.innerHTML = '<i class="fa-solid fa-spinner fa-spin"></i>'; // Show loading spinner
 
         try {
-            // Prepend BASE_PATH to the API endpoint
-            const response = await fetch(`${BASE_PATH}/api/chat`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    userInput: userInput,
-                    purpose: purpose,
-					currentSummaries :currentSummaries 
-                }),
+            // Show the explanation as it streams in; the full reply is rendered by displayMessage
+            const guidingQuestionDiv = form.querySelector('.guiding-question');
+            const data = await postChatStream({
+                userInput: userInput,
+                purpose: purpose,
+                currentSummaries :currentSummaries
+            }, streamedText => {
+                if (guidingQuestionDiv) guidingQuestionDiv.textContent = streamedText;
             });
-
-            const data = await response.json();
 			console.log('Received data from backend:', data);			
 			//console.log(purpose,": ",data.full_summary_state[purpose]);
             displayMessage(form, data);
@@ -228,19 +280,13 @@ document.addEventListener('DOMContentLoaded', function() {
         integrateBtn.innerHTML = '<i class="fa-solid fa-spinner fa-spin"></i> Synthesizing...';
 
         try {
-            // Prepend BASE_PATH to the API endpoint
-            const response = await fetch(`${BASE_PATH}/api/chat`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    userInput: JSON.stringify(currentSummaries), // Send all collected summaries
-                    purpose: 'integrator'
-                }),
+            // Render the proposal markdown as it streams in
+            const data = await postChatStream({
+                userInput: JSON.stringify(currentSummaries), // Send all collected summaries
+                purpose: 'integrator'
+            }, streamedText => {
+                finalResponseArea.textContent = streamedText;
             });
-
-            const data = await response.json();
             // Pass the integration-section element to displayMessage
             displayMessage(document.getElementById('integration-section'), data);
 